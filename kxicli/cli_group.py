@@ -7,39 +7,110 @@
 from kxi import DeploymentType
 from kxicli import config, common
 from kxicli import log
+from kxicli.resources import trace
 
 PYTHON_VERSION = f'{sys.version_info.major}.{sys.version_info.minor}'
 PKG_DIR = os.path.dirname(os.path.abspath(__file__))
 VERSION_MSG = f'%(prog)s, version %(version)s from {PKG_DIR} (Python {PYTHON_VERSION})'
 
+# Modules registering the top level commands, imported only when their command is resolved
+LAZY_COMMANDS = {
+    'assembly': 'kxicli.commands.assembly',
+    'auth': 'kxicli.commands.auth',
+    'backup': 'kxicli.commands.backup',
+    'batch': 'kxicli.commands.batch',
+    'client': 'kxicli.commands.client',
+    'configure': 'kxicli.commands.configure',
+    'daemon': 'kxicli.commands.daemon',
+    'entitlement': 'kxicli.commands.entitlement',
+    'install': 'kxicli.commands.install',
+    'package': 'kxicli.commands.package',
+    'publish': 'kxicli.commands.publish',
+    'query': 'kxicli.commands.query',
+    'user': 'kxicli.commands.user',
+}
+
+
+def _exception_handler(exception_type, exception, traceback):
+    """Squash tracebacks for the CLI unless the --debug flag is set
+    """
+    if not log.GLOBAL_DEBUG_LOG:
+        click.echo(f"{exception_type.__name__}: {exception}")
+    else:
+        sys.__excepthook__(exception_type, exception, traceback)
+
+
+sys.excepthook = _exception_handler
+
+# Keys of the profile state shared by every context of a single invocation
+PROFILE_META_KEY = 'kxicli.profile'
+CLI_USAGE_META_KEY = 'kxicli.usage'
+
+
+def load_profile(ctx, profile):
+    """Load a configuration profile unless it was already loaded during this invocation"""
+    meta = ctx.find_root().meta
+    if meta.get(PROFILE_META_KEY) != profile:
+        config.load_config(profile)
+        meta[PROFILE_META_KEY] = profile
+
 
 class ProfileAwareGroup(ClickAliasedGroup):
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, lazy_commands=None, **kwargs):
         super(ProfileAwareGroup, self).__init__(*args, **kwargs)
-        self._cli_usage = None
-        self._profile = None
+        self._lazy_commands = lazy_commands or {}
+
+    def _load_lazy_command(self, cmd_name):
+        """Import the module that registers cmd_name if it hasn't been registered yet"""
+        if cmd_name in self.commands or cmd_name in self._aliases:
+            return
+
+        if cmd_name in self._lazy_commands:
+            modules = [self._lazy_commands[cmd_name]]
+        else:
+            # aliases are only known once their command is registered
+            modules = self._lazy_commands.values()
+
+        for module in modules:
+            log.debug(f'Loading commands from {module}')
+            importlib.import_module(module)
+
+    def parse_args(self, ctx, args):
+        if ctx.parent is None:
+            ctx.meta[common.ARGS_META_KEY] = [*args]
+        return super().parse_args(ctx, args)
+
+    def list_commands(self, ctx):
+        return sorted(set(super().list_commands(ctx)) | set(self._lazy_commands))
 
     def get_cli_usage(self, ctx):
+        """Resolve the usage of the selected profile once per invocation and share it with all subcommands"""
+        meta = ctx.find_root().meta
+        if CLI_USAGE_META_KEY not in meta:
+            meta[CLI_USAGE_META_KEY] = self._resolve_cli_usage(ctx)
+        return meta[CLI_USAGE_META_KEY]
+
+    def _resolve_cli_usage(self, ctx):
+        root = ctx.find_root()
         profile = None
-        if "profile" in ctx.params:
-            profile = ctx.params["profile"]
+        if "profile" in root.params:
+            profile = root.params["profile"]
         else:
-            parser = self.make_parser(ctx)
+            parser = root.command.make_parser(root)
             parser.allow_interspersed_args = True
             parser.ignore_unknown_options = True
-            opts, args, param_order = parser.parse_args(sys.argv[1:])
+            opts, args, param_order = parser.parse_args(common.invocation_args(root))
             if "profile" in opts:
                 profile = opts["profile"]
-            
+
         profile_usage = DeploymentType.ENTERPRISE
-        
+
         if profile:
-            config.load_config(profile)
+            load_profile(ctx, profile)
             profile_usage = common.get_default_val("usage")
 
-        self._cli_usage = profile_usage or DeploymentType.ENTERPRISE
-        return self._cli_usage
+        return profile_usage or DeploymentType.ENTERPRISE
 
     def command(self, *args, usage=[DeploymentType.ENTERPRISE], **kwargs):        
         cmd = super(ProfileAwareGroup, self).command(*args, context_settings={"obj": {"usage": usage}}, **kwargs)
@@ -49,6 +120,7 @@ def group(self, *args, usage=[DeploymentType.ENTERPRISE], **kwargs):
         return super(ProfileAwareGroup, self).group(*args, context_settings={"obj": {"usage": usage}}, **kwargs)
 
     def get_command(self, ctx, cmd_name):
+        self._load_lazy_command(cmd_name)
         cmd = super().get_command(ctx, cmd_name)
         if cmd and self.get_cli_usage(ctx) in cmd.context_settings.get("obj", {}).get("usage", DeploymentType.ENTERPRISE):
             return cmd
@@ -59,12 +131,14 @@ def resolve_command(self, ctx, args):
         return super().resolve_command(ctx, args)
   
 
-@click.group(cls=ProfileAwareGroup)
+@click.group(cls=ProfileAwareGroup, lazy_commands=LAZY_COMMANDS)
 @click.version_option(message=VERSION_MSG)
 @click.option('--debug', is_flag=True, default=False, help='Enable debug logging.')
 @click.option('--profile', default='default', help='Name of configuration profile to use.')
+@click.option('--trace-file', type=click.Path(dir_okay=False),
+              help='Write the timing of each phase, subprocess and Kubernetes call to this file in Chrome trace format.')
 @click.pass_context
-def cli(ctx, debug, profile):
+def cli(ctx, debug, profile, trace_file):
     """kdb Insights CLI"""
     ctx.obj = ctx.obj or {}
     if debug:
@@ -73,8 +147,32 @@ def cli(ctx, debug, profile):
         log.debug(f'Version {importlib.metadata.version("kxicli")}')
         log.debug('Enabled global debug logging')
 
-    config.load_config(profile)
+    if debug or trace_file:
+        trace.start(trace_file)
+
+    load_profile(ctx, profile)
     if profile not in config.config and ctx.invoked_subcommand != 'configure':
         config.set_config(profile)
 
     ctx.obj["kxi_cli_profile"] = profile
+
+
+def invoke(args):
+    """Run a kxi command line in this process as the kxi script would, returns its exit code
+
+    Debug logging enabled by the command line is turned off again once it finished.
+    """
+    debug = log.GLOBAL_DEBUG_LOG
+    try:
+        cli.main(args=args, prog_name='kxi')
+        return 0
+    except SystemExit as e:
+        if isinstance(e.code, str):
+            click.echo(e.code, err=True)
+            return 1
+        return e.code or 0
+    except Exception as e:
+        _exception_handler(type(e), e, e.__traceback__)
+        return 1
+    finally:
+        log.GLOBAL_DEBUG_LOG = debug
@@ -1,7 +1,7 @@
 import copy
 import json
+import math
 import os
-import random
 import sys
 import time
 from tempfile import mkstemp
@@ -24,10 +24,9 @@
 from kxicli.options import namespace as options_namespace, assembly_backup_filepath, assembly_filepath, \
      hostname as options_hostname, \
      realm as options_realm
-from kxicli.resources import auth
+from kxicli.resources import auth, http, trace
 
 from kxicli.resources.auth import TokenType
-from kxi.auth import CredentialStore
 from kxi.controller.assembly import AssemblyApi as Assembly
 
 API_GROUP = 'insights.kx.com'
@@ -35,6 +34,10 @@
 API_PLURAL = 'assemblies'
 CONFIG_ANNOTATION = 'kubectl.kubernetes.io/last-applied-configuration'
 ASM_LABEL_SELECTOR = 'insights.kx.com/queryEnvironment!=true'
+ASM_WAIT_TIMEOUT = 1200
+ASM_POLL_INTERVAL = 5
+ASM_WATCH_TIMEOUT = 60
+ASM_PAGE_SIZE = 500
 
 local_arg_assembly_backup_filepath = assembly_backup_filepath.decorator(click_option_args=['-f', '--filepath'])
 
@@ -83,8 +86,7 @@ def _assembly_status(namespace=None, name=None, hostname=None, realm=None, use_k
         namespace = options_namespace.prompt(namespace)
         res = _assembly_status_k8s(namespace, name)
         assembly_status = _format_assembly_status(res)
-        if len(assembly_status) and 'AssemblyReady' in assembly_status:
-            assembly_ready = assembly_status['AssemblyReady']['status'] == 'True'
+        assembly_ready = _assembly_ready(assembly_status)
     else:
         assembly = get_assembly_object(hostname, realm=realm)
         assembly_status = assembly.status(name=name)
@@ -100,40 +102,104 @@ def _assembly_status(namespace=None, name=None, hostname=None, realm=None, use_k
     return assembly_ready
 
 
-def _list_assemblies(hostname=None, realm=None, namespace=None, use_kubeconfig=False):
-    """List assemblies"""
+def _assembly_ready(assembly_status):
+    """Whether the AssemblyReady condition of a status from _format_assembly_status is True"""
+    return assembly_status.get('AssemblyReady', {}).get('status') == 'True'
 
-    if use_kubeconfig:
-        namespace = options_namespace.prompt(namespace)
-        res = get_assemblies_list(namespace)
-        asm_list = format_assemblies_list_k8s(res)
+
+def _assembly_wanted(name, ready, name_prefix=None, ready_filter=None):
+    return (not name_prefix or name.startswith(name_prefix)) and (ready_filter is None or ready == ready_filter)
+
+
+def _list_assemblies(hostname=None, realm=None, namespace=None, use_kubeconfig=False, selector=None,
+                     field_selector=None, name_prefix=None, ready=None, page_size=ASM_PAGE_SIZE,
+                     all_namespaces=False, status=False, output_format='table'):
+    """List assemblies
+
+    Label and field selectors are applied by the kubernetes API, the name prefix and readiness filters
+    are applied to each page of results as it arrives. Listing all namespaces always uses the kubernetes API.
+    """
+
+    if use_kubeconfig or all_namespaces:
+        namespace = None if all_namespaces else options_namespace.prompt(namespace)
+        label_selector = ','.join(filter(None, [ASM_LABEL_SELECTOR, selector]))
+        res = (asm for asm in iter_assemblies(namespace, label_selector, field_selector, page_size)
+               if _assembly_wanted(asm['metadata']['name'], _assembly_ready(_format_assembly_status(asm)),
+                                   name_prefix, ready))
+        if output_format == 'json':
+            click.echo(json.dumps([_assembly_summary_k8s(asm, status) for asm in res], indent=2))
+            return True
+        asm_list = format_assemblies_list_k8s(res, status)
     else:
+        if selector or field_selector:
+            raise click.ClickException('--selector and --field-selector require --use-kubeconfig')
         assembly = get_assembly_object(hostname, realm=realm)
-        res = assembly.list()
+        res = [asm for asm in assembly.list()
+               if _assembly_wanted(asm.get('name', ''), asm.get('ready'), name_prefix, ready)]
         asm_list = _format_assemblies_list_kxic(res)
+        if output_format == 'json':
+            keys = ['name', 'running', 'ready']
+            click.echo(json.dumps([dict(zip(keys, row)) for row in asm_list[0]], indent=2))
+            return True
 
     print_2d_list(asm_list[0], asm_list[1])
     return True
 
 
+@trace.traced('List assemblies', trace.CATEGORY_K8S)
 def get_assemblies_list(namespace, label_selector=ASM_LABEL_SELECTOR, field_selector=None):
     """List assemblies via the kubernetes API"""
     return pyk8s.cl.assemblies.get(field_selector=field_selector, label_selector=label_selector, namespace=namespace)
 
 
+def iter_assemblies(namespace=None, label_selector=ASM_LABEL_SELECTOR, field_selector=None, page_size=ASM_PAGE_SIZE):
+    """Assemblies listed via the kubernetes API a page at a time, in all namespaces if namespace is None
+
+    Only the current page is held, the continue token in the list metadata of each page requests the next one.
+    """
+    token = None
+    while True:
+        with trace.span('List assemblies page', trace.CATEGORY_K8S):
+            page = pyk8s.cl.assemblies.get(field_selector=field_selector, label_selector=label_selector,
+                                           namespace=namespace, limit=page_size, _continue=token)
+        yield from page
+        token = page.metadata.get('continue')
+        if not token:
+            remaining = page.metadata.get('remainingItemCount')
+            if remaining:
+                raise click.ClickException(f'Kubernetes did not return a continue token to list the remaining '
+                                           f'{remaining} assemblies')
+            return
+
+
+@trace.traced('List cluster assemblies', trace.CATEGORY_K8S)
 def list_cluster_assemblies(field_selector=None, label_selector=None):
     """List assemblies via the kubernetes API"""
     return pyk8s.cl.assemblies.get(field_selector=field_selector, label_selector=label_selector, namespace=None)
 
 
-def format_assemblies_list_k8s(assembly_list):
+def _assembly_summary_k8s(asm, status=False):
+    """Name and namespace of an assembly returned from the kubernetes API, with its readiness if status is set"""
+    summary = {'name': asm['metadata']['name'], 'namespace': asm['metadata']['namespace']}
+    if status:
+        summary['status'] = _format_assembly_status(asm)
+        summary['ready'] = _assembly_ready(summary['status'])
+    return summary
+
+
+def format_assemblies_list_k8s(assembly_list, status=False):
     """Extract assemblies returned from the kubernetes API"""
     asm_list = []
     for asm in assembly_list:
         if 'metadata' in asm and 'name' in asm['metadata']:
-            asm_list.append((asm['metadata']['name'], asm['metadata']['namespace']))
+            summary = _assembly_summary_k8s(asm, status)
+            row = (summary['name'], summary['namespace'])
+            if status:
+                condition = summary['status'].get('AssemblyReady', {})
+                row += (summary['ready'], condition.get('message', condition.get('reason', '')))
+            asm_list.append(row)
 
-    return (asm_list, ['ASSEMBLY NAME', 'NAMESPACE'])
+    return (asm_list, ['ASSEMBLY NAME', 'NAMESPACE'] + (['READY', 'MESSAGE'] if status else []))
 
 
 def _format_assemblies_list_kxic(assembly_list):
@@ -152,6 +218,7 @@ def print_2d_list(data, headers):
     """
     click.echo(tabulate([headers] + (data), tablefmt="plain", numalign="left", stralign="left"))
 
+@trace.traced('Back up assemblies')
 def backup_assemblies(namespace, filepath, force):
     """Get assemblies' definitions"""
     res = get_assemblies_list(namespace)
@@ -211,7 +278,9 @@ def _read_assembly_file(filepath):
     return body
 
 
-def create_assemblies_from_file(filepath, hostname=None, realm=None, namespace=None, use_kubeconfig=False, wait=None):
+@trace.traced('Create assemblies')
+def create_assemblies_from_file(filepath, hostname=None, realm=None, namespace=None, use_kubeconfig=False, wait=None,
+                                wait_timeout=ASM_WAIT_TIMEOUT):
     """Apply assemblies from file"""
     if not filepath:
         click.echo('No assemblies to restore')
@@ -220,18 +289,26 @@ def create_assemblies_from_file(filepath, hostname=None, realm=None, namespace=N
 
     click.echo(f'Submitting assembly from {filepath}')
     created = []
-    if 'items' in asm_list:
-        for asm in asm_list['items']:
+    submitted = []
+    for asm in asm_list['items'] if 'items' in asm_list else [asm_list]:
+        if 'items' in asm_list:
             click.echo(f"Submitting assembly {asm['metadata']['name']}")
-            try_append(created, hostname, realm, namespace, asm, use_kubeconfig, wait)
-    else:
-        try_append(created, hostname, realm, namespace, asm_list, use_kubeconfig, wait)
+        if try_append(created, hostname, realm, namespace, asm, use_kubeconfig):
+            submitted.append(asm['metadata']['name'])
+
+    if wait and submitted:
+        not_ready = wait_for_assemblies_ready(submitted, hostname=hostname, realm=realm, namespace=namespace,
+                                              use_kubeconfig=use_kubeconfig, timeout=wait_timeout)
+        if not_ready:
+            raise click.ClickException(f'Assemblies not ready after {wait_timeout}s: {", ".join(not_ready)}')
 
     return created
 
-def try_append(created = None, hostname=None, realm=None, namespace=None, asm=None, use_kubeconfig=False, wait=None):
+def try_append(created = None, hostname=None, realm=None, namespace=None, asm=None, use_kubeconfig=False):
+    """Create an assembly and append the result to created, returns whether it was created"""
     try:
-        created.append(_create_assembly(hostname, realm, namespace, asm, use_kubeconfig, wait))
+        created.append(_create_assembly(hostname, realm, namespace, asm, use_kubeconfig))
+        return True
     except requests.exceptions.HTTPError as e:
         res = json.loads(e.response.text)
         click.echo(f"Error: {res['message']}. {res['detail']['message']}")
@@ -239,7 +316,127 @@ def try_append(created = None, hostname=None, realm=None, namespace=None, asm=No
         res = json.loads(e.body)
         click.echo(f"Error: {res['reason']}. {res['message']}")
 
-    return created
+    return False
+
+
+@trace.traced('Wait for assemblies to be ready')
+def wait_for_assemblies_ready(names, hostname=None, realm=None, namespace=None, use_kubeconfig=False,
+                              timeout=ASM_WAIT_TIMEOUT):
+    """Wait for assemblies to enter the Ready state, all of them together
+
+    Returns the names of the assemblies that were not ready before the timeout
+    """
+    if len(names) == 1:
+        click.echo('Waiting for assembly to enter "Ready" state')
+    else:
+        click.echo(f'Waiting for {len(names)} assemblies to enter "Ready" state')
+
+    return _wait_for_assemblies(names, hostname=hostname, realm=realm, namespace=namespace,
+                                use_kubeconfig=use_kubeconfig, timeout=timeout)
+
+
+def _wait_for_assemblies(names, deleted=False, hostname=None, realm=None, namespace=None, use_kubeconfig=False,
+                         timeout=ASM_WAIT_TIMEOUT, on_change=None):
+    """Wait for assemblies to become ready, or to be deleted when deleted is set
+
+    With use_kubeconfig the assemblies resource is watched so changes are seen as they happen,
+    otherwise the kxi-controller is polled every ASM_POLL_INTERVAL seconds.
+    Returns the names of the assemblies still pending at the timeout
+    """
+    if use_kubeconfig:
+        namespace = options_namespace.prompt(namespace)
+        return _watch_assemblies(namespace, names, deleted, timeout, on_change or _log_assembly_conditions)
+
+    return _poll_assemblies(names, deleted, hostname, realm, timeout)
+
+
+def _read_assembly_k8s(namespace, name):
+    """Read an assembly via the kubernetes API, None if it doesn't exist"""
+    try:
+        return pyk8s.cl.assemblies.read(name, namespace=namespace)
+    except pyk8s.exceptions.NotFoundError:
+        return None
+
+
+def _report_reached(name, deleted):
+    if deleted:
+        log.debug(f'Assembly {name} torn down')
+    else:
+        click.echo(f'Assembly {name} is ready')
+
+
+def _log_assembly_conditions(name, assembly_status):
+    log.debug(f'Assembly {name} conditions: {json.dumps(assembly_status)}')
+
+
+def _watch_assemblies(namespace, names, deleted, timeout, on_change):
+    """Wait for assemblies by watching the assemblies resource
+
+    Each watch lasts at most ASM_WATCH_TIMEOUT seconds, after which the pending assemblies are
+    read again so a change made before the watch started is still picked up.
+    """
+    deadline = time.monotonic() + timeout
+    conditions = {}
+
+    def reached(name, asm):
+        """Whether an assembly object, None once deleted, is in the awaited state"""
+        if asm is None:
+            done = deleted
+        else:
+            assembly_status = _format_assembly_status(asm)
+            if conditions.setdefault(name, assembly_status) != assembly_status:
+                conditions[name] = assembly_status
+                on_change(name, assembly_status)
+            done = not deleted and _assembly_ready(assembly_status)
+        if done:
+            _report_reached(name, deleted)
+            return True
+        return False
+
+    pending = [name for name in names if not reached(name, _read_assembly_k8s(namespace, name))]
+    while pending:
+        remaining = math.ceil(deadline - time.monotonic())
+        if remaining <= 0:
+            break
+
+        started = time.monotonic()
+        for event in pyk8s.cl.assemblies.watch(namespace=namespace, timeout=min(ASM_WATCH_TIMEOUT, remaining)):
+            name = event.raw_object.get('metadata', {}).get('name')
+            if name in pending and reached(name, None if event.type == 'DELETED' else event.raw_object):
+                pending.remove(name)
+                if not pending:
+                    break
+
+        pending = [name for name in pending if not reached(name, _read_assembly_k8s(namespace, name))]
+        # don't spin on a watch that closes straight away
+        if pending and time.monotonic() - started < 1:
+            time.sleep(min(ASM_POLL_INTERVAL, max(0, deadline - time.monotonic())))
+
+    return pending
+
+
+def _poll_assemblies(names, deleted, hostname, realm, timeout):
+    """Wait for assemblies by polling the kxi-controller at a fixed interval"""
+    deadline = time.monotonic() + timeout
+    pending = [*names]
+    while True:
+        for name in [*pending]:
+            try:
+                done = _assembly_status(name=name, hostname=hostname, realm=realm) and not deleted
+            except click.ClickException as exception:
+                if exception.message != f'Assembly {name} not found':
+                    raise
+                done = deleted
+            if done:
+                _report_reached(name, deleted)
+                pending.remove(name)
+
+        remaining = deadline - time.monotonic()
+        if not pending or remaining <= 0:
+            break
+        time.sleep(min(ASM_POLL_INTERVAL, remaining))
+
+    return pending
 
 def _add_last_applied_configuration_annotation(body):
     annotated_body = copy.deepcopy(body)
@@ -258,7 +455,7 @@ def _create_assembly_k8s(namespace, body):
     return asm.create_(namespace=namespace)
 
 
-def _create_assembly(hostname, realm, namespace, body, use_kubeconfig, wait=None):
+def _create_assembly(hostname, realm, namespace, body, use_kubeconfig):
     """Create an assembly"""
 
     if 'resourceVersion' in body['metadata']:
@@ -272,19 +469,6 @@ def _create_assembly(hostname, realm, namespace, body, use_kubeconfig, wait=None
         assembly = get_assembly_object(hostname, realm=realm)
         assembly.deploy(body)
 
-    if wait:
-        with click.progressbar(range(10), label='Waiting for assembly to enter "Ready" state') as bar:
-            for n in bar:
-                if _assembly_status(
-                    hostname=hostname,
-                    name=body['metadata']['name'],
-                    realm=realm,
-                    namespace=namespace,
-                    use_kubeconfig=use_kubeconfig
-                ):
-                    break
-                time.sleep((2 ** n) + (random.randint(0, 1000) / 1000))
-
     click.echo(f'Custom assembly resource {body["metadata"]["name"]} created!')
     return True
 
@@ -301,7 +485,8 @@ def _delete_assembly_k8s_api(namespace, name):
     return True
 
 
-def _delete_assembly(namespace=None, name=None, wait=None, force=False, hostname=None, realm=None, use_kubeconfig=False):
+def _delete_assembly(namespace=None, name=None, wait=None, force=False, hostname=None, realm=None, use_kubeconfig=False,
+                     wait_timeout=ASM_WAIT_TIMEOUT):
     """Deletes an assembly given its name"""
     click.echo(f'Tearing down assembly {name}')
 
@@ -319,32 +504,22 @@ def _delete_assembly(namespace=None, name=None, wait=None, force=False, hostname
         return False
 
     if wait:
-        return wait_for_assembly_teardown(namespace, name, hostname, realm, use_kubeconfig)
+        return wait_for_assembly_teardown(namespace, name, hostname, realm, use_kubeconfig, timeout=wait_timeout)
 
     return True
 
-def wait_for_assembly_teardown(namespace, name, hostname, realm, use_kubeconfig):
-    asm_running = True
-    with click.progressbar(range(10), label='Waiting for assembly to be torn down') as bar:
-        for n in bar:
-            try:
-                _assembly_status(namespace,
-                    name,
-                    hostname,
-                    realm,
-                    use_kubeconfig,
-                )
-            except click.ClickException as exception:
-                if exception.message == f'Assembly {name} not found':
-                    asm_running = False
-                    break
-            time.sleep((2 ** n) + (random.randint(0, 1000) / 1000))
+@trace.traced('Wait for assembly teardown')
+def wait_for_assembly_teardown(namespace, name, hostname, realm, use_kubeconfig, timeout=ASM_WAIT_TIMEOUT):
+    click.echo('Waiting for assembly to be torn down')
+    asm_running = _wait_for_assemblies([name], deleted=True, hostname=hostname, realm=realm, namespace=namespace,
+                                       use_kubeconfig=use_kubeconfig, timeout=timeout)
     if asm_running:
         log.error('Assembly was not torn down in time, exiting')
 
     return not asm_running
 
 
+@trace.traced('Tear down assemblies')
 def delete_running_assemblies(namespace, wait, force):
     """Deletes all assemblies running in a namespace"""
     asm_list = get_assemblies_list(namespace)
@@ -377,8 +552,9 @@ def backup(namespace, filepath, force):
 @arg.namespace()
 @arg.assembly_filepath()
 @arg.assembly_wait()
+@arg.assembly_wait_timeout()
 @arg.use_kubeconfig()
-def deploy(hostname, client_id, client_secret, realm, namespace, filepath, use_kubeconfig, wait):
+def deploy(hostname, client_id, client_secret, realm, namespace, filepath, use_kubeconfig, wait, wait_timeout):
     """Create an assembly given an assembly file"""
     filepath = assembly_filepath.prompt(filepath)
     host = options.get_hostname()
@@ -388,7 +564,8 @@ def deploy(hostname, client_id, client_secret, realm, namespace, filepath, use_k
         realm=realm,
         namespace=namespace,
         use_kubeconfig=use_kubeconfig,
-        wait=wait
+        wait=wait,
+        wait_timeout=wait_timeout
     )
 
 
@@ -396,22 +573,25 @@ def deploy(hostname, client_id, client_secret, realm, namespace, filepath, use_k
 @arg.namespace()
 @arg.assembly_name()
 @arg.assembly_wait()
+@arg.assembly_wait_timeout()
 @arg.hostname()
 @arg.client_id()
 @arg.client_secret()
 @arg.realm()
 @arg.use_kubeconfig()
-def status(namespace, name, wait, hostname, client_id, client_secret, realm, use_kubeconfig):
+def status(namespace, name, wait, wait_timeout, hostname, client_id, client_secret, realm, use_kubeconfig):
     """Print status of the assembly"""
     host = options.get_hostname()
     namespace = options_namespace.prompt(namespace)
 
     if wait:
-        with click.progressbar(range(10), label='Waiting for assembly to enter "Ready" state') as bar:
-            for n in bar:
-                if _assembly_status(namespace, name, host, realm, use_kubeconfig, print_status=True):
-                    break
-                time.sleep((2 ** n) + (random.randint(0, 1000) / 1000))
+        click.echo('Waiting for assembly to enter "Ready" state')
+        if not _assembly_status(namespace, name, host, realm, use_kubeconfig, print_status=True):
+            # stream condition changes until the assembly is ready
+            print_conditions = lambda name, assembly_status: click.echo(json.dumps(assembly_status, indent=2))
+            if _wait_for_assemblies([name], hostname=host, realm=realm, namespace=namespace,
+                                    use_kubeconfig=use_kubeconfig, timeout=wait_timeout, on_change=print_conditions):
+                raise click.ClickException(f'Assembly {name} not ready after {wait_timeout}s')
     else:
         _assembly_status(namespace, name, host, realm, use_kubeconfig, print_status=True)
 
@@ -423,10 +603,20 @@ def status(namespace, name, wait, hostname, client_id, client_secret, realm, use
 @arg.realm()
 @arg.namespace()
 @arg.use_kubeconfig()
-def list(hostname, realm, client_id, client_secret, namespace, use_kubeconfig):
+@arg.assembly_selector()
+@arg.assembly_field_selector()
+@arg.assembly_name_prefix()
+@arg.assembly_ready()
+@arg.assembly_page_size()
+@arg.assembly_all_namespaces()
+@arg.assembly_status()
+@arg.assembly_output_format()
+def list(hostname, realm, client_id, client_secret, namespace, use_kubeconfig, selector, field_selector,
+         name_prefix, ready, page_size, all_namespaces, status, output_format):
     """List assemblies"""
     host = options.get_hostname()
-    if _list_assemblies(host, realm, namespace, use_kubeconfig):
+    if _list_assemblies(host, realm, namespace, use_kubeconfig, selector, field_selector, name_prefix, ready,
+                        page_size, all_namespaces, status, output_format.lower()):
         sys.exit(0)
     else:
         sys.exit(1)
@@ -436,16 +626,17 @@ def list(hostname, realm, client_id, client_secret, namespace, use_kubeconfig):
 @arg.namespace()
 @arg.assembly_name()
 @arg.assembly_wait()
+@arg.assembly_wait_timeout()
 @arg.force()
 @arg.hostname()
 @arg.client_id()
 @arg.client_secret()
 @arg.realm()
 @arg.use_kubeconfig()
-def teardown(namespace, name, wait, force, hostname, client_id, client_secret, realm, use_kubeconfig):
+def teardown(namespace, name, wait, wait_timeout, force, hostname, client_id, client_secret, realm, use_kubeconfig):
     """Tears down an assembly given its name"""
     host = options.get_hostname()
-    _delete_assembly(namespace, name, wait, force, host, realm, use_kubeconfig)
+    _delete_assembly(namespace, name, wait, force, host, realm, use_kubeconfig, wait_timeout)
 
 
 def get_preferred_api_version(group_name):
@@ -457,8 +648,11 @@ def get_preferred_api_version(group_name):
 
 
 def get_assembly_object(hostname, realm):
-    store = CredentialStore(name = options.get_profile(), file_path= common.token_cache_file, 
-                            file_format= common.token_cache_format)
+    return http.shared_client(('assembly', hostname, realm), lambda: _create_assembly_object(hostname, realm))
+
+
+def _create_assembly_object(hostname, realm):
+    store = auth.credential_store(common.token_cache_file)
 
     grant_type = store.get('grant_type', default=TokenType.SERVICEACCOUNT)
     client_id = options.get_serviceaccount_id()
@@ -14,6 +14,7 @@
 from kxicli.options import namespace as options_namespace
 from kxicli.commands.common import arg
 from kxicli.cli_group import ProfileAwareGroup, cli
+from kxicli.resources import helm
 
 AZURE_NODENAME_PREFIX: str = 'aks'
 GCP_NODENAME_PREFIX: str = 'gke'
@@ -443,15 +444,14 @@ def _create_secrets(storage_details, restic_pw, namespace):
 
 def _install_operator(namespace):
     try:
-        subprocess.run(['helm', 'repo', 'add', 'k8up-io',
-                       'https://k8up-io.github.io/k8up'], check=True)
+        helm.run(['helm', 'repo', 'add', 'k8up-io', 'https://k8up-io.github.io/k8up'], invalidate=True, check=True)
     except subprocess.CalledProcessError as cpe:
         raise ClickException(str(cpe))
 
     install_base_command = ['helm', 'upgrade', '--install',
                             '--namespace', namespace, 'k8up', 'k8up-io/k8up', '--version', K8UP_HELM_VERSION]
     try:
-        subprocess.run(install_base_command, check=True)
+        helm.run(install_base_command, invalidate=True, check=True)
         click.secho('Kubernetes Backup Operator installed.', bold=True)
     except subprocess.CalledProcessError as cpe:
         raise ClickException(str(cpe))
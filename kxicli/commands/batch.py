@@ -0,0 +1,182 @@
+import io
+import shlex
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import click
+from kxi import DeploymentType
+
+from kxicli import cli_group, log
+from kxicli.cli_group import cli
+from kxicli.resources import daemon as daemon_lib
+from kxicli.resources import http
+
+# Commands that write the configuration file, which the other commands of a batch read
+CONFIG_COMMANDS = ('configure', 'install')
+
+
+class _ThreadOutput(io.TextIOBase):
+    """Stream writing to a buffer of the current thread while it captures its output, to stream otherwise"""
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    @property
+    def encoding(self):
+        return getattr(self.stream, 'encoding', 'utf-8')
+
+    def _captured(self):
+        return getattr(self._local, 'captured', None)
+
+    def write(self, s):
+        if not isinstance(s, str):
+            raise TypeError(f'write() argument must be str, not {type(s).__name__}')
+        captured = self._captured()
+        return (self.stream if captured is None else captured).write(s)
+
+    def flush(self):
+        if self._captured() is None:
+            self.stream.flush()
+
+    def isatty(self):
+        return self._captured() is None and self.stream.isatty()
+
+    @contextmanager
+    def capture(self):
+        self._local.captured = io.StringIO()
+        try:
+            yield self._local.captured
+        finally:
+            self._local.captured = None
+
+
+def _read_commands(commands_file):
+    """Arguments of each command in the file with their line number"""
+    commands = []
+    for number, line in enumerate(commands_file, start=1):
+        try:
+            args = shlex.split(line, comments=True)
+        except ValueError as e:
+            raise click.ClickException(f'Could not parse line {number}: {e}')
+        if args[:1] == ['kxi']:
+            args = args[1:]
+        if not args:
+            continue
+        if daemon_lib.command_name(args) == 'batch':
+            raise click.ClickException(f'Line {number} runs kxi batch, batches can\'t be nested')
+        commands.append((number, args))
+    return commands
+
+
+def _selected_profile(args):
+    """Profile selected by a command line, None if it uses the one of the batch"""
+    profile = None
+    for i, arg in enumerate(args):
+        if arg == '--profile' and i + 1 < len(args):
+            profile = args[i + 1]
+        elif arg.startswith('--profile='):
+            profile = arg.split('=', 1)[1]
+        elif arg == daemon_lib.command_name(args):
+            break
+    return profile
+
+
+def _check_parallel(number, args, profile):
+    """Raise if the command of a line can't run in parallel with the other commands of the batch"""
+    name = daemon_lib.command_name(args)
+    if _selected_profile(args) not in (None, profile):
+        raise click.ClickException(f'Line {number} selects profile {_selected_profile(args)}, '
+                                   f'only commands using the profile of the batch can run in parallel')
+    # debug logging is switched on for the whole process, not a single command
+    if '--debug' in (args[:args.index(name)] if name else args):
+        raise click.ClickException(f'Line {number} enables debug logging, '
+                                   f'pass --debug to kxi batch to debug commands running in parallel')
+    if name in CONFIG_COMMANDS:
+        raise click.ClickException(f'Line {number} runs kxi {name}, which writes the configuration and '
+                                   f'can\'t run in parallel')
+
+
+def _run_sequential(commands, profile, keep_going):
+    """Run commands one after the other, returns their exit codes with None for those skipped after a failure"""
+    results = [None] * len(commands)
+    for i, (_, args) in enumerate(commands):
+        results[i] = cli_group.invoke(['--profile', profile, *args])
+        if results[i] and not keep_going:
+            break
+    return results
+
+
+def _run_parallel(commands, profile, keep_going, parallel):
+    """Run commands on a pool of threads, see _run_sequential for the result
+
+    The output of each command is printed once it and all commands before it finished.
+    """
+    failed = threading.Event()
+    stdout, stderr = _ThreadOutput(sys.stdout), _ThreadOutput(sys.stderr)
+
+    def run(command):
+        if failed.is_set() and not keep_going:
+            return None, '', ''
+        _, args = command
+        with stdout.capture() as out, stderr.capture() as err:
+            code = cli_group.invoke(['--profile', profile, *args])
+        if code:
+            failed.set()
+        return code, out.getvalue(), err.getvalue()
+
+    results = []
+    sys.stdout, sys.stderr = stdout, stderr
+    try:
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            for code, out, err in executor.map(run, commands):
+                click.echo(out, nl=False)
+                click.echo(err, nl=False, err=True)
+                results.append(code)
+    finally:
+        sys.stdout, sys.stderr = stdout.stream, stderr.stream
+    return results
+
+
+@cli.command(usage=[DeploymentType.MICROSERVICES, DeploymentType.ENTERPRISE])
+@click.option('--file', '-f', 'commands_file', type=click.File('r'), default='-',
+              help='File with one kxi command per line, - to read them from stdin')
+@click.option('--parallel', type=click.IntRange(min=1), default=1,
+              help='Number of commands to run at the same time, only for commands that don\'t depend on each other')
+@click.option('--keep-going', is_flag=True, default=False, help='Run the remaining commands after one fails')
+@click.pass_context
+def batch(ctx, commands_file, parallel, keep_going):
+    """Run kxi commands from a file in a single process
+
+    Each line holds the arguments of one command, with or without the leading kxi. Blank lines and
+    comments starting with # are ignored. Commands use the profile of the batch unless they select
+    another one, and share the configuration, Kubernetes client, HTTP connections and tokens.
+
+    With --parallel the output of a command is printed once it finished, in the order of the file.
+    Output of helm and kubectl isn't held back. Commands running in parallel can't prompt for input, enable
+    debug logging or write the configuration, which rules out configure and install.
+    """
+    profile = ctx.find_root().params['profile']
+    commands = _read_commands(commands_file)
+    if parallel > 1:
+        for number, args in commands:
+            _check_parallel(number, args, profile)
+
+    start = time.perf_counter()
+    with http.keep_alive():
+        if parallel > 1:
+            results = _run_parallel(commands, profile, keep_going, parallel)
+        else:
+            results = _run_sequential(commands, profile, keep_going)
+    skipped = results.count(None)
+    log.debug(f'Ran {len(commands) - skipped} commands in {time.perf_counter() - start:.2f}s')
+
+    failures = [(number, args, code) for (number, args), code in zip(commands, results) if code]
+    for number, args, code in failures:
+        log.error(f'Line {number} (kxi {daemon_lib.command_name(args)}) exited with {code}')
+    if skipped:
+        log.warn(f'Skipped {skipped} commands after a failure')
+    if failures:
+        raise click.ClickException(f'{len(failures)} of {len(commands)} commands failed')
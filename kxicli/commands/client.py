@@ -2,7 +2,6 @@
 import sys
 
 import click
-import requests
 from requests.exceptions import HTTPError
 
 from kxicli import common
@@ -10,10 +9,9 @@
 from kxicli import options
 from kxicli.commands.common import arg
 from kxicli.cli_group import cli, ProfileAwareGroup
-from kxicli.resources import auth
+from kxicli.resources import auth, http
 from kxicli.resources.auth import TokenType
 from kxi.client_controller import ClientController, Client
-from kxi.auth import CredentialStore
 from kxicli.resources import auth as auth_lib
 
 @cli.group(cls=ProfileAwareGroup)
@@ -60,7 +58,7 @@ def info(hostname, uid):
     url = f'https://{host}/informationservice/details/{uid}'
    
     try:
-        r = requests.get(url)
+        r = http.session(url).get(url)
         click.echo(json.dumps(r.json(), indent=2))
     except HTTPError as e:
         common.handle_http_exception(e, "Failed to get client info: ")
@@ -81,15 +79,18 @@ def list_clients(hostname, realm, username, password):
         'Accept': 'application/json'
     }
     try:
-        r = requests.get(url, headers=headers)
+        r = http.session(url).get(url, headers=headers)
         r.raise_for_status()
         click.echo(json.dumps(r.json(), indent=2))
     except HTTPError as e:
         common.handle_http_exception(e, "Failed to list clients: ")
 
 def get_clientcontroller_object(host, realm):
-    store = CredentialStore(name = options.get_profile(), file_path= common.token_cache_file, 
-                            file_format= common.token_cache_format)
+    return http.shared_client(('client_controller', host, realm), lambda: _create_clientcontroller_object(host, realm))
+
+
+def _create_clientcontroller_object(host, realm):
+    store = auth_lib.credential_store(common.token_cache_file)
 
     grant_type = store.get('grant_type', default=TokenType.SERVICEACCOUNT)
     client_id = options.get_serviceaccount_id()
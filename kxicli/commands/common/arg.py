@@ -43,6 +43,24 @@ def combined(func):
 
 assembly_wait = options.assembly_wait.decorator()
 
+assembly_wait_timeout = options.assembly_wait_timeout.decorator()
+
+assembly_selector = options.assembly_selector.decorator()
+
+assembly_field_selector = options.assembly_field_selector.decorator()
+
+assembly_name_prefix = options.assembly_name_prefix.decorator()
+
+assembly_ready = options.assembly_ready.decorator()
+
+assembly_page_size = options.assembly_page_size.decorator()
+
+assembly_all_namespaces = options.assembly_all_namespaces.decorator()
+
+assembly_status = options.assembly_status.decorator()
+
+assembly_output_format = options.assembly_output_format.decorator()
+
 output_file = options.output_file.decorator()
 
 license_secret = options.license_secret.decorator()
@@ -121,6 +139,10 @@ def combined(func):
 
 management_version = options.management_version.decorator()
 
+upgrade_plan = options.upgrade_plan.decorator()
+
+apply_upgrade_plan = options.apply_upgrade_plan.decorator()
+
 chart = partial(
     click.argument, 'chart', default=f"{default_val(key_chart_repo_name)}/insights"
 )
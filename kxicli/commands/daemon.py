@@ -0,0 +1,118 @@
+import importlib
+import io
+import os
+import sys
+
+import click
+import pyk8s
+from kxi import DeploymentType
+
+from kxicli import cli_group, log
+from kxicli.cli_group import ProfileAwareGroup, cli
+from kxicli.resources import daemon as daemon_lib
+from kxicli.resources import http
+
+ALL_USAGES = [DeploymentType.MICROSERVICES, DeploymentType.ENTERPRISE]
+
+socket_option = click.option('--socket', 'socket_file', type=click.Path(dir_okay=False),
+                             help=f'Path of the daemon socket, defaults to ${daemon_lib.ENV_DAEMON_SOCKET} '
+                                  'or ~/.insights/kxi-daemon.sock')
+
+
+@cli.group(cls=ProfileAwareGroup, usage=ALL_USAGES)
+def daemon():
+    """Keep the CLI loaded in a background process to run commands faster"""
+
+
+def _kube_namespace():
+    try:
+        return pyk8s.cl.config.namespace
+    except Exception:
+        return None
+
+
+def _warm_up():
+    """Load everything an invocation would otherwise load on its own"""
+    for module in cli_group.LAZY_COMMANDS.values():
+        importlib.import_module(module)
+    namespace = _kube_namespace()
+    log.debug(f'Loaded kube config, namespace {namespace}')
+
+
+def _run_invocation(request):
+    """Run a forwarded invocation of kxi in this process, returns its exit code"""
+    environ, cwd, stdin = dict(os.environ), os.getcwd(), sys.stdin
+    debug, namespace = log.GLOBAL_DEBUG_LOG, _kube_namespace()
+
+    os.environ.clear()
+    os.environ.update(request['env'])
+    try:
+        os.chdir(request['cwd'])
+        # forwarded invocations can't be answered, prompts abort
+        sys.stdin = io.StringIO()
+        log.GLOBAL_DEBUG_LOG = False
+        return cli_group.invoke(request['argv'])
+    except OSError as e:
+        click.echo(f'Error: {e}', err=True)
+        return 1
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        os.chdir(cwd)
+        sys.stdin = stdin
+        log.GLOBAL_DEBUG_LOG = debug
+        if namespace is not None:
+            pyk8s.cl.config.namespace = namespace
+
+
+def _path(socket_file):
+    return socket_file or daemon_lib.socket_path()
+
+
+@daemon.command(usage=ALL_USAGES)
+@socket_option
+@click.option('--idle-timeout', type=float, default=0,
+              help='Stop after this many seconds without an invocation, 0 to keep running')
+def start(socket_file, idle_timeout):
+    """Run the daemon in the foreground
+
+    Invocations of kxi with KXI_DAEMON=1 in their environment are run by the daemon, which keeps the
+    command modules, Kubernetes client, HTTP connections and tokens loaded between them. They run one at a
+    time and can't prompt for input, pass every value as an option or set it in the configuration file.
+    Invocations with a different HOME, KUBECONFIG or service account environment are run by kxi itself.
+    """
+    path = _path(socket_file)
+    server = daemon_lib.Daemon(path, _run_invocation, idle_timeout)
+    try:
+        listener = server.listen()
+    except (RuntimeError, OSError) as e:
+        raise click.ClickException(str(e))
+
+    _warm_up()
+    click.echo(f'Listening on {path}')
+    with http.keep_alive():
+        server.serve(listener)
+    click.echo(f'Stopped after {server.served} invocations')
+
+
+@daemon.command(usage=ALL_USAGES)
+@socket_option
+def status(socket_file):
+    """Show whether a daemon is running"""
+    path = _path(socket_file)
+    reply = daemon_lib.control('status', path)
+    if reply is None:
+        raise click.ClickException(f'No kxi daemon is listening on {path}')
+    click.echo(f'kxi daemon {reply["pid"]} listening on {path}, '
+               f'up {reply["uptime"]:.0f}s, ran {reply["served"]} invocations')
+
+
+@daemon.command(usage=ALL_USAGES)
+@socket_option
+def stop(socket_file):
+    """Stop a running daemon"""
+    path = _path(socket_file)
+    reply = daemon_lib.control('stop', path)
+    if reply is None:
+        raise click.ClickException(f'No kxi daemon is listening on {path}')
+    click.echo(f'Stopping kxi daemon {reply["pid"]}')
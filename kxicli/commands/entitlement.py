@@ -1,18 +1,27 @@
 from __future__ import annotations
 
 import click
+import csv
+import fnmatch
+import hashlib
 import json
-import sys
+import jwt
+import os
+import tempfile
+import time
 import uuid
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 from pydantic.json import pydantic_encoder
 from typing import List
 
-from kxi.entitlement import EntitlementService, EntityType
+from kxi.entitlement import Actor, Entitlement, EntitlementService, EntityType
 from kxicli import options, common, log
 from kxicli.commands.common import arg
 from kxicli.cli_group import ProfileAwareGroup, cli
-from kxi.auth import CredentialStore
+from kxicli.resources import auth, http
 from kxicli.resources.auth import TokenType
 
 api_client_params = arg.combine_decorators(
@@ -21,6 +30,12 @@
     arg.timeout()
 )
 
+cache_params = arg.combine_decorators(
+    click.option('--cache-ttl', type=click.IntRange(min=0),
+                 help=f'{common.get_help_text(common.key_entitlement_cache_ttl)}, '
+                      'cached data older than this is fetched again'),
+    click.option('--no-cache', is_flag=True, help='Do not read or write the local cache')
+)
 
 # ** Internal functions ** #
 
@@ -55,16 +70,132 @@ def _parse_groups(groups: str) -> List[uuid.UUID]:
     return ids
 
 
-def _exception_handler(exception_type, exception, traceback):
-    """Squash tracebacks for the CLI unless the --debug flag is set
+def _updated_groups(groups, add, remove):
+    """Groups of an entity after removing and then adding groups, keeping the existing order"""
+    updated = [g for g in (groups or []) if g not in remove]
+    updated.extend(g for g in add if g not in updated)
+    return updated
+
+
+def _read_batch_file(filepath: str) -> List[dict]:
+    """Read group changes from a csv file with id, add and remove columns or a yaml list
+
+    Groups are separated by ';' in csv and can be a list or a comma separated string in yaml.
     """
-    if not log.GLOBAL_DEBUG_LOG:
-        click.echo(f"{exception_type.__name__}: {exception}")
-    else:
-        sys.__excepthook__(exception_type, exception, traceback)
+    with open(filepath, newline='') as f:
+        if filepath.lower().endswith(('.yaml', '.yml')):
+            rows = yaml.safe_load(f) or []
+        else:
+            rows = [*csv.DictReader(f)]
+
+    changes = []
+    for row, change in enumerate(rows, start=1):
+        groups = {}
+        for key in ('add', 'remove'):
+            value = change.get(key) or ''
+            if not isinstance(value, str):
+                value = ','.join(str(g) for g in value)
+            groups[key] = _parse_groups(value.replace(';', ',')) if value.strip() else []
+        try:
+            entity_id = uuid.UUID(str(change.get('id')).strip())
+        except ValueError:
+            raise click.ClickException(f'Row {row}: {change.get("id")} is not a valid UUID')
+        changes.append({'id': entity_id, **groups})
+
+    return changes
+
+
+def _apply_group_changes(e, id, add, remove, conflict_retries):
+    """Add and remove groups of an entity, returns whether it was updated, unchanged or in conflict
+
+    The entity is read again right before it's updated, if its groups changed in the meantime the change
+    is recomputed from the latest groups up to conflict_retries times before reporting a conflict.
+    """
+    entity = e.get(id)
+    for _ in range(conflict_retries + 1):
+        updated = _updated_groups(entity.groups, add, remove)
+        if updated == [*(entity.groups or [])]:
+            return 'unchanged'
+        latest = e.get(id)
+        if latest.groups == entity.groups:
+            e.update(id, groups=updated)
+            return 'updated'
+        entity = latest
+    return 'conflict'
+
+
+def _cache_identity(e) -> str:
+    """Client and, for user logins, the user the data is fetched for, they can be entitled to different data"""
+    identity = str(e.client_id)
+    store = auth.credential_store(common.token_cache_file)
+    if store.get('grant_type', default=TokenType.SERVICEACCOUNT) == TokenType.USER:
+        token = store.get_token() or {}
+        try:
+            claims = jwt.decode(token.get('access_token', ''), options={'verify_signature': False})
+        except jwt.PyJWTError:
+            claims = {}
+        identity += f'/{claims.get("sub")}'
+    return identity
 
 
-sys.excepthook = _exception_handler
+def _cache_file(host: str, realm: str, identity: str, kind: str) -> Path:
+    """Cache file for entities or actors of a host and identity, kept separately for each profile"""
+    key = hashlib.sha256(f'{host}/{realm}/{identity}'.encode()).hexdigest()[:16]
+    return common.cache_path / 'entitlements' / f'{options.get_profile()}-{key}-{kind}.json'
+
+
+def _read_cache(path: Path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path: Path, data):
+    """Replace the cache file atomically so concurrent calls never read a partial file
+
+    The data lists identities, so the file is only readable by its owner.
+    """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', dir=path.parent, delete=False) as f:
+            os.chmod(f.name, 0o600)
+            json.dump({'fetched_at': time.time(), 'data': data}, f)
+        os.replace(f.name, path)
+    except OSError as e:
+        log.debug(f'Could not write cache {path}: {e}')
+
+
+def _fetch(e, kind):
+    """Fetch entities or actors from the service as json data"""
+    data = e.list() if kind == 'entities' else e.actors()
+    return json.loads(json.dumps(data, default=pydantic_encoder))
+
+
+def _cached_fetch(e, hostname, realm, kind, cache_ttl, no_cache):
+    """Entities or actors from the local cache while younger than cache_ttl, otherwise from the service
+
+    The cache is neither read nor written with a cache_ttl of 0, the default.
+    """
+    if cache_ttl is None:
+        cache_ttl = int(common.get_default_val(common.key_entitlement_cache_ttl))
+    if no_cache or not cache_ttl:
+        return _fetch(e, kind)
+
+    path = _cache_file(_ensure_host(hostname), realm, _cache_identity(e), kind)
+    cached = _read_cache(path)
+    if cached and time.time() - cached.get('fetched_at', 0) < cache_ttl:
+        log.debug(f'Using cached {kind} from {path}')
+        return cached['data']
+
+    data = _fetch(e, kind)
+    _write_cache(path, data)
+    return data
+
+
+def _matches(value, pattern):
+    return pattern is None or (value is not None and fnmatch.fnmatchcase(str(value), pattern))
 
 
 # ** Click commands ** #
@@ -76,8 +207,19 @@ def entitlement():
 
 
 @entitlement.command()
+@click.option('--name', help='Only list entities whose name matches this pattern, e.g. "sales-*"')
+@click.option('--type', 'entity_type', type=EntityType, help='Only list entities of this type')
+@click.option('--owner', type=click.UUID, help='Only list entities owned by this user ID')
+@click.option('--group', type=click.UUID, help='Only list entities assigned to this group ID')
+@cache_params
 @api_client_params
 def list(
+    name,
+    entity_type,
+    owner,
+    group,
+    cache_ttl,
+    no_cache,
     hostname,
     realm,
     timeout
@@ -85,12 +227,26 @@ def list(
     """List entitlements"""
     e = get_credentialstore_object(hostname , realm , timeout)
 
-    click.echo(json.dumps(e.list(), default=pydantic_encoder))
+    entities = [Entitlement.parse_obj(d) for d in _cached_fetch(e, hostname, realm, 'entities', cache_ttl, no_cache)]
+    entities = [
+        x for x in entities
+        if _matches(x.entity, name)
+        and (entity_type is None or x.entityType == entity_type)
+        and (owner is None or x.owner == owner)
+        and (group is None or group in (x.groups or []))
+    ]
+
+    click.echo(json.dumps(entities, default=pydantic_encoder))
 
 
 @entitlement.command()
+@click.option('--name', help='Only list actors whose name or path matches this pattern, e.g. "/quants*"')
+@cache_params
 @api_client_params
 def actors(
+    name,
+    cache_ttl,
+    no_cache,
     hostname,
     realm,
     timeout
@@ -101,7 +257,10 @@ def actors(
     """
     e = get_credentialstore_object(hostname , realm , timeout)
 
-    click.echo(json.dumps(e.actors(), default=pydantic_encoder))
+    actors = [Actor.parse_obj(d) for d in _cached_fetch(e, hostname, realm, 'actors', cache_ttl, no_cache)]
+    actors = [x for x in actors if _matches(x.name, name) or (name is not None and _matches(x.path, name))]
+
+    click.echo(json.dumps(actors, default=pydantic_encoder))
 
 
 @entitlement.command()
@@ -259,9 +418,64 @@ def rm_groups(
     # update entity
     click.echo(json.dumps(e.update(id, groups=new_groups), default=pydantic_encoder))
 
+
+@entitlement.command()
+@click.option('--file', 'filepath', required=True, type=click.Path(exists=True, dir_okay=False),
+              help="""csv or yaml file of entity ids with groups to add and remove,
+              groups are ';' separated in csv""")
+@click.option('--workers', default=8, show_default=True, type=click.IntRange(min=1),
+              help='Number of entities to update concurrently')
+@click.option('--conflict-retries', default=1, show_default=True, type=click.IntRange(min=0),
+              help='Number of times a change is recomputed when an entity changed since it was read')
+@api_client_params
+def batch(
+    filepath,
+    workers,
+    conflict_retries,
+    hostname,
+    realm,
+    timeout
+):
+    """Add and remove groups for many entitlements
+
+    The file has a row per entity with its id and the comma separated groups to add and remove,
+    e.g. a csv file with the header id,add,remove.
+    """
+    changes = _read_batch_file(filepath)
+    e = get_credentialstore_object(hostname, realm, timeout)
+
+    @common.in_current_context
+    def apply(change):
+        try:
+            return _apply_group_changes(e, change['id'], change['add'], change['remove'], conflict_retries)
+        except Exception as ex:
+            return f'failed: {ex}'
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for change, result in zip(changes, executor.map(apply, changes)):
+            results[result] = results.get(result, 0) + 1
+            if result == 'conflict':
+                click.echo(f'{change["id"]}: conflict, the entity kept changing while it was updated', err=True)
+            elif result.startswith('failed'):
+                click.echo(f'{change["id"]}: {result}', err=True)
+            else:
+                click.echo(f'{change["id"]}: {result}')
+
+    failed = len(changes) - results.get('updated', 0) - results.get('unchanged', 0)
+    click.echo(f'{results.get("updated", 0)} updated, {results.get("unchanged", 0)} unchanged, '
+               f'{results.get("conflict", 0)} conflicts, {failed - results.get("conflict", 0)} failed')
+    if failed:
+        raise click.ClickException(f'Failed to update {failed} entitlements')
+
+
 def get_credentialstore_object(hostname, realm, timeout):
-    store = CredentialStore(name = options.get_profile(), file_path= common.token_cache_file, 
-                            file_format= common.token_cache_format)
+    return http.shared_client(('entitlement', hostname, realm, timeout),
+                              lambda: _create_credentialstore_object(hostname, realm, timeout))
+
+
+def _create_credentialstore_object(hostname, realm, timeout):
+    store = auth.credential_store(common.token_cache_file)
     
     grant_type = store.get('grant_type', default=TokenType.SERVICEACCOUNT)
     client_id = options.get_serviceaccount_id()
@@ -277,4 +491,4 @@ def get_credentialstore_object(hostname, realm, timeout):
         grant_type=grant_type,
         client_secret = options.get_serviceaccount_secret(), 
         cache=store
-    )
\ No newline at end of file
+    )
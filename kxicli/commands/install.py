@@ -6,6 +6,8 @@
 import os
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Callable, Optional, cast
 
@@ -28,7 +30,7 @@
 from kxicli.commands import assembly
 from kxicli.commands.common import arg
 from kxicli.common import get_default_val as default_val, key_gui_client_secret, key_operator_client_secret
-from kxicli.resources import helm, helm_chart
+from kxicli.resources import chart_cache, helm, helm_chart, trace
 
 DOCKER_CONFIG_FILE_PATH = str(Path.home() / '.docker' / 'config.json')
 operator_namespace = 'kxi-operator'
@@ -67,7 +69,13 @@
 management_service_namespace = 'kxi-management'
 management_service_release = 'kxi-management-service'
 
-@cli.group('install', cls=ProfileAwareGroup, aliases=['azure'])
+UPGRADE_PLAN_VERSION = 1
+# upgrade options an upgrade plan sets, they can't be passed with --apply-plan
+UPGRADE_PLAN_PARAMS = ['namespace', 'release', 'chart_repo_name', 'chart_repo_url', 'chart_repo_username', 'version',
+                       'operator_version', 'image_pull_secret', 'license_secret', 'filepath', 'chart',
+                       'management_version']
+
+@cli.group('install', cls=ProfileAwareGroup, aliases=['azure'], lazy_commands={'idp': 'kxicli.commands.azure_idp'})
 def install():
     """Insights installation commands"""
 
@@ -106,10 +114,22 @@ def setup(namespace, chart_repo_name, chart_repo_url, chart_repo_username,
     keycloak_postgresql_secret = lookup_secret(namespace, keycloak_postgresql_secret, None, 'keycloak.postgresqlSecret')
     ingress_cert_secret_object = lookup_secret(namespace, ingress_cert_secret, None, 'ingress.cert.secret')
 
+    # check the secrets that are going to be used in one concurrent batch rather than before each prompt
+    license_check, client_cert_check, image_pull_check, keycloak_check, keycloak_postgresql_check, \
+        ingress_cert_check = validate_secrets([
+            license_secret,
+            client_cert_secret,
+            image_pull_secret,
+            keycloak_secret if deploy_keycloak() else None,
+            keycloak_postgresql_secret if deploy_keycloak() else None,
+            ingress_cert_secret_object if ingress_cert_secret or ingress_cert or ingress_key else None
+        ])
+
     click.secho(phrases.header_ingress, bold=True)
     hostname = sanitize_ingress_host(options.hostname.prompt(hostname))
     ingress_certmanager_disabled, use_tls_secret, ingress_cert_secret_object = \
-        prompt_for_ingress_cert(ingress_cert_secret_object, ingress_cert_secret, ingress_cert, ingress_key, ingress_certmanager_disabled)
+        prompt_for_ingress_cert(ingress_cert_secret_object, ingress_cert_secret, ingress_cert, ingress_key,
+                                ingress_certmanager_disabled, validation=ingress_cert_check)
 
     # If any of these parameters is not None then they are being passed as a command line arg
     # In this case we should add the repo so we don't break a workflow where 'kxi install setup'
@@ -117,18 +137,21 @@ def setup(namespace, chart_repo_name, chart_repo_url, chart_repo_username,
     check_chart_repo_params(chart_repo_name, chart_repo_url, chart_repo_username)
 
     click.secho(phrases.header_license, bold=True)
-    license_secret, license_type = prompt_for_license(license_secret, license_filepath, license_as_env_var)
+    license_secret, license_type = prompt_for_license(license_secret, license_filepath, license_as_env_var,
+                                                      validation=license_check)
 
     click.secho(phrases.header_image, bold=True)
-    image_repo, image_pull_secret = prompt_for_image_details(image_pull_secret, image_repo, image_repo_user)
+    image_repo, image_pull_secret = prompt_for_image_details(image_pull_secret, image_repo, image_repo_user,
+                                                             validation=image_pull_check)
 
     click.secho(phrases.header_client_cert, bold=True)
-    client_cert_secret = ensure_secret(client_cert_secret, populate_cert)
+    client_cert_secret = ensure_secret(client_cert_secret, populate_cert, validation=client_cert_check)
 
     click.secho(phrases.header_keycloak, bold=True)
     if deploy_keycloak():
-        keycloak_secret = ensure_secret(keycloak_secret, populate_keycloak_secret)
-        keycloak_postgresql_secret = ensure_secret(keycloak_postgresql_secret, populate_postgresql_secret)
+        keycloak_secret = ensure_secret(keycloak_secret, populate_keycloak_secret, validation=keycloak_check)
+        keycloak_postgresql_secret = ensure_secret(keycloak_postgresql_secret, populate_postgresql_secret,
+                                                   validation=keycloak_postgresql_check)
 
     gui_client_secret = options.gui_client_secret.prompt(gui_client_secret)
     common.config.update_config(profile=common.config.config.default_section, name=key_gui_client_secret,
@@ -281,7 +304,8 @@ def run(ctx, namespace, chart_repo_name, chart_repo_url, chart_repo_username,
 @arg.chart_repo_url()
 @arg.chart_repo_username()
 @arg.assembly_backup_filepath()
-@arg.version()
+# not required with --apply-plan, checked below
+@arg.version(required=False)
 @arg.operator_version()
 @arg.image_pull_secret()
 @arg.license_secret()
@@ -290,11 +314,27 @@ def run(ctx, namespace, chart_repo_name, chart_repo_url, chart_repo_username,
 @arg.import_users()
 @arg.chart()
 @arg.management_version()
+@arg.upgrade_plan()
+@arg.apply_upgrade_plan()
 def upgrade(namespace, release, chart_repo_name, chart_repo_url, chart_repo_username, assembly_backup_filepath, version, operator_version, image_pull_secret,
-            license_secret, filepath, force, import_users, chart, management_version):
+            license_secret, filepath, force, import_users, chart, management_version, plan, apply_plan):
     """Upgrade kdb Insights Enterprise"""
+    ctx = click.get_current_context()
+    if plan and apply_plan:
+        raise click.UsageError('--plan and --apply-plan can\'t be used together', ctx)
+    if apply_plan:
+        replaced = [p.get_error_hint(ctx) for p in ctx.command.params if p.name in UPGRADE_PLAN_PARAMS
+                    and ctx.get_parameter_source(p.name) == click.core.ParameterSource.COMMANDLINE]
+        if replaced:
+            raise click.UsageError(f'{", ".join(replaced)} can\'t be used with --apply-plan, the plan sets them', ctx)
+    elif version is None:
+        raise click.MissingParameter(ctx=ctx, param=next(p for p in ctx.command.params if p.name == 'version'))
+
     click.secho(phrases.header_upgrade, bold=True)
 
+    if apply_plan:
+        return apply_upgrade_plan(apply_plan, assembly_backup_filepath, import_users, force)
+
     filepath, namespace, chart_repo_url, image_pull_secret, license_secret = get_values_and_secrets(filepath,
         namespace, release, chart_repo_url,
         image_pull_secret, license_secret)
@@ -305,6 +345,15 @@ def upgrade(namespace, release, chart_repo_name, chart_repo_url, chart_repo_user
 
     docker_config = get_docker_config_secret(namespace, cast(str, image_pull_secret), DOCKER_SECRET_KEY)
 
+    if plan:
+        upgrade_plan = plan_upgrade(namespace, release, insights_chart, version, operator_version, image_pull_secret,
+                                    license_secret, filepath, docker_config, force, management_version)
+        with open(plan, 'w') as f:
+            yaml.safe_dump(upgrade_plan, f)
+        print_upgrade_plan(upgrade_plan)
+        click.echo(f'Upgrade plan saved to {plan}, apply it with "kxi install upgrade --apply-plan {plan}"')
+        return
+
     perform_upgrade(namespace, release, insights_chart, assembly_backup_filepath, version, operator_version, image_pull_secret,
                     license_secret, filepath, import_users, docker_config, force, management_version)
 
@@ -357,13 +406,153 @@ def setup_helm_repo(
 
     return chart_repo_name, chart_repo_url, username
 
+@trace.traced('Plan upgrade')
+def plan_upgrade(namespace, release, chart, version, operator_version, image_pull_secret, license_secret,
+                 filepath, docker_config, force, management_version):
+    """Run the read-only steps of an upgrade and return their results with the options needed to apply them
+
+    The time each read-only step took is recorded, these are the steps --apply-plan skips.
+    """
+    timings = {}
+    start = time.monotonic()
+    install_operator, is_op_upgrade, operator_version, operator_release, crd_data = check_for_operator_install(release,
+        namespace, chart, version, operator_version, docker_config, force)
+    timings['operator and CRDs'] = time.monotonic() - start
+
+    installed_version = get_installed_version(release, namespace)
+    chart_actions = []
+    assemblies = []
+    if installed_version:
+        start = time.monotonic()
+        spec = get_chart_actions(chart, version, docker_config=docker_config)
+        chart_actions = extract_changes(spec, True, installed_version, version) if spec else []
+        timings['chart actions'] = time.monotonic() - start
+        assemblies = [asm.metadata.name for asm in assembly.get_assemblies_list(namespace)]
+
+    start = time.monotonic()
+    management_version = get_management_version(chart, management_version)
+    management_installed = get_installed_version(management_service_release, management_service_namespace) is not None
+    timings['management service'] = time.monotonic() - start
+
+    return {
+        'kxiUpgradePlan': UPGRADE_PLAN_VERSION,
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'options': {
+            'namespace': namespace,
+            'release': release,
+            'chart': chart.full_ref,
+            'version': version,
+            'image_pull_secret': image_pull_secret,
+            'license_secret': license_secret,
+            # the plan can be applied from another directory
+            'filepath': os.path.abspath(filepath) if filepath else filepath
+        },
+        'discovery': {
+            'installed_version': installed_version,
+            'install_operator': install_operator,
+            'is_operator_upgrade': is_op_upgrade,
+            'operator_version': operator_version,
+            'operator_release': operator_release,
+            'crd_data': crd_data,
+            'chart_actions': chart_actions,
+            'assemblies': assemblies,
+            'management_version': management_version,
+            'management_installed': management_installed
+        },
+        'discovery_seconds': {name: round(seconds, 2) for name, seconds in timings.items()}
+    }
+
+
+def upgrade_plan_steps(upgrade_plan):
+    """Ordered description of what applying an upgrade plan will do"""
+    opts = upgrade_plan['options']
+    found = upgrade_plan['discovery']
+    steps = []
+    if found['installed_version'] and found['assemblies']:
+        steps.append(f'Back up and tear down assemblies {", ".join(found["assemblies"])}')
+    if found['install_operator']:
+        action = 'Upgrade' if found['is_operator_upgrade'] else 'Install'
+        steps.append(f'{action} kxi-operator to version {found["operator_version"]}')
+    if found['install_operator'] and found['is_operator_upgrade']:
+        steps.append(f'Replace CRDs {", ".join(crd["metadata"]["name"] for crd in found["crd_data"])}')
+    env = {'RELEASE': opts['release'], 'NAMESPACE': opts['namespace']}
+    for change in found['chart_actions']:
+        for action in change.get('actions', []):
+            for command, args in action.items():
+                steps.append(f'Run upgrade action for {change.get("name", "")}: '
+                             f'kubectl {command} {" ".join(apply_envs(args, env))}')
+    if found['installed_version']:
+        steps.append(f'Upgrade {opts["release"]} from version {found["installed_version"]} to {opts["version"]}')
+        if found['assemblies']:
+            steps.append('Reapply assemblies')
+    else:
+        steps.append(f'Install {opts["release"]} version {opts["version"]}, it is not installed yet')
+    action = 'Upgrade' if found['management_installed'] else 'Install'
+    steps.append(f'{action} {management_service_release} to version {found["management_version"]}')
+    return steps
+
+
+def print_upgrade_plan(upgrade_plan):
+    click.secho('Upgrade plan', bold=True)
+    for i, step in enumerate(upgrade_plan_steps(upgrade_plan), start=1):
+        click.echo(f'  {i}. {step}')
+    timings = upgrade_plan.get('discovery_seconds')
+    if timings:
+        click.echo(f'Discovery took {sum(timings.values()):.1f}s and is skipped by --apply-plan ('
+                   + ', '.join(f'{name} {seconds:.1f}s' for name, seconds in timings.items()) + ')')
+
+
+def read_upgrade_plan(filepath):
+    with open(filepath) as f:
+        upgrade_plan = yaml.safe_load(f)
+    if not isinstance(upgrade_plan, dict) or upgrade_plan.get('kxiUpgradePlan') != UPGRADE_PLAN_VERSION:
+        raise ClickException(f'{filepath} is not an upgrade plan created by "kxi install upgrade --plan"')
+    return upgrade_plan
+
+
+def apply_upgrade_plan(filepath, assembly_backup_filepath, import_users, force):
+    """Upgrade with the options and discovery results saved in an upgrade plan"""
+    upgrade_plan = read_upgrade_plan(filepath)
+    opts = upgrade_plan['options']
+
+    # the plan is only valid for the release it was created against
+    installed_version = get_installed_version(opts['release'], opts['namespace'])
+    if installed_version != upgrade_plan['discovery']['installed_version']:
+        raise ClickException(f'{opts["release"]} is installed with version {installed_version} but the plan was '
+                             f'created for version {upgrade_plan["discovery"]["installed_version"]}, create a new plan')
+
+    # the values and secrets may have changed since the plan was created
+    _, namespace, _, image_pull_secret, license_secret = get_values_and_secrets(opts['filepath'], opts['namespace'],
+        opts['release'], None, opts['image_pull_secret'], opts['license_secret'])
+    is_valid_upgrade_version(opts['release'], namespace, opts['version'], phrases.check_installed)
+
+    click.echo(f'Applying upgrade plan from {filepath} created at {upgrade_plan["created"]}')
+    print_upgrade_plan(upgrade_plan)
+
+    chart = helm_chart.Chart(opts['chart'])
+    docker_config = get_docker_config_secret(namespace, image_pull_secret, DOCKER_SECRET_KEY)
+    perform_upgrade(namespace, opts['release'], chart, assembly_backup_filepath, opts['version'], None,
+                    image_pull_secret, license_secret, opts['filepath'], import_users, docker_config,
+                    force, None, discovery=upgrade_plan['discovery'])
+
+
+@trace.traced('Upgrade')
 def perform_upgrade(namespace, release, chart, assembly_backup_filepath, version, operator_version, image_pull_secret,
-                    license_secret, filepath, import_users, docker_config, force, management_version):
+                    license_secret, filepath, import_users, docker_config, force, management_version, discovery=None):
+    """Upgrade insights, the operator and the management service
 
+    discovery holds the results of plan_upgrade when applying a plan so the read-only steps aren't repeated.
+    """
     upgraded = False
 
-    install_operator, is_op_upgrade, operator_version, operator_release, crd_data = check_for_operator_install(release,
-        namespace, chart, version, operator_version, docker_config, force)
+    if discovery is None:
+        install_operator, is_op_upgrade, operator_version, operator_release, crd_data = check_for_operator_install(release,
+            namespace, chart, version, operator_version, docker_config, force)
+        chart_actions = None
+    else:
+        install_operator, is_op_upgrade, operator_version, operator_release, crd_data, chart_actions, management_version = (
+            discovery[k] for k in ('install_operator', 'is_operator_upgrade', 'operator_version', 'operator_release',
+                                   'crd_data', 'chart_actions', 'management_version'))
 
     if not insights_installed(release, namespace):
         click.echo(phrases.upgrade_skip_to_install)
@@ -383,7 +572,7 @@ def perform_upgrade(namespace, release, chart, assembly_backup_filepath, version
         upgraded =  install_operator_and_release(release, namespace, version, operator_version, operator_release,
                                                 filepath, image_pull_secret, license_secret,
                                                 chart, import_users, docker_config, install_operator,
-                                                is_op_upgrade, crd_data, is_upgrade=True)
+                                                is_op_upgrade, crd_data, is_upgrade=True, chart_actions=chart_actions)
 
     reapply_assemblies(assembly_backup_filepath, namespace, deleted)
 
@@ -421,6 +610,23 @@ def list_versions(chart_repo_name):
     click.echo(versions.stdout)
 
 
+@install.command()
+@click.option('--max-size', type=click.IntRange(min=0),
+              help=f'{common.get_help_text(common.key_chart_cache_max_size)}, defaults to the configured '
+                   f'{common.key_chart_cache_max_size}')
+def prune_cache(max_size):
+    """
+    Remove least recently used charts from the local chart cache
+    """
+    if max_size is None:
+        max_size = int(default_val(common.key_chart_cache_max_size))
+    removed = chart_cache.prune(max_size * 1024 * 1024)
+    for meta in removed:
+        click.echo(f'Removed {meta.get("repo")}/{meta.get("chart")} {meta.get("version")}')
+    size = sum(size for _, _, size in chart_cache.entries())
+    click.echo(f'Removed {len(removed)} charts, {size / 1024 / 1024:.1f} MiB cached in {chart_cache.root()}')
+
+
 @install.command()
 @arg.namespace()
 @arg.release()
@@ -439,6 +645,7 @@ def get_values(namespace, release):
     click.echo(yaml.safe_dump(vals))
 
 
+@trace.traced('Read values and validate secrets')
 def get_values_and_secrets(
     filepath,
     namespace,
@@ -520,10 +727,10 @@ def get_management_version(
     """Determine kxi version to use. Retrieve the most recent kxi-management-service minor"""
     if management_version is None:
         if chart.is_remote:
-            management_version = helm.get_chart_versions(chart, management_service_namespace)
+            management_version = helm.get_chart_versions(chart, management_service_namespace)[0]
         else:
-            management_version = local_chart_versions(chart, prefix=management_service_namespace)
-    return management_version[0]
+            management_version = local_chart_versions(chart, prefix=management_service_namespace)[0]
+    return management_version
 
 def available_operator_versions(chart: helm_chart.Chart) -> list[str]:
     if chart.is_remote:
@@ -592,9 +799,9 @@ def sanitize_auth_url(raw_string):
     return trimmed
 
 
-def prompt_for_license(secret: pyk8s.models.V1Secret, filepath, license_as_env_var):
+def prompt_for_license(secret: pyk8s.models.V1Secret, filepath, license_as_env_var, validation=None):
     """Prompt for an existing license or create on if it doesn't exist"""
-    exists, is_valid, _ = secret.validate_keys()
+    exists, is_valid, _ = validation or secret.validate_keys()
     if not exists:
         secret, license_type = populate_license_secret(secret, filepath=filepath, as_env=license_as_env_var)
         secret.create_()
@@ -612,8 +819,12 @@ def prompt_for_license(secret: pyk8s.models.V1Secret, filepath, license_as_env_v
     return secret, license_type
 
 
-def ensure_secret(secret: pyk8s.models.V1Secret, populate_function: Callable, data = None):
-    exists, is_valid, _ = secret.validate_keys()
+def ensure_secret(secret: pyk8s.models.V1Secret, populate_function: Callable, data = None, validation = None):
+    """Create or overwrite a secret unless it already exists with the required keys
+
+    validation is the result of secret.validate_keys() when it has already been checked, e.g. by validate_secrets
+    """
+    exists, is_valid, _ = validation or secret.validate_keys()
     if not exists:
         secret = populate_function(secret, data=data)
         secret.create_()
@@ -636,10 +847,11 @@ def populate_cert(secret: pyk8s.models.V1Secret, **kwargs):
     return populate_tls_secret(secret, cert, key)
 
 
-def prompt_for_image_details(secret: pyk8s.models.V1Secret, image_repo, image_repo_user):
+def prompt_for_image_details(secret: pyk8s.models.V1Secret, image_repo, image_repo_user, validation=None):
     """Prompt for an existing image pull secret or create on if it doesn't exist"""
     image_repo = options.image_repo.prompt(image_repo)
-    secret = ensure_secret(secret, populate_image_pull_secret, {'image_repo': image_repo, 'image_repo_user': image_repo_user})
+    secret = ensure_secret(secret, populate_image_pull_secret, {'image_repo': image_repo, 'image_repo_user': image_repo_user},
+                           validation=validation)
     return image_repo, secret
 
 
@@ -696,7 +908,8 @@ def populate_postgresql_secret(secret: pyk8s.models.V1Secret, **kwargs):
     return secret
 
 
-def prompt_for_ingress_cert(secret: pyk8s.models.V1Secret, name, ingress_cert, ingress_key, ingress_certmanager_disabled):
+def prompt_for_ingress_cert(secret: pyk8s.models.V1Secret, name, ingress_cert, ingress_key, ingress_certmanager_disabled,
+                            validation=None):
     use_tls_secret = False
     if name or ingress_cert or ingress_key:
         use_tls_secret = True
@@ -705,7 +918,8 @@ def prompt_for_ingress_cert(secret: pyk8s.models.V1Secret, name, ingress_cert, i
             {
                 'ingress_cert':ingress_cert,
                 'ingress_key': ingress_key
-            }
+            },
+            validation=validation
         )
     elif not ingress_certmanager_disabled:
         click.echo(phrases.ingress_lets_encrypt)
@@ -792,6 +1006,7 @@ def populate_docker_config_secret(secret: pyk8s.models.V1Secret, docker_config):
     }
     return secret
 
+@trace.traced('Read docker config secret', trace.CATEGORY_K8S)
 def get_docker_config_secret(
         namespace: str,
         secret_name: str,
@@ -916,6 +1131,7 @@ def check_for_cluster_assemblies(exclude_namespace):
     return True
 
 
+@trace.traced('Check kxi-operator')
 def check_for_operator_install(release, insights_namespace, chart: helm_chart.Chart, insights_ver, op_ver, docker_config='', force=False):
     """
     Determine if the operator needs to be install or upgraded
@@ -980,34 +1196,61 @@ def check_insights_and_operator_compatible(insights_ver,
         raise ClickException('Compatible version of operator not found')
 
 
+def read_remote_chart_data(repo_name, chart_name, version, docker_config, name, read: Callable):
+    """Data read from a remote chart by read(version, folder), using the local chart cache when possible
+
+    The chart is cached by the URL of its repository, so aliases of the same repository share it. It's only
+    fetched when it isn't already cached and the parsed data is kept in the cache next to it so later calls
+    don't open the archive again. read returns None when it couldn't read the data, which isn't cached.
+    """
+    repo_url = helm.repo_url(repo_name)
+    entry = chart_cache.lookup(repo_url, chart_name, version)
+    if entry is None:
+        cache = helm.get_repository_cache()
+        helm.fetch(repo_name, chart_name, cache, version, docker_config)
+        data = read(version, Path(cache))
+        entry = chart_cache.store(repo_url, chart_name, version, Path(cache) / f'{chart_name}-{version}.tgz')
+    else:
+        data = chart_cache.load_parsed(entry, name)
+        if data is not chart_cache.MISSING:
+            click.echo(f'Using cached {name} of {chart_name} {version} from {entry}')
+            return data
+        data = read(version, entry)
+
+    if entry is not None and data is not None:
+        chart_cache.save_parsed(entry, name, data)
+    return data
+
+
+@trace.traced('Read CRDs')
 def get_crd_data(
     insights_chart: helm_chart.Chart,
     operator_version: str,
     docker_config: str = ''
 ):
     if insights_chart.is_remote:
-        cache = helm.get_repository_cache()
-        helm.fetch(insights_chart.repo_name, 'kxi-operator', cache, operator_version, docker_config)
-        crd_data = read_cached_crd_files(operator_version, Path(cache))
+        crd_data = read_remote_chart_data(insights_chart.repo_name, 'kxi-operator', operator_version,
+                                          docker_config, 'crds', read_cached_crd_files)
     else:
         # Assumes that the operator is in the same folder as the Insights chart
         # with a naming convention parent/kxi-operator-{version}.tgz
         crd_data = read_cached_crd_files(operator_version, Path(insights_chart.full_ref).parent)
     return crd_data
 
+@trace.traced('Read chart actions')
 def get_chart_actions(
     insights_chart: helm_chart.Chart,
     version: str,
     docker_config: str = ''
 ):
     if insights_chart.is_remote:
-        cache = helm.get_repository_cache()
-        helm.fetch(insights_chart.repo_name, 'insights', cache, version, docker_config)
-        actions = read_chart_actions(version, Path(cache))
+        actions = read_remote_chart_data(insights_chart.repo_name, 'insights', version,
+                                         docker_config, 'actions', read_chart_actions)
     else:
         actions = read_chart_actions(version, Path(insights_chart.full_ref).parent)
     return actions
 
+@trace.traced('Install kxi-operator and insights')
 def install_operator_and_release(
     release,
     namespace,
@@ -1023,7 +1266,8 @@ def install_operator_and_release(
     install_operator = True,
     is_operator_upgrade = False,
     crd_data = [],
-    is_upgrade = None
+    is_upgrade = None,
+    chart_actions = None
 ):
     """Install operator and insights"""
 
@@ -1058,13 +1302,15 @@ def install_operator_and_release(
         existing_values = yaml.safe_dump(helm.get_values(release, namespace))
 
     if is_upgrade:
-        run_chart_actions(chart, release, namespace, version, is_upgrade=is_upgrade, docker_config=docker_config)
+        run_chart_actions(chart, release, namespace, version, is_upgrade=is_upgrade, docker_config=docker_config,
+                          changes=chart_actions)
 
     helm.upgrade_install(release, chart=chart.full_ref, values_file=values_file,
                  args=args, version=version, namespace=namespace, docker_config=docker_config, existing_values=existing_values)
 
     return True
 
+@trace.traced('Install kxi-management-service')
 def check_management_install(
     release,
     namespace,
@@ -1189,30 +1435,34 @@ def setup_upgrade(namespace, values_file, image_pull_secret, license_secret,
                     version=component_version, namespace=component_namespace, args = [],
                     docker_config=docker_config, existing_values=existing_values)
 
+@trace.traced('Run chart actions')
 def run_chart_actions(
     insights_chart: helm_chart.Chart,
     release: str,
     namespace: str,
     version: str,
     is_upgrade: bool = True,
-    docker_config: str = ''
+    docker_config: str = '',
+    changes: list = None
 ):
-    installed_charts = get_installed_charts(release, namespace)
-    installed_version = '0.0.0'
-    if len(installed_charts) > 0:
-        installed_version = installed_charts[0]["app_version"]
-
-    chart_version = version if is_upgrade else installed_version
-    spec = get_chart_actions(insights_chart, chart_version, docker_config=docker_config)
-    if spec is None:
-        return
+    """Run the chart's upgrade or rollback actions, changes are the already extracted actions when known"""
+    if changes is None:
+        installed_charts = get_installed_charts(release, namespace)
+        installed_version = '0.0.0'
+        if len(installed_charts) > 0:
+            installed_version = installed_charts[0]["app_version"]
+
+        chart_version = version if is_upgrade else installed_version
+        spec = get_chart_actions(insights_chart, chart_version, docker_config=docker_config)
+        if spec is None:
+            return
+        changes = extract_changes(spec, is_upgrade, installed_version, version)
 
     env = {
         'RELEASE': release,
         'NAMESPACE': namespace
     }
 
-    changes = extract_changes(spec, is_upgrade, installed_version, version)
     for change in changes:
         run_change_action(change, is_upgrade, env)
 
@@ -1228,7 +1478,8 @@ def run_change_action(change, is_upgrade, env):
                 args = apply_envs(action.get(command), env)
                 log.debug(f'  Running {command}: ' + ' '.join(args))
                 try:
-                    subprocess.run(['kubectl', command] + args, check=True)
+                    with trace.span(f'kubectl {command}', trace.CATEGORY_SUBPROCESS):
+                        subprocess.run(['kubectl', command] + args, check=True)
                 except subprocess.CalledProcessError:
                     log.warn(f'Unable to complete {direction} {command} for {name}' +
                             f' - proceeding with {direction}')
@@ -1304,6 +1555,7 @@ def get_management_location(
 
     return management
 
+@trace.traced('Delete insights')
 def delete_release_operator_and_crds(release, namespace, force, uninstall_operator, assembly_backup_filepath):
     """Delete insights, operator and CRDs"""
 
@@ -1336,6 +1588,7 @@ def delete_release_operator_and_crds(release, namespace, force, uninstall_operat
         click.echo(f'\nkdb Insights Enterprise kxi-operator not found')
 
 
+@trace.traced('Copy secret', trace.CATEGORY_K8S)
 def copy_secret(name: str, from_ns, to_ns):
     secret = pyk8s.cl.secrets.read(name=name, namespace=from_ns)
     try:
@@ -1354,12 +1607,18 @@ def management_service_installed(namespace):
     """Check if a helm release of insights exists"""
     return len(get_installed_charts(management_service_release, namespace)) > 0
 
+def get_installed_version(release, namespace):
+    """App version of an installed release, None if it isn't installed"""
+    installed_charts = get_installed_charts(release, namespace)
+    return installed_charts[0]['app_version'] if installed_charts else None
+
+
 def get_installed_charts(release, namespace):
     """Retrieve running helm charts"""
     base_command = ['helm', 'list', '--filter', "^"+release+"$", '-o', 'json','--namespace', namespace]
     try:
         log.debug(f'List command {base_command}')
-        l = subprocess.check_output(base_command)
+        l = helm.check_output(base_command, cache=True)
         return json.loads(l)
     except subprocess.CalledProcessError as e:
         click.echo(e)
@@ -1377,7 +1636,7 @@ def get_installed_operator_versions(namespace: str = operator_namespace):
 
 # Check if Keycloak is being deployed with Insights
 def deploy_keycloak():
-    return '--keycloak-auth-url' not in sys.argv
+    return '--keycloak-auth-url' not in common.invocation_args()
 
 
 # Structure of the config:
@@ -1393,24 +1652,41 @@ def get_secret_config():
     }
 
 
+def validate_secrets(secrets):
+    """Run validate_keys for all secrets concurrently
+
+    Returns the (exists, is_valid, missing_keys) result for each secret in order, None for entries that are None.
+    """
+    to_validate = [s for s in secrets if s is not None]
+    if not to_validate:
+        return [None] * len(secrets)
+
+    with ThreadPoolExecutor(max_workers=len(to_validate)) as executor:
+        results = iter([*executor.map(common.in_current_context(lambda s: s.validate_keys()), to_validate)])
+    return [next(results) if s is not None else None for s in secrets]
+
+
 def validate_values(namespace, values_dict):
     click.echo(phrases.values_validating)
 
-    exit_execution = False
+    # only mandatory secrets are validated
+    mandatory = []
     for k, v in get_secret_config().items():
-        # if the secret is mandatory, validate it
         if v[3]:
             default = default_val(k)
             name = get_from_values_store(v[0], values_dict, default)
             s = pyk8s.models.V1Secret(metadata=pyk8s.models.V1ObjectMeta(namespace=namespace, name=cast(str, name)),
                                   type=v[1], _required_keys=v[2])
-            exists, is_valid, _ = s.validate_keys()
-            if not exists:
-                log.error(phrases.secret_validation_not_exist.format(name=name))
-                exit_execution = True
-            elif not is_valid:
-                log.error(phrases.secret_validation_invalid.format(name=name, type=v[1], keys=v[2]))
-                exit_execution = True
+            mandatory.append((name, v, s))
+
+    exit_execution = False
+    for (name, v, _), (exists, is_valid, _) in zip(mandatory, validate_secrets([s for _, _, s in mandatory])):
+        if not exists:
+            log.error(phrases.secret_validation_not_exist.format(name=name))
+            exit_execution = True
+        elif not is_valid:
+            log.error(phrases.secret_validation_invalid.format(name=name, type=v[1], keys=v[2]))
+            exit_execution = True
     if exit_execution:
         raise click.ClickException(phrases.values_validation_fail)
     click.echo('')
@@ -1474,6 +1750,7 @@ def read_chart_actions(
     return actions
 
 
+@trace.traced('Replace CRDs')
 def replace_chart_crds(crd_data):
     for body in crd_data:
         common.replace_crd(body['metadata']['name'], body)
@@ -1585,7 +1862,7 @@ def operator_rollback_version(operator_history, rollback_version,  current_versi
 def try_rollback(base_command, phrase):
     try:
         log.debug(f'List command {base_command}')
-        subprocess.check_output(base_command)
+        helm.check_output(base_command, invalidate=True)
         click.secho(phrase, bold=True)
     except subprocess.CalledProcessError as e:
         raise click.ClickException(e)
@@ -1623,6 +1900,7 @@ def is_valid_upgrade_version(release, namespace, version, phrase):
     else:
         return False
 
+@trace.traced('Back up and tear down assemblies')
 def teardown_assemblies(namespace, assembly_backup_filepath, force, phrase):
     click.secho(phrases.upgrade_asm_backup, bold=True)
     assembly_backup_filepath = assembly.backup_assemblies(namespace, assembly_backup_filepath, force)
@@ -1632,6 +1910,7 @@ def teardown_assemblies(namespace, assembly_backup_filepath, force, phrase):
     deleted = assembly.delete_running_assemblies(namespace=namespace, wait=True, force=force)
     return (deleted, assembly_backup_filepath)
 
+@trace.traced('Reapply assemblies')
 def reapply_assemblies(assembly_backup_filepath, namespace, deleted):
     click.secho(phrases.upgrade_asm_reapply, bold=True)
     if deleted and assembly_backup_filepath and all(assembly.create_assemblies_from_file(
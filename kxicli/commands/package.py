@@ -1 +1,5 @@
 from pakxcli.cli import package
+
+from kxicli.cli_group import cli
+
+cli.add_command(package)
@@ -1,15 +1,36 @@
 #cSpell:words dbpublisher QIPC timespan
 
+import csv
+import itertools
 import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
 import click
 from kxi import DeploymentType
-from kxicli import common, options
+from kxicli import common, log, options
 from kxicli.cli_group import cli
 from kxicli.commands.common import arg
 from kxi.publish.dbpublisher import DBPublisher
 from urllib.parse import urlparse
 
+try:
+    from pykx.exceptions import QError
+except ImportError:
+    QError = OSError
+
  
+CHUNKED_FORMATS = ['csv', 'json_records', 'parquet']
+CHUNK_QUEUE_SIZE = 2
+# errors of the connection or the publish itself, a file is only retried on a new connection after one of these
+RETRY_ERRORS = (OSError, EOFError, QError)
+
+
 @cli.command(usage=[DeploymentType.MICROSERVICES])
 @arg.hostname()
 @click.option('--port', default=lambda: common.get_default_val('tp_port'), type=int, help='the port at the host (TP/QIPC)')
@@ -36,7 +57,16 @@
             Target data type can be timespan, timestamp, numeric.
             Example: type_map={"time": "TIMEDELTA", "realTime": "DATETIME"}
 """)
-def publish(hostname, port, data, table, file_format, type_map):
+@click.option('--parallel', default=1, show_default=True, type=click.IntRange(min=1),
+              help='Number of publisher connections to spread the files of a directory across')
+@click.option('--ordered', is_flag=True, default=False,
+              help='Publish the files of a directory one at a time in file name order')
+@click.option('--retries', default=2, show_default=True, type=click.IntRange(min=0),
+              help='Number of times a file is retried on a new connection when --parallel is set')
+@click.option('--chunk-rows', default=None, type=click.IntRange(min=1),
+              help="""Read local csv, json_records and parquet files this many rows at a time,
+              sending each chunk as a separate message""")
+def publish(hostname, port, data, table, file_format, type_map, parallel, ordered, retries, chunk_rows):
     """Publish files through the TP port with QIPC to the kdb Insights Database microservice"""
     
     hostname = options.hostname.prompt(hostname, silent=True)
@@ -44,8 +74,225 @@ def publish(hostname, port, data, table, file_format, type_map):
     
     if type_map and isinstance(type_map, str):
         type_map = json.loads(type_map)
+
+    if parallel > 1 and ordered:
+        log.warn('--ordered publishes files one at a time, ignoring --parallel')
+    elif parallel > 1 and os.path.isdir(data):
+        publish_directory(host, port, data, table, file_format, type_map, parallel, retries, chunk_rows)
+        return
+
     with DBPublisher(host=host, port=port) as pub:
-        click.echo(f"Publishing {data}")
-        pub.publish(data, table, file_format, type_map)
-        click.echo(f"{data} published")
+        if chunk_rows and os.path.exists(data):
+            for path in _list_files(data) if os.path.isdir(data) else [data]:
+                click.echo(f"Publishing {path} in chunks of {chunk_rows} rows")
+                publish_chunks(pub, path, table, file_format, type_map, chunk_rows)
+                click.echo(f"{path} published")
+        else:
+            click.echo(f"Publishing {data}")
+            pub.publish(data, table, file_format, type_map)
+            click.echo(f"{data} published")
+
+
+def _list_files(directory):
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                  if not f.startswith('.') and os.path.isfile(os.path.join(directory, f)))
+
+
+def publish_directory(host, port, directory, table, file_format, type_map, parallel, retries, chunk_rows=None):
+    """Publish the files in a directory (non-recursive) across a pool of publisher connections"""
+    files = _list_files(directory)
+    pending = queue.Queue()
+    for path in files:
+        pending.put(path)
+
+    click.echo(f"Publishing {len(files)} files from {directory} over {min(parallel, len(files))} connections")
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        workers = [executor.submit(_publish_worker, host, port, pending, table, file_format, type_map, retries,
+                                   chunk_rows)
+                   for _ in range(min(parallel, len(files)))]
+        results = [worker.result() for worker in workers]
+
+    elapsed = max(time.monotonic() - start, 1e-6)
+    failed = sorted(path for worker_failed, _ in results for path in worker_failed)
+    rows = sum(n for _, worker_rows in results for n in worker_rows.values())
+    published = [path for path in files if path not in failed]
+    size_mb = sum(os.path.getsize(path) for path in published) / 2**20
+    click.echo(f"Published {len(published)} files ({size_mb:.1f}MB, {rows} rows) in {elapsed:.1f}s, "
+               f"{len(published) / elapsed:.1f} files/s, {size_mb / elapsed:.1f}MB/s, {rows / elapsed:.1f} rows/s")
+
+    if failed:
+        raise click.ClickException(f"Failed to publish {len(failed)} files: {', '.join(failed)}")
+
+
+def _publish_worker(host, port, pending, table, file_format, type_map, retries, chunk_rows=None):
+    """Publish files from the queue over one connection, reconnecting after a failure
+
+    A chunked file is resumed from its first unsent chunk when retried. Only connection and publish errors are
+    retried, any other error stops the workers after their current file and is raised.
+    Returns the files that still failed after all retries and the rows of each published file
+    """
+    failed = []
+    rows = {}
+    with ExitStack() as connection:
+        pub = None
+        while True:
+            try:
+                path = pending.get_nowait()
+            except queue.Empty:
+                return failed, rows
+
+            progress = {}
+            for attempt in range(retries + 1):
+                try:
+                    if pub is None:
+                        pub = connection.enter_context(DBPublisher(host=host, port=port))
+                    if chunk_rows:
+                        publish_chunks(pub, path, table, file_format, type_map, chunk_rows, progress)
+                    else:
+                        pub.publish(path, table, file_format, type_map)
+                    click.echo(f"{path} published")
+                    rows[path] = _count_rows(path, file_format)
+                    break
+                except RETRY_ERRORS as e:
+                    log.warn(f"Attempt {attempt + 1} to publish {path} failed: {e}")
+                    connection.close()
+                    pub = None
+                except Exception as e:
+                    _drain(pending)
+                    if isinstance(e, click.ClickException):
+                        raise
+                    raise click.ClickException(f"Failed to publish {path}: {e}") from e
+            else:
+                failed.append(path)
+
+
+def _drain(pending):
+    while True:
+        try:
+            pending.get_nowait()
+        except queue.Empty:
+            return
+
+
+def _count_rows(path, file_format):
+    """Rows in a published file, 0 when its format can't be counted"""
+    file_format = (file_format or os.path.splitext(path)[1].lstrip('.')).lower()
+    try:
+        if file_format == 'parquet':
+            import pyarrow.parquet
+            return pyarrow.parquet.ParquetFile(path).metadata.num_rows
+        with open(path, newline='') as f:
+            if file_format == 'csv':
+                # the header isn't a row
+                return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+            if file_format == 'json_records':
+                return sum(1 for line in f if line.strip())
+            if file_format == 'json':
+                data = json.load(f)
+                return len(data) if isinstance(data, list) else 1
+    except (ImportError, OSError, ValueError) as e:
+        log.debug(f"Could not count the rows of {path}: {e}")
+    return 0
+
+
+def publish_chunks(pub, path, table, file_format, type_map, chunk_rows, progress=None):
+    """Publish a file in chunks of chunk_rows rows, each sent as its own message
+
+    The next chunk is read while the current one is sent and at most CHUNK_QUEUE_SIZE chunks are
+    waiting at a time, so memory stays bounded by the chunk size rather than the file size.
+    Chunks already counted in progress['chunks'] are skipped, which lets a retry resume the file.
+    """
+    file_format = _chunk_format(path, file_format)
+    progress = {} if progress is None else progress
+    chunks = queue.Queue(maxsize=CHUNK_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read(directory):
+        try:
+            for chunk in _split_file(path, file_format, chunk_rows, directory):
+                if not put(chunk):
+                    return
+            put(None)
+        except Exception as e:
+            put(e)
+
+    with tempfile.TemporaryDirectory(prefix='kxi-publish-') as directory:
+        reader = threading.Thread(target=read, args=(directory,), daemon=True)
+        reader.start()
+        try:
+            n = 0
+            while (chunk := chunks.get()) is not None:
+                if isinstance(chunk, Exception):
+                    raise chunk
+                if n >= progress.get('chunks', 0):
+                    pub.publish(chunk, table, file_format, type_map)
+                    progress['chunks'] = n + 1
+                    log.debug(f"Published chunk {n} of {path}")
+                os.remove(chunk)
+                n += 1
+        finally:
+            stop.set()
+            reader.join()
+
+
+def _chunk_format(path, file_format):
+    if not file_format:
+        file_format = os.path.splitext(path)[1].lstrip('.')
+    file_format = file_format.lower()
+    if file_format not in CHUNKED_FORMATS:
+        raise click.ClickException(f"--chunk-rows only supports {', '.join(CHUNKED_FORMATS)} files, "
+                                   f"use --file-format for {path}")
+    return file_format
+
+
+def _split_file(path, file_format, chunk_rows, directory):
+    """Split a file into files of chunk_rows rows in directory, yielding each one as it's written"""
+    if file_format == 'parquet':
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise click.ClickException('pyarrow is required to publish parquet files in chunks, '
+                                       'install it with: pip install kxicli[arrow]')
+        # parquet is read a batch at a time from its row groups
+        for n, batch in enumerate(pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=chunk_rows)):
+            chunk = os.path.join(directory, f'{n}.parquet')
+            pyarrow.parquet.write_table(pyarrow.Table.from_batches([batch]), chunk)
+            yield chunk
+        return
+
+    with open(path, newline='') as f:
+        if file_format == 'csv':
+            reader = csv.reader(f)
+            header = next(reader, None)
+            batches = _batched(reader, chunk_rows)
+        else:
+            header = None
+            batches = _batched((line for line in f if line.strip()), chunk_rows)
+
+        for n, rows in enumerate(batches):
+            chunk = os.path.join(directory, f'{n}.{file_format}')
+            with open(chunk, 'w', newline='') as out:
+                if header is None:
+                    out.writelines(rows)
+                else:
+                    writer = csv.writer(out)
+                    writer.writerow(header)
+                    writer.writerows(rows)
+            yield chunk
+
 
+def _batched(iterable, n):
+    iterator = iter(iterable)
+    while batch := [*itertools.islice(iterator, n)]:
+        yield batch
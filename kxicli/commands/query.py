@@ -1,15 +1,26 @@
 import click
 import sys
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
 
 from kxi.query import Query
 from kxi import DeploymentType
-from kxicli import common, options
+from kxicli import common, log, options
 from kxicli.commands.common import arg
 from kxicli.cli_group import cli
 from kxicli.resources.auth import TokenType
 from kxi.rest import ApiClient
-from kxicli.resources import auth as auth_lib
-from kxi.auth import CredentialStore
+from kxicli.resources import auth as auth_lib, http
+
+DEFAULT_BATCH_SIZE = 100000
+STREAMED_FORMATS = ['csv', 'json_records']
+BINARY_FORMATS = ['parquet', 'arrow']
 
 @cli.command(usage=[DeploymentType.MICROSERVICES, DeploymentType.ENTERPRISE])
 @arg.hostname()
@@ -22,40 +33,131 @@
               The SQL query to be executed
 """)
 @click.option('--output-format',
-              type=click.Choice(['tabular', 'csv', 'json', 'json_records'], case_sensitive=False),
+              type=click.Choice(['tabular', 'csv', 'json', 'json_records', 'parquet', 'arrow'], case_sensitive=False),
               required=False,
               help="""
               tabular: print query results in tabular format (default)
               csv: print query results as csv
               json: print query results as columnar json
               json_records: print query results as a json object per row
+              parquet: write query results to a parquet file, requires --output-file
+              arrow: write query results to an Arrow IPC (Feather) file, requires --output-file
 """)
 @click.option('--output-file', required=False, type=str, help='Optionally write results to an output_file instead of console')
+@click.option('--limit', required=False, type=click.IntRange(min=0),
+              help='Maximum number of rows to return, the query is wrapped in a LIMIT so only these rows are fetched')
+@click.option('--rows-per-file', required=False, type=click.IntRange(min=1),
+              help='Split parquet and arrow output into numbered files of at most this many rows')
 @arg.realm()
-def query(hostname, usage, client_id, client_secret, sql, output_format, output_file, realm):
+def query(hostname, usage, client_id, client_secret, sql, output_format, output_file, limit, rows_per_file, realm):
     """Execute a SQL query and print results to console/file"""
+    if output_format in BINARY_FORMATS and not output_file:
+        raise click.ClickException(f'--output-file is required for {output_format} output')
+    if rows_per_file and output_format not in BINARY_FORMATS:
+        raise click.ClickException('--rows-per-file is only supported for parquet and arrow output')
+
     hostname = options.hostname.prompt(hostname, silent=True)
     conn = get_query_object(hostname, realm, usage.upper())
 
-    df = conn.sql(sql).pd()
-    
+    start = time.monotonic()
+    df = conn.sql(sql if limit is None else limit_query(sql, limit)).pd()
+    log.debug(f'Query returned {len(df)} rows in {time.monotonic() - start:.3f}s', err=True)
+
     target = sys.stdout
     if output_file:
         target = output_file
-    
-    if output_format == "csv":
-        df.to_csv(target, index=False)
+
+    if output_format in STREAMED_FORMATS:
+        if output_file:
+            with open(output_file, 'w', newline='') as f:
+                write_batches(df, f, output_format, DEFAULT_BATCH_SIZE)
+        else:
+            write_batches(df, target, output_format, DEFAULT_BATCH_SIZE)
+    elif output_format in BINARY_FORMATS:
+        write_columnar(df, output_file, output_format, rows_per_file)
     elif output_format == "json":
         df.to_json(target)
-    elif output_format == "json_records":
-        df.to_json(target, orient="records", lines=True)
     else:
         df.to_string(target, index=False)
 
+    elapsed = time.monotonic() - start
+    log.debug(f'Output {len(df)} rows in {elapsed:.3f}s ({len(df) / max(elapsed, 1e-6):.0f} rows/s), '
+              f'peak memory {peak_memory_mib()}', err=True)
+
+
+def limit_query(sql, limit):
+    """Wrap a query so the server returns at most limit rows"""
+    return f'SELECT * FROM ({sql.strip().rstrip(";")}) LIMIT {limit}'
+
+
+def write_batches(df, target, output_format, batch_size):
+    """Write csv or json_records output batch by batch
+
+    The query result is already held in full, only its formatted text is produced a batch at a time.
+    """
+    for n in range(0, len(df), batch_size):
+        batch = df.iloc[n:n + batch_size]
+        if output_format == "csv":
+            batch.to_csv(target, index=False, header=n == 0)
+        else:
+            records = batch.to_json(orient="records", lines=True)
+            target.write(records)
+            # older pandas versions don't end the last record with a newline
+            if n + batch_size < len(df) and not records.endswith('\n'):
+                target.write('\n')
+        target.flush()
+
+    if len(df) == 0 and output_format == "csv":
+        df.to_csv(target, index=False)
+
+
+def write_columnar(df, output_file, output_format, rows_per_file=None):
+    """Write parquet or arrow output, split into numbered files of rows_per_file rows when set"""
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise click.ClickException(f'pyarrow is required for {output_format} output, install it with: pip install kxicli[arrow]')
+
+    table = pyarrow.Table.from_pandas(df, preserve_index=False)
+    if rows_per_file:
+        paths = partition_paths(output_file, max(1, -(-table.num_rows // rows_per_file)))
+    else:
+        paths = [output_file]
+        rows_per_file = max(1, table.num_rows)
+
+    for n, path in enumerate(paths):
+        # slices are zero-copy views on the table
+        part = table.slice(n * rows_per_file, rows_per_file)
+        if output_format == "parquet":
+            pyarrow.parquet.write_table(part, path)
+        else:
+            pyarrow.feather.write_feather(part, path)
+        log.debug(f'Wrote {part.num_rows} rows to {path}', err=True)
+
+
+def partition_paths(output_file, count):
+    """Numbered file names for partitioned output, e.g. trades.parquet -> trades-00000.parquet"""
+    path = Path(output_file)
+    return [str(path.with_name(f'{path.stem}-{n:05d}{path.suffix}')) for n in range(count)]
+
+
+def peak_memory_mib():
+    """Peak resident memory of the process, where the platform reports it"""
+    if resource is None:
+        return 'unavailable'
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return f'{peak / 2**20 if sys.platform == "darwin" else peak / 2**10:.1f}MiB'
+
 def get_query_object(hostname, realm, usage):
+    return http.shared_client(('query', hostname, realm, usage), lambda: _create_query_object(hostname, realm, usage))
+
+
+def _create_query_object(hostname, realm, usage):
 
-    store = CredentialStore(name = options.get_profile(), file_path= common.token_cache_file, 
-                            file_format= common.token_cache_format)
+    store = auth_lib.credential_store(common.token_cache_file)
 
     grant_type = store.get('grant_type', default=TokenType.SERVICEACCOUNT)
     client_id = options.get_serviceaccount_id()
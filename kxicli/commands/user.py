@@ -1,6 +1,12 @@
+import csv
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 from requests.exceptions import HTTPError
 import click
 import tabulate
+import yaml
 
 from kxicli import options
 from kxicli import common
@@ -57,12 +63,29 @@ def create(
         common.handle_http_exception(e, "Creating user failed with")
 
 @user.command()
+@click.option('--search', help='Only list users whose username, email, first or last name contain this')
+@click.option('--username', help='Only list users whose username contains this')
+@click.option('--email', help='Only list users whose email contains this')
+@click.option('--enabled/--disabled', default=None, help='Only list enabled or disabled users')
+@click.option('--exact', is_flag=True, default=False, help='Match --username and --email exactly')
+@click.option('--page-size', default=100, show_default=True, type=click.IntRange(min=1),
+              help='Number of users fetched per request')
+@click.option('--output-format', default='table', show_default=True,
+              type=click.Choice(['table', 'csv', 'json-lines'], case_sensitive=False),
+              help='csv and json-lines print each page of users as it arrives')
 @arg.hostname()
 @arg.realm()
 @arg.admin_username()
 @arg.admin_password()
 @arg.timeout()
 def list(
+    search,
+    username,
+    email,
+    enabled,
+    exact,
+    page_size,
+    output_format,
     hostname,
     realm,
     admin_username,
@@ -72,14 +95,30 @@ def list(
     """List users"""
     um = get_user_manager(hostname, realm, admin_username, admin_password, timeout)
     keys_of_interest = ['username', 'email', 'enabled']
+    filters = {'search': search, 'username': username, 'email': email}
+    filters = {k: v for k, v in filters.items() if v is not None}
+    if enabled is not None:
+        filters['enabled'] = str(enabled).lower()
+    if exact:
+        filters['exact'] = 'true'
+
+    user_info = um.iter_users(page_size=page_size, **filters)
     try:
-        user_info = um.list_users()
+        if output_format == 'csv':
+            writer = csv.writer(sys.stdout, lineterminator='\n')
+            writer.writerow(keys_of_interest)
+            for user in user_info:
+                writer.writerow([user.get(key) for key in keys_of_interest])
+        elif output_format == 'json-lines':
+            for user in user_info:
+                click.echo(json.dumps({key: user.get(key) for key in keys_of_interest}))
+        else:
+            users = []
+            for user in user_info:
+                users.append([user.get(key) for key in keys_of_interest])
+            click.echo(tabulate.tabulate(users, headers=keys_of_interest))
     except HTTPError as e:
         common.handle_http_exception(e, "Listing users failed with")
-    users = []
-    for user in user_info:
-        users.append([user.get(key) for key in keys_of_interest])
-    click.echo(tabulate.tabulate(users, headers=keys_of_interest))
 
 @user.command()
 @arg.hostname()
@@ -243,3 +282,181 @@ def delete(
             click.echo(f"Deleted user {username}")
     except HTTPError as e:
         common.handle_http_exception(e, "Deleting user failed with")
+
+
+IMPORT_FIELDS = ['username', 'password', 'email', 'enabled', 'temporary', 'roles']
+EXPORT_FIELDS = ['username', 'email', 'enabled', 'roles']
+
+
+def _is_yaml(filepath):
+    return filepath.lower().endswith(('.yaml', '.yml'))
+
+
+def _parse_bool(value, default):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('true', 'yes', 'y', '1')
+
+
+def _parse_roles(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        # roles are ';' separated in csv files
+        return [role.strip() for role in value.split(';') if role.strip()]
+    return [*value]
+
+
+def read_users_file(filepath):
+    """Read the users to import from a csv file with a header row, or a yaml list of users"""
+    with open(filepath, newline='') as f:
+        if _is_yaml(filepath):
+            users = yaml.safe_load(f) or []
+            if isinstance(users, dict):
+                users = users.get('users', [])
+        else:
+            users = [*csv.DictReader(f)]
+
+    return [{k: v for k, v in user.items() if k in IMPORT_FIELDS} for user in users]
+
+
+def write_users_file(users, filepath=None):
+    """Write exported users as yaml, or csv when filepath ends in .csv"""
+    if filepath and filepath.lower().endswith('.csv'):
+        with open(filepath, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows({**user, 'roles': ';'.join(user['roles'])} for user in users)
+    elif filepath:
+        with open(filepath, 'w') as f:
+            yaml.safe_dump(users, f, sort_keys=False)
+    else:
+        yaml.safe_dump(users, sys.stdout, sort_keys=False)
+
+
+def _http_error(e: HTTPError):
+    try:
+        res, msg = common.parse_http_exception(e)
+        return f"{res.status_code} {res.reason} ({msg})"
+    except Exception:
+        return str(e)
+
+
+def _import_user(um, user, temporary):
+    """Create a user and assign its roles, returns an error message if either failed"""
+    username = user.get('username')
+    if not username:
+        return "missing username"
+    if not user.get('password'):
+        return "missing password"
+
+    try:
+        um.create_user(username, user['password'], user.get('email') or None,
+                       enabled=_parse_bool(user.get('enabled'), True),
+                       temporary=_parse_bool(user.get('temporary'), temporary))
+    except HTTPError as e:
+        return f"Creating user failed with {_http_error(e)}"
+    except Exception as e:
+        return f"Creating user failed: {e}"
+
+    roles = _parse_roles(user.get('roles'))
+    if roles:
+        try:
+            um.assign_roles(username=username, roles=roles).raise_for_status()
+        except RoleNotFoundException as e:
+            return f"User created, assigning roles failed, could not find role(s): {str(e)}"
+        except HTTPError as e:
+            return f"User created, assigning roles failed with {_http_error(e)}"
+        except Exception as e:
+            return f"User created, assigning roles failed: {e}"
+
+    return None
+
+
+@user.command('import')
+@click.option('--file', 'filepath', required=True, type=click.Path(exists=True, dir_okay=False),
+              help="""csv or yaml file of users with the fields username, password, email, enabled,
+              temporary and roles, roles are ';' separated in csv""")
+@click.option('--workers', default=8, show_default=True, type=click.IntRange(min=1),
+              help='Number of users to import concurrently')
+@arg.temporary()
+@arg.hostname()
+@arg.realm()
+@arg.admin_username()
+@arg.admin_password()
+@arg.timeout()
+def import_users(
+    filepath,
+    workers,
+    temporary,
+    hostname,
+    realm,
+    admin_username,
+    admin_password,
+    timeout
+):
+    """Create users and assign their roles from a file"""
+    users = read_users_file(filepath)
+    um = get_user_manager(hostname, realm, admin_username, admin_password, timeout)
+    if any(user.get('roles') for user in users):
+        try:
+            # index the roles once up front rather than from every worker
+            um.get_roles()
+        except HTTPError as e:
+            common.handle_http_exception(e, "Getting roles failed with")
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(common.in_current_context(lambda user: _import_user(um, user, temporary)), users)
+        for row, (user, error) in enumerate(zip(users, results), start=1):
+            if error:
+                failed += 1
+                click.echo(f"Row {row} ({user.get('username')}): {error}", err=True)
+            else:
+                click.echo(f"Created user {user['username']}")
+
+    click.echo(f"Imported {len(users) - failed} of {len(users)} users")
+    if failed:
+        raise click.ClickException(f"Failed to import {failed} users")
+
+
+@user.command('export')
+@click.option('--file', 'filepath', help='csv or yaml file to write the users to, yaml is printed to the console if not set')
+@click.option('--workers', default=8, show_default=True, type=click.IntRange(min=1),
+              help='Number of users to fetch roles for concurrently')
+@arg.hostname()
+@arg.realm()
+@arg.admin_username()
+@arg.admin_password()
+@arg.timeout()
+def export_users(
+    filepath,
+    workers,
+    hostname,
+    realm,
+    admin_username,
+    admin_password,
+    timeout
+):
+    """Export users and their assigned roles to a file, passwords are not exported"""
+    um = get_user_manager(hostname, realm, admin_username, admin_password, timeout)
+    try:
+        users = um.index_users()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            roles = [*executor.map(common.in_current_context(lambda user: um.get_assigned_roles(user['username'])), users)]
+    except HTTPError as e:
+        common.handle_http_exception(e, "Exporting users failed with")
+
+    write_users_file([
+        {
+            'username': user['username'],
+            'email': user.get('email'),
+            'enabled': user.get('enabled', True),
+            'roles': [role['name'] for role in user_roles]
+        }
+        for user, user_roles in zip(users, roles)
+    ], filepath)
+    if filepath:
+        click.echo(f"Exported {len(users)} users to {filepath}")
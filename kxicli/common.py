@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import functools
 import sys
 
 import click
+from click.globals import pop_context, push_context
 import pyk8s
 from pathlib import Path
 import subprocess
@@ -12,11 +14,16 @@
 from kxicli import config
 from kxicli import log
 from kxicli import phrases
+from kxicli.resources import trace
 
 token_cache_path = Path.home() / '.insights'
 token_cache_dir = str(token_cache_path)
 token_cache_file = str(token_cache_path / 'credentials')
 token_cache_format = "toml"
+cache_path = token_cache_path / 'cache'
+
+# Key of the arguments of an invocation, shared by every context of the invocation
+ARGS_META_KEY = 'kxicli.args'
 
 key_install_outputFile = 'install.outputFile'
 key_chart_repo_name = 'chart.repo.name'
@@ -60,6 +67,11 @@
 key_serviceaccount_secret = 'auth.serviceaccount.secret'
 key_cache_file = 'cache.file'
 key_auth_client = 'auth.client'
+key_http_pool_size = 'http.pool_size'
+key_http_retries = 'http.retries'
+key_http_backoff_factor = 'http.backoff_factor'
+key_entitlement_cache_ttl = 'entitlement.cache_ttl'
+key_chart_cache_max_size = 'chart.cache.max_size'
 
 # Help text dictionary for commands
 HELP_TEXT = {
@@ -102,7 +114,12 @@
     key_version: 'Version to install',
     key_operator_version: 'Version of the operator to install',
     key_admin_username: 'Administrator username',
-    key_management_version: 'Version of the management service to install'
+    key_management_version: 'Version of the management service to install',
+    key_http_pool_size: 'Number of connections kept alive per host',
+    key_http_retries: 'Number of times a failed idempotent HTTP request is retried',
+    key_http_backoff_factor: 'Backoff factor in seconds between HTTP retries',
+    key_entitlement_cache_ttl: 'Seconds cached entitlements and actors are used without asking the service',
+    key_chart_cache_max_size: 'Maximum size in MiB of the local chart cache'
 }
 
 # Default values for commands if needed
@@ -123,7 +140,12 @@
     key_keycloak_realm: 'insights',
     key_admin_username: 'user',
     key_cache_file: token_cache_file,
-    key_auth_client: 'insights-app'
+    key_auth_client: 'insights-app',
+    key_http_pool_size: 10,
+    key_http_retries: 3,
+    key_http_backoff_factor: 0.5,
+    key_entitlement_cache_ttl: 0,
+    key_chart_cache_max_size: 2048
 }
 
 # Flag to indicate if k8s.config.load_config has already been called
@@ -152,8 +174,36 @@ def sanitize_hostname(raw_string):
     """Sanitize a hostname to allow it to be used"""
     return raw_string.replace('http://', '').replace('https://', '').rstrip('/')
 
+def invocation_args(ctx: click.Context | None = None) -> list:
+    """Arguments of the current kxi invocation
+
+    They differ from sys.argv when a batch or the daemon runs invocations in this process.
+    """
+    ctx = ctx or click.get_current_context(silent=True)
+    if ctx is not None and ARGS_META_KEY in ctx.meta:
+        return ctx.meta[ARGS_META_KEY]
+    return sys.argv[1:]
+
+def in_current_context(func):
+    """Wrap func to run in the current click context on the worker threads it's submitted to
+
+    Click tracks the current context per thread, without it a worker doesn't see the profile, HTTP sessions,
+    tracer or helm calls of the invocation.
+    """
+    ctx = click.get_current_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # pushed rather than entered, entering changes the context's depth which isn't thread safe
+        push_context(ctx)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            pop_context()
+    return wrapper
+
 def is_interactive_session():
-    return sys.stdout.isatty() and '--force' not in sys.argv
+    return sys.stdout.isatty() and '--force' not in invocation_args()
 
 
 def read_crd(name):
@@ -174,6 +224,7 @@ def get_existing_crds(names):
             crds.append(n)
     return crds
 
+@trace.traced('Replace CRD', trace.CATEGORY_K8S)
 def replace_crd(name: str, body):
     click.echo(f'Replacing CRD {name}')
     try:
@@ -204,26 +255,55 @@ def delete_crd(name):
             f'Exception when trying to delete CustomResourceDefinition({name}): {exception}'
         ) from exception
 
+def _read_tar_member(f, name: str, max_read_size: int) -> bytes:
+    raw = f.read(max_read_size)
+    if len(raw) >= max_read_size:
+        raise click.ClickException(f'Refused to load more than {max_read_size} bytes from {name}')
+    return raw
+
+
 def extract_files_from_tar(tar: Path, files: list, max_read_size: int = 2000000):
-    data = []
-    if tar.exists() and tarfile.is_tarfile(tar):
-        log.debug(f'Opening tar file {tar} to extract files')
+    """Read files from a tar archive, returning their contents in the order they were requested
+
+    The archive is streamed once rather than seeking through the compressed stream for each file. Like
+    tarfile.extractfile, the last member of a name wins and links are read from their target, which is
+    looked up with a second pass only when a requested file is a link.
+    """
+    if not (tar.exists() and tarfile.is_tarfile(tar)):
+        raise click.ClickException(f'{tar} does not exist or is not a valid tar archive')
+
+    wanted = set(files)
+    found = {}
+    links = set()
+    log.debug(f'Opening tar file {tar} to extract {len(wanted)} files')
+    with tarfile.open(tar, mode='r|*') as tf:
+        for member in tf:
+            if member.name not in wanted:
+                continue
+            found.pop(member.name, None)
+            links.discard(member.name)
+            if member.issym() or member.islnk():
+                links.add(member.name)
+            elif member.isfile():
+                log.debug(f'Extracting {member.name} from {tar}')
+                found[member.name] = _read_tar_member(tf.extractfile(member), member.name, max_read_size)
+
+    if links:
+        # the target of a link can come before it in the stream
         with tarfile.open(tar) as tf:
-            for file in files:
-                log.debug(f'Attempting to extract {file} from {tar}')
+            for name in links:
                 try:
-                    f = tf.extractfile(file)
-                    raw = f.read(max_read_size)
-                    f.close()
-                    if len(raw) < max_read_size:
-                        data.append(raw)
-                    else:
-                        raise click.ClickException(f'Refused to load more than {max_read_size} bytes from {file}')
+                    f = tf.extractfile(name)
                 except KeyError:
-                    raise click.ClickException(f'File {file} not found in {tar}')
-    else:
-        raise click.ClickException(f'{tar} does not exist or is not a valid tar archive')
-    return data
+                    continue
+                if f is not None:
+                    log.debug(f'Extracting {name} from {tar}')
+                    found[name] = _read_tar_member(f, name, max_read_size)
+
+    for file in files:
+        if file not in found:
+            raise click.ClickException(f'File {file} not found in {tar}')
+    return [found[file] for file in files]
 
 
 def enter_password(msg: str):
@@ -19,9 +19,11 @@ def load_config(profile):
     """Load a configuration profile from the config file"""
     global config
 
-    config = configparser.ConfigParser(default_section=profile)
-    config.optionxform = str
-    config.read(config_file)
+    # replaced once read so commands running in other threads never see a partially read file
+    loaded = configparser.ConfigParser(default_section=profile)
+    loaded.optionxform = str
+    loaded.read(config_file)
+    config = loaded
 
 
 def append_config(profile, name, value):
@@ -3,9 +3,9 @@
 GLOBAL_DEBUG_LOG = False
 
 
-def debug(msg):
+def debug(msg, err=False):
     if GLOBAL_DEBUG_LOG:
-        click.echo(f"{click.style('debug', fg='blue')}={msg}")
+        click.echo(f"{click.style('debug', fg='blue')}={msg}", err=err)
 
 
 def error(msg):
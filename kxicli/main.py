@@ -1,11 +1,34 @@
-from kxicli import cli_group
-from kxicli.commands import client, assembly, auth, entitlement, package, install, azure_idp, user, configure, backup, publish, query
+import importlib
+import sys
 
-__all__ = ["client", "assembly", "auth", "package", "install", "azure_idp", "user", "configure", "backup", "publish", "query", "cli", "entitlement"]
+from kxicli.resources import daemon as daemon_lib
 
-cli = cli_group.cli
+__all__ = ["client", "assembly", "auth", "package", "install", "azure_idp", "user", "configure", "backup", "publish", "query", "cli", "entitlement", "daemon", "batch"]
 
-cli.add_command(package.package)
 
-if __name__ == '__main__':
+def run():
+    """Entry point of the kxi script
+
+    Invocations are forwarded to a running kxi daemon when KXI_DAEMON is set, the CLI is only loaded
+    when there is none.
+    """
+    if daemon_lib.enabled():
+        code = daemon_lib.forward(sys.argv[1:])
+        if code is not None:
+            sys.exit(code)
+    from kxicli.cli_group import cli
     cli()  # pylint: disable=no-value-for-parameter
+
+
+def __getattr__(name):
+    # The CLI and its command modules are imported on demand, keep them reachable
+    # as attributes of this module for existing callers
+    if name == 'cli':
+        return importlib.import_module('kxicli.cli_group').cli
+    if name in __all__:
+        return importlib.import_module(f'kxicli.commands.{name}')
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+if __name__ == '__main__':
+    run()
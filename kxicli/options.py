@@ -452,6 +452,63 @@ def get_namespace():
     is_flag=True
 )
 
+assembly_wait_timeout = Option (
+    '--wait-timeout',
+    type=int,
+    default=1200,
+    help='Maximum time in seconds to wait for assemblies when --wait is set'
+)
+
+assembly_selector = Option (
+    '-l',
+    '--selector',
+    help='Only list assemblies whose labels match this Kubernetes label selector, requires --use-kubeconfig'
+)
+
+assembly_field_selector = Option (
+    '--field-selector',
+    help='Only list assemblies matching this Kubernetes field selector, such as metadata.name=<name>, '
+         'requires --use-kubeconfig'
+)
+
+assembly_name_prefix = Option (
+    '--name-prefix',
+    help='Only list assemblies whose name starts with this prefix'
+)
+
+assembly_ready = Option (
+    '--ready/--not-ready',
+    default=None,
+    help='Only list assemblies that are ready, or that are not ready'
+)
+
+assembly_page_size = Option (
+    '--page-size',
+    type=click.IntRange(min=1),
+    default=500,
+    help='Number of assemblies requested from Kubernetes at a time'
+)
+
+assembly_all_namespaces = Option (
+    '-A',
+    '--all-namespaces',
+    is_flag=True,
+    help='List assemblies in every namespace of the cluster through the Kubernetes API'
+)
+
+assembly_status = Option (
+    '--status',
+    is_flag=True,
+    help='Include whether each assembly is ready and the message of its AssemblyReady condition'
+)
+
+assembly_output_format = Option (
+    '--output-format',
+    type=click.Choice(['table', 'json'], case_sensitive=False),
+    default='table',
+    help='Format of the listing'
+)
+
 assembly_filepath = Option (
     '-f',
     '--filepath',
@@ -599,6 +656,21 @@ def get_namespace():
     type = click.STRING
 )
 
+upgrade_plan = Option(
+    '--plan',
+    help = 'Run the read-only upgrade steps, print the execution plan with the time discovery took and save it to '
+           'this file without upgrading. The other steps are not timed, their duration depends on the cluster '
+           'rolling out pods',
+    type = click.Path(dir_okay=False)
+)
+
+apply_upgrade_plan = Option(
+    '--apply-plan',
+    help = 'Upgrade using a plan saved with --plan, reusing its discovery results and options. Options the plan '
+           'sets, such as --version and the chart, can\'t be passed with it',
+    type = click.Path(exists=True, dir_okay=False)
+)
+
 def get_serviceaccount_id():
     ctx = click.get_current_context()
 
@@ -2,10 +2,13 @@
 
 import configparser
 import json
+import os
+import tempfile
+import threading
 import click
 import jwt
+from contextlib import contextmanager
 from typing import Tuple
-import requests
 import time
 from requests.exceptions import HTTPError
 from enum import auto
@@ -21,6 +24,7 @@
 from kxi.auth import CredentialStore
 
 from kxicli import log
+from kxicli.resources import http
 from kxicli.common import sanitize_hostname, handle_http_exception, get_default_val, \
     key_hostname, key_keycloak_realm
 from kxicli.options import get_serviceaccount_secret, get_serviceaccount_id
@@ -30,6 +34,15 @@
 token_cache_file = str(token_cache_path / 'credentials')
 token_cache_format = "toml"
 
+# tokens are renewed when they expire within this many seconds so they don't expire mid command
+TOKEN_REFRESH_MARGIN = 60
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
 class TokenType(AutoNameEnum):
     """kdb Insights token type.
 
@@ -47,13 +60,142 @@ class TokenType(AutoNameEnum):
     help='Location to cache the auth token'
 )
 
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _lock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+    else:
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# guards the registries below, never held while a file is locked or a token is requested
+_process_lock = threading.Lock()
+_thread_locks = {}
+_file_locks = {}
+_refresh_locks = {}
+_stores = {}
+
+
+def _registered_lock(locks, key, factory=threading.Lock):
+    with _process_lock:
+        if key not in locks:
+            locks[key] = factory()
+        return locks[key]
+
+
+@contextmanager
+def credentials_lock(cache_file: str = token_cache_file):
+    """Exclusive lock on a credentials file shared with other kxi processes
+
+    Only hold it to read and write the file. The lock is re-entrant within a thread so a writer can be
+    called while the lock is held.
+    """
+    lock_path = f'{cache_file}.lock'
+    with _registered_lock(_thread_locks, lock_path, threading.RLock):
+        if lock_path not in _file_locks:
+            Path(lock_path).parent.mkdir(parents=True, exist_ok=True)
+            f = open(lock_path, 'a')
+            _lock_file(f)
+            _file_locks[lock_path] = [f, 0]
+        entry = _file_locks[lock_path]
+        entry[1] += 1
+        try:
+            yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _file_locks[lock_path]
+                _unlock_file(entry[0])
+                entry[0].close()
+
+
+class SharedCredentialStore(CredentialStore):
+    """Credential store shared by every client in the process
+
+    The credentials file is parsed once and again whenever a value is read after it changed on disk. Values
+    are only written when they change, by replacing the file atomically while holding the credentials lock.
+    """
+    def __init__(self, name, file_path, file_format=token_cache_format):
+        self._init_args = {'name': name, 'file_path': file_path, 'file_format': file_format}
+        self._reload_lock = threading.RLock()
+        self.reload()
+
+    def reload(self):
+        with self._reload_lock:
+            self.stamp = _file_stamp(self._init_args['file_path'])
+            super().__init__(**self._init_args)
+
+    def _reload_if_changed(self):
+        with self._reload_lock:
+            if self.stamp != _file_stamp(self._init_args['file_path']):
+                self.reload()
+
+    def get(self, key, *args, **kwargs):
+        self._reload_if_changed()
+        return super().get(key, *args, **kwargs)
+
+    def get_token(self, *args, **kwargs):
+        self._reload_if_changed()
+        return super().get_token(*args, **kwargs)
+
+    def set(self, **kwargs):
+        # enums such as the grant type may be read back as their value
+        if any(getattr(self.get(k), 'value', self.get(k)) != getattr(v, 'value', v) for k, v in kwargs.items()):
+            self._write(lambda store: store.set(**kwargs))
+
+    def set_token(self, token):
+        if token != self.get_token():
+            self._write(lambda store: store.set_token(token))
+
+    def _write(self, update):
+        path = Path(self._init_args['file_path'])
+        with credentials_lock(str(path)):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+            try:
+                # start from the file on disk so changes other processes made to it are kept
+                with os.fdopen(fd, 'wb') as f:
+                    if path.exists():
+                        f.write(path.read_bytes())
+                update(CredentialStore(**{**self._init_args, 'file_path': tmp}))
+                os.replace(tmp, path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            log.debug(f'Updated credentials in {path}')
+            self.reload()
+
+
+def credential_store(cache_file: str = token_cache_file) -> SharedCredentialStore:
+    """Credential store of the current profile, loaded once per process"""
+    key = (options.get_profile(), str(cache_file))
+    with _process_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = SharedCredentialStore(name=key[0], file_path=key[1])
+    return store
+
+
 def get_serviceaccount_token(hostname, realm, token_type):
     """Get Keycloak client access token"""
     log.debug('Requesting access token')
     hostname = sanitize_hostname(hostname)
     
-    store = CredentialStore(name = options.get_profile() ,file_path= token_cache_file, 
-                            file_format= token_cache_format)
+    store = credential_store(token_cache_file)
 
     auth = Authorizer(host=hostname, realm=realm,grant_type=token_type,
                     client_id=options.get_serviceaccount_id(),
@@ -84,7 +226,7 @@ def get_admin_token(hostname, username, password):
     }
 
     try:
-        r = requests.post(url, headers=headers, data=payload)
+        r = http.session(url).post(url, headers=headers, data=payload)
         r.raise_for_status()
         return r.json()['access_token']
     except HTTPError as e:
@@ -93,8 +235,7 @@ def get_admin_token(hostname, username, password):
 
 def user_login(hostname, realm, redirect_host, redirect_port, force_code) -> str:
     log.debug('Requesting user access token')
-    store = CredentialStore(name = options.get_profile() ,file_path= token_cache_file, 
-                            file_format= token_cache_format)
+    store = credential_store(token_cache_file)
 
     auth = Authorizer(host=hostname, realm=realm,grant_type=TokenType.USER, 
                       client_id=options.auth_client.retrieve_value(),
@@ -125,10 +266,10 @@ def write_to_cache(
     token_type: TokenType,
     cache_file: str = token_cache_file
 ):
-    store = CredentialStore(name = options.get_profile() ,file_path= cache_file, 
-                    file_format= token_cache_format)
-    store.set(grant_type=token_type)
-    store.set_token(oauth_token_data)
+    store = credential_store(cache_file)
+    with credentials_lock(cache_file):
+        store.set(grant_type=token_type)
+        store.set_token(oauth_token_data)
 
 
 def retrieve_token(hostname: str,
@@ -148,9 +289,8 @@ def retrieve_token(hostname: str,
 
 
 def check_cached_token_active(cache_file: str = token_cache_file) -> Tuple[str, TokenType, bool]:
-    store = CredentialStore(name = options.get_profile() ,file_path= cache_file, 
-                        file_format= token_cache_format)
-    token_dict = store.get_token()
+    """Cached token, its type and whether it stays usable for at least TOKEN_REFRESH_MARGIN seconds"""
+    token_dict = credential_store(cache_file).get_token()
 
     if token_dict is None:
         return None, None, False
@@ -163,7 +303,7 @@ def check_cached_token_active(cache_file: str = token_cache_file) -> Tuple[str,
         refresh_token_expires_at = token_dict['expires_at']
         token_type = TokenType.SERVICEACCOUNT
 
-    return token_dict, token_type,  int(refresh_token_expires_at) > time.time()
+    return token_dict, token_type,  int(refresh_token_expires_at) > time.time() + TOKEN_REFRESH_MARGIN
 
 def get_token(hostname: str = get_default_val(key_hostname),
     realm: str = get_default_val(key_keycloak_realm),
@@ -188,14 +328,25 @@ def get_token(hostname: str = get_default_val(key_hostname),
     if token_type is None:
         token_type = determine_token_type(serviceaccount_id, serviceaccount_secret)
 
-    log.debug(f'Valid token not found, retrieving new {token_type.value} token.')
-    return retrieve_token(hostname,
-                     realm,
-                     redirect_host,
-                     redirect_port,
-                     token_type,
-                     force_code
-                     )
+    if token_type != TokenType.SERVICEACCOUNT:
+        log.debug(f'Valid token not found, retrieving new {token_type.value} token.')
+        return retrieve_token(hostname, realm, redirect_host, redirect_port, token_type, force_code)
+
+    # only one thread of the process requests a service account token, the others wait and use the one
+    # it cached. The credentials lock isn't held meanwhile, the request only takes it to write the token.
+    with _registered_lock(_refresh_locks, str(cache_file)):
+        token, _, active = check_cached_token_active(cache_file)
+        if active:
+            return token['access_token']
+
+        log.debug(f'Valid token not found, retrieving new {token_type.value} token.')
+        return retrieve_token(hostname,
+                         realm,
+                         redirect_host,
+                         redirect_port,
+                         token_type,
+                         force_code
+                         )
 
 
 def determine_token_type(
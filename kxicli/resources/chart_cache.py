@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+from kxicli import common, log
+
+META_FILE = 'meta.json'
+
+# returned by load_parsed when the data hasn't been cached yet
+MISSING = object()
+
+
+def root() -> Path:
+    return common.cache_path / 'charts'
+
+
+def entry_dir(repo: str, chart: str, version: str) -> Path:
+    """Directory of a chart in the cache, addressed by a digest of its repo URL, name and version"""
+    return root() / hashlib.sha256(f'{repo}/{chart}/{version}'.encode()).hexdigest()
+
+
+def _digest(path: Path) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def _read_json(path: Path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path: Path, data):
+    """Replace a file atomically so a concurrent reader never sees it half written"""
+    text = json.dumps(data)
+    with tempfile.NamedTemporaryFile('w', dir=path.parent, delete=False) as f:
+        f.write(text)
+    os.replace(f.name, path)
+
+
+def lookup(repo: str, chart: str, version: str) -> Optional[Path]:
+    """Cache directory of a chart if its archive is present and matches the digest recorded when it was stored
+
+    Entries that fail verification are removed.
+    """
+    entry = entry_dir(repo, chart, version)
+    meta = _read_json(entry / META_FILE)
+    if meta is None:
+        return None
+
+    archive = entry / meta['file']
+    if not archive.is_file() or _digest(archive) != meta['sha256']:
+        log.debug(f'Discarding cached chart {repo}/{chart} {version}, failed verification')
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+
+    meta['last_used'] = time.time()
+    _write_json(entry / META_FILE, meta)
+    log.debug(f'Using cached chart {repo}/{chart} {version} from {entry}')
+    return entry
+
+
+def store(repo: str, chart: str, version: str, archive: Path) -> Optional[Path]:
+    """Copy a fetched chart archive into the cache, returns the cache directory or None if it couldn't be stored"""
+    entry = entry_dir(repo, chart, version)
+    try:
+        entry.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=entry, delete=False) as f:
+            with open(archive, 'rb') as src:
+                shutil.copyfileobj(src, f)
+        os.replace(f.name, entry / archive.name)
+        _write_json(entry / META_FILE, {
+            'repo': repo,
+            'chart': chart,
+            'version': version,
+            'file': archive.name,
+            'sha256': _digest(entry / archive.name),
+            'last_used': time.time()
+        })
+    except OSError as e:
+        log.debug(f'Could not cache chart {repo}/{chart} {version}: {e}')
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+
+    prune(int(common.get_default_val(common.key_chart_cache_max_size)) * 1024 * 1024)
+    return entry
+
+
+def load_parsed(entry: Path, name: str):
+    """Data previously parsed from the chart in entry, MISSING if it hasn't been saved"""
+    data = _read_json(entry / f'{name}.json')
+    return MISSING if data is None else data['data']
+
+
+def save_parsed(entry: Path, name: str, data):
+    try:
+        _write_json(entry / f'{name}.json', {'data': data})
+    except (OSError, TypeError, ValueError) as e:
+        log.debug(f'Could not cache {name} in {entry}: {e}')
+
+
+def entries():
+    """Cached charts as (directory, metadata, size in bytes), least recently used first"""
+    result = []
+    for entry in root().iterdir() if root().is_dir() else []:
+        meta = _read_json(entry / META_FILE) or {}
+        size = sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+        result.append((entry, meta, size))
+    return sorted(result, key=lambda x: x[1].get('last_used', 0))
+
+
+def prune(max_size: int):
+    """Remove least recently used charts until the cache is no larger than max_size bytes
+
+    Returns the metadata of the removed charts.
+    """
+    cached = entries()
+    total = sum(size for _, _, size in cached)
+    removed = []
+    for entry, meta, size in cached:
+        if total <= max_size:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        removed.append(meta)
+    return removed
@@ -0,0 +1,237 @@
+"""Forwarding of kxi invocations to a long running process that keeps the CLI runtime loaded
+
+Only the standard library is imported here so that the forwarding client starts quickly.
+"""
+from __future__ import annotations
+
+import codecs
+import io
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+
+ENV_DAEMON = 'KXI_DAEMON'
+ENV_DAEMON_SOCKET = 'KXI_DAEMON_SOCKET'
+
+# Environment the loaded runtime was built from, invocations with other values aren't forwarded
+PINNED_ENV = ('HOME', 'KUBECONFIG', 'KXI_SERVICEACCOUNT_ID', 'KXI_SERVICEACCOUNT_SECRET')
+
+# Root options of kxi taking a value, needed to find the command of an invocation
+ROOT_OPTIONS_WITH_VALUE = ('--profile', '--trace-file')
+
+# Seconds to wait for output still buffered in the pipes once an invocation has finished
+DRAIN_TIMEOUT = 5
+
+
+def socket_path() -> str:
+    return os.environ.get(ENV_DAEMON_SOCKET) or os.path.join(os.path.expanduser('~'), '.insights', 'kxi-daemon.sock')
+
+
+def enabled() -> bool:
+    """Whether invocations should be forwarded to the daemon"""
+    return os.environ.get(ENV_DAEMON, '').lower() in ('1', 'true', 'yes')
+
+
+def command_name(argv: List[str]) -> Optional[str]:
+    """Top level command of an invocation"""
+    args = iter(argv)
+    for arg in args:
+        if arg in ROOT_OPTIONS_WITH_VALUE:
+            next(args, None)
+        elif not arg.startswith('-'):
+            return arg
+    return None
+
+
+def _send(sock, message):
+    sock.sendall(json.dumps(message).encode() + b'\n')
+
+
+def _read(sock_file):
+    line = sock_file.readline()
+    return json.loads(line) if line else None
+
+
+def _connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def forward(argv: List[str], path: Optional[str] = None) -> Optional[int]:
+    """Run an invocation in the daemon, writing its output to the streams of this process
+
+    Returns the exit code, None if no daemon is listening or it can't run the invocation.
+    """
+    if command_name(argv) == 'daemon':
+        return None
+    sock = _connect(path or socket_path())
+    if sock is None:
+        return None
+
+    with sock, sock.makefile('rb') as f:
+        _send(sock, {'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ)})
+        while (message := _read(f)) is not None:
+            if 'out' in message:
+                sys.stdout.write(message['out'])
+                sys.stdout.flush()
+            elif 'err' in message:
+                sys.stderr.write(message['err'])
+                sys.stderr.flush()
+            elif 'exit' in message:
+                return message['exit']
+            elif 'fallback' in message:
+                return None
+
+    sys.stderr.write('Error: Lost connection to kxi daemon\n')
+    return 1
+
+
+def control(action: str, path: Optional[str] = None):
+    """Send a control request to the daemon, returns its reply or None if no daemon is listening"""
+    sock = _connect(path or socket_path())
+    if sock is None:
+        return None
+    with sock, sock.makefile('rb') as f:
+        _send(sock, {'control': action})
+        return _read(f)
+
+
+def _pump(fd, sock, key, lock):
+    """Send everything written to a pipe to the client until it's closed"""
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    with open(fd, 'rb', buffering=0) as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            text = decoder.decode(chunk)
+            if not text:
+                continue
+            with lock:
+                try:
+                    _send(sock, {key: text})
+                except OSError:
+                    # the client went away, keep draining so writers don't block
+                    pass
+
+
+@contextmanager
+def redirected_output(sock):
+    """Send stdout and stderr of this process to the client for the duration of the block
+
+    The file descriptors are redirected rather than sys.stdout, so output of subprocesses is forwarded too.
+    """
+    lock = threading.Lock()
+    saved = []
+    pumps = []
+    for fd, key, name in ((1, 'out', 'stdout'), (2, 'err', 'stderr')):
+        getattr(sys, name).flush()
+        read_end, write_end = os.pipe()
+        saved.append((fd, os.dup(fd), name, getattr(sys, name)))
+        os.dup2(write_end, fd)
+        os.close(write_end)
+        setattr(sys, name, io.TextIOWrapper(open(fd, 'wb', buffering=0, closefd=False),
+                                            encoding='utf-8', errors='replace', write_through=True))
+        pump = threading.Thread(target=_pump, args=(read_end, sock, key, lock), daemon=True)
+        pump.start()
+        pumps.append(pump)
+    try:
+        yield
+    finally:
+        for fd, copy, name, stream in saved:
+            getattr(sys, name).flush()
+            os.dup2(copy, fd)
+            os.close(copy)
+            setattr(sys, name, stream)
+        for pump in pumps:
+            pump.join(DRAIN_TIMEOUT)
+
+
+class Daemon():
+    """Runs forwarded invocations one at a time in this process
+
+    run is called with the request of each invocation while its output is redirected to the client
+    and returns the exit code.
+    """
+    def __init__(self, path: str, run: Callable[[dict], int], idle_timeout: Optional[float] = None):
+        self.path = path
+        self.run = run
+        self.idle_timeout = idle_timeout or None
+        self.started = time.time()
+        self.served = 0
+        self.env = {k: os.environ.get(k) for k in PINNED_ENV}
+        self.stopping = False
+
+    def listen(self) -> socket.socket:
+        if os.path.exists(self.path):
+            if control('status', self.path) is not None:
+                raise RuntimeError(f'A kxi daemon is already listening on {self.path}')
+            os.unlink(self.path)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # only the owner may connect, invocations run with the owner's credentials
+        umask = os.umask(0o177)
+        try:
+            listener.bind(self.path)
+        finally:
+            os.umask(umask)
+        listener.listen()
+        return listener
+
+    def serve(self, listener: socket.socket):
+        """Accept invocations until stopped or idle for longer than idle_timeout seconds"""
+        listener.settimeout(self.idle_timeout)
+        try:
+            while not self.stopping:
+                try:
+                    conn, _ = listener.accept()
+                except socket.timeout:
+                    break
+                with conn, conn.makefile('rb') as f:
+                    conn.settimeout(None)
+                    try:
+                        self.handle(conn, _read(f))
+                    except (OSError, ValueError):
+                        pass
+        finally:
+            listener.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def status(self):
+        return {
+            'pid': os.getpid(),
+            'uptime': time.time() - self.started,
+            'served': self.served
+        }
+
+    def handle(self, conn, request):
+        if request is None:
+            return
+        if 'control' in request:
+            if request['control'] == 'stop':
+                self.stopping = True
+            _send(conn, self.status())
+            return
+
+        env = request.get('env', {})
+        differing = [k for k in PINNED_ENV if env.get(k) != self.env[k]]
+        if differing:
+            _send(conn, {'fallback': f'{", ".join(differing)} differ from the daemon'})
+            return
+        if command_name(request['argv']) == 'daemon':
+            _send(conn, {'fallback': 'daemon commands are not forwarded'})
+            return
+
+        with redirected_output(conn):
+            code = self.run(request)
+        self.served += 1
+        _send(conn, {'exit': code})
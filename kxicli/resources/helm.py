@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import click
+import itertools
 import os
 import subprocess
+import threading
+import time
 from functools import lru_cache
 from typing import List
 import json
@@ -15,7 +18,7 @@
 from kxicli import log
 from kxicli.common import parse_called_process_error
 from kxicli.commands.common.docker import temp_docker_config
-from kxicli.resources import helm_chart
+from kxicli.resources import helm_chart, trace
 
 class RequiredHelmVersion(Version):
     pass
@@ -32,10 +35,123 @@ class LocalHelmVersion(Version):
 class RepoNotFoundException(Exception):
     pass
 
+
+HELM_CALLS_META_KEY = 'kxicli.helm'
+
+# worker threads of an invocation can look up its helm calls at the same time
+_calls_lock = threading.Lock()
+
+
+class HelmCalls():
+    """Helm processes spawned during a single CLI invocation
+
+    Output of read-only commands is kept so that repeating them doesn't spawn another process,
+    it is dropped whenever a command that changes releases or repositories runs.
+    """
+    def __init__(self):
+        self.results = {}
+        self.durations = []
+        self.hits = 0
+
+    def invalidate(self):
+        self.results.clear()
+
+    def record(self, cmd, duration):
+        self.durations.append((helm_command_name(cmd), duration))
+
+    def log_summary(self):
+        if not self.durations and not self.hits:
+            return
+        total = sum(duration for _, duration in self.durations)
+        log.debug(f'Spawned {len(self.durations)} helm processes in {total:.2f}s, reused {self.hits} cached results')
+        for name, duration in self.durations:
+            log.debug(f'  {duration:.2f}s {name}')
+
+
+def helm_command_name(cmd):
+    # only keep the helm subcommand, arguments can contain credentials
+    return ' '.join(itertools.takewhile(lambda x: not x.startswith('-'), cmd[:3]))
+
+
+def _current_calls():
+    """HelmCalls of the running CLI invocation, None outside of a click context"""
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        return None
+    root = ctx.find_root()
+    with _calls_lock:
+        if HELM_CALLS_META_KEY not in root.meta:
+            root.meta[HELM_CALLS_META_KEY] = HelmCalls()
+            root.call_on_close(root.meta[HELM_CALLS_META_KEY].log_summary)
+    return root.meta[HELM_CALLS_META_KEY]
+
+
+def _spawn(name, spawn_function, cmd, cache, invalidate, kwargs):
+    calls = _current_calls()
+    if calls is None:
+        return spawn_function(cmd, **kwargs)
+
+    key = None
+    if invalidate:
+        calls.invalidate()
+    elif cache:
+        key = _cache_key(name, cmd, kwargs)
+        if key in calls.results:
+            calls.hits += 1
+            return calls.results[key]
+
+    start = time.monotonic()
+    try:
+        with trace.span(helm_command_name(cmd), trace.CATEGORY_SUBPROCESS):
+            res = spawn_function(cmd, **kwargs)
+    finally:
+        calls.record(cmd, time.monotonic() - start)
+
+    if key is not None:
+        calls.results[key] = res
+    return res
+
+
+def _cache_key(name, cmd, kwargs):
+    """Key of a cached helm call, None when its arguments can't be hashed so it isn't cached"""
+    key = (name, tuple(cmd), _freeze(kwargs))
+    try:
+        hash(key)
+    except TypeError:
+        log.debug(f'Not caching {helm_command_name(cmd)}, its arguments are not hashable')
+        return None
+    return key
+
+
+def _freeze(value):
+    # dicts such as env= and lists are compared by their items
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def run(cmd, cache=False, invalidate=False, **kwargs) -> subprocess.CompletedProcess:
+    """Call subprocess.run for a helm command
+
+    Args:
+        cmd: Command to run
+        cache: Command is read-only, reuse its result for the rest of the invocation
+        invalidate: Command changes releases or repositories, drop all cached results
+        kwargs: Passed through to subprocess.run
+    """
+    return _spawn('run', subprocess.run, cmd, cache, invalidate, kwargs)
+
+
+def check_output(cmd, cache=False, invalidate=False, **kwargs):
+    """Call subprocess.check_output for a helm command, see run for the arguments"""
+    return _spawn('check_output', subprocess.check_output, cmd, cache, invalidate, kwargs)
+
 def env():
     log.debug('Attempting to call: helm env')
     try:
-        out = subprocess.check_output(['helm', 'env'])
+        out = check_output(['helm', 'env'], cache=True)
     except subprocess.CalledProcessError as e:
         raise click.ClickException(e)
 
@@ -64,7 +180,7 @@ def fetch(repo, chart_name, destination=None, version=None, docker_config=''):
         with temp_docker_config(docker_config) as temp_dir:
             helm_env = os.environ.copy()
             helm_env['DOCKER_CONFIG'] = temp_dir
-            out = subprocess.check_output(cmd, env=helm_env)
+            out = check_output(cmd, env=helm_env)
     except subprocess.CalledProcessError as e:
         raise ClickException(e)
 
@@ -123,7 +239,8 @@ def upgrade_install(
         with temp_docker_config(docker_config) as temp_dir:
             helm_env = os.environ.copy()
             helm_env['DOCKER_CONFIG'] = temp_dir
-            return subprocess.run(base_command, check=True, input=input_arg, text=text_arg, env=helm_env, capture_output=True)
+            return run(base_command, invalidate=True, check=True, input=input_arg, text=text_arg, env=helm_env,
+                       capture_output=True)
     except subprocess.CalledProcessError as e:
         msg = parse_called_process_error(e)
         raise ClickException(msg)
@@ -144,7 +261,7 @@ def uninstall(release, namespace=None):
 
     try:
         log.debug(f'Uninstall command {base_command}')
-        return subprocess.run(base_command, check=True)
+        return run(base_command, invalidate=True, check=True)
     except subprocess.CalledProcessError as e:
         raise ClickException(str(e))
 
@@ -171,7 +288,7 @@ def get_helm_version_checked() -> HelmVersionChecked:
 def _get_helm_version() -> LocalHelmVersion:
     command: List[str] = ['helm', 'version', "--template={{.Version}}"]
     try:
-        version: str = subprocess.check_output(command, text=True)
+        version: str = check_output(command, cache=True, text=True)
         return LocalHelmVersion(version=version)
     except subprocess.CalledProcessError as e:
         raise ClickException(str(e))
@@ -180,14 +297,14 @@ def repo_update(repos: list[str] = None, **kwargs) -> subprocess.CompletedProces
     cmd = ['helm', 'repo', 'update']
     if repos is not None:
         cmd += repos
-    return subprocess.run(cmd, check=True, **kwargs)
+    return run(cmd, invalidate=True, check=True, **kwargs)
 
 def get_values(release, namespace=None):
     cmd = ['helm', 'get', 'values', release]
     if namespace is not None:
         cmd = cmd + ['--namespace', namespace]
 
-    values = yaml.safe_load(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout)
+    values = yaml.safe_load(run(cmd, cache=True, check=True, capture_output=True, text=True).stdout)
     values.pop('USER-SUPPLIED VALUES', None)
 
     return values
@@ -197,21 +314,21 @@ def history(release, output, show_operator, current_operator_version, current_op
     log.debug('Attempting to call: helm history' + f'{release}')
     try:
         if output == 'json':
-            result1 = subprocess.run(['helm', 'history', release, '--namespace', namespace, '--output', 'json'], check=True, capture_output=True, text=True)
+            result1 = run(['helm', 'history', release, '--namespace', namespace, '--output', 'json'], cache=True, check=True, capture_output=True, text=True)
             res1 = json.loads(result1.stdout)
             try:
-                result2 = subprocess.run(['helm', 'history', current_operator_release, '--namespace', 'kxi-operator', '--output', 'json'], check=True, capture_output=True, text=True)
+                result2 = run(['helm', 'history', current_operator_release, '--namespace', 'kxi-operator', '--output', 'json'], cache=True, check=True, capture_output=True, text=True)
                 res2 = json.loads(result2.stdout)
             except subprocess.CalledProcessError as e:
                 res2 = []
             return res1,res2
         else:
-            result1 = subprocess.run(['helm', 'history', release, '--namespace', namespace],  stdout=subprocess.PIPE, check=True)
+            result1 = run(['helm', 'history', release, '--namespace', namespace], cache=True, stdout=subprocess.PIPE, check=True)
             output1 = result1.stdout.decode('utf-8')
             if not show_operator:
                 return print(output1)
             try:
-                result2 = subprocess.run(['helm', 'history', current_operator_release, '--namespace', 'kxi-operator'],stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=True)
+                result2 = run(['helm', 'history', current_operator_release, '--namespace', 'kxi-operator'], cache=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=True)
                 output2 = result2.stdout.decode('utf-8').split('\n')[1:]
             except subprocess.CalledProcessError as e:
                 if current_operator_version == []:
@@ -236,8 +353,8 @@ def add_repo(chart_repo_name, url, username, password):
     log.debug(
         f'Attempting to call: helm repo add --username {username} --password {len(password)*"*"} {chart_repo_name} {url}')
     try:
-        return subprocess.run(['helm', 'repo', 'add', '--username', username, '--password', password, chart_repo_name, url],
-                       check=True)
+        return run(['helm', 'repo', 'add', '--username', username, '--password', password, chart_repo_name, url],
+                   invalidate=True, check=True)
     except subprocess.CalledProcessError:
         # Pass here so that the password isn't printed in the log
         pass
@@ -247,20 +364,25 @@ def repo_list():
     """Call 'helm repo list' using subprocess.run"""
     log.debug('Attempting to call: helm repo list')
     try:
-        res = subprocess.run(
-            ['helm', 'repo', 'list', '--output', 'json'], check=True, capture_output=True, text=True)
+        res = run(
+            ['helm', 'repo', 'list', '--output', 'json'], cache=True, check=True, capture_output=True, text=True)
         return json.loads(res.stdout)
     except subprocess.CalledProcessError as e:
         click.echo(e)
         return []
 
 
+def repo_url(chart_repo_name):
+    """URL of a repository added to helm, the name itself if helm has no repository of that name"""
+    return next((item['url'] for item in repo_list() if item['name'] == chart_repo_name), chart_repo_name)
+
+
 def search_repo(
     chart: str,
     args: list[str] = []
 ) -> subprocess.CompletedProcess:
     cmd = ['helm', 'search', 'repo', chart] + args
-    return subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return run(cmd, cache=True, check=True, capture_output=True, text=True)
 
 
 def list_versions(chart_repo_name):
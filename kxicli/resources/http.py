@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import click
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from kxicli import common, log
+
+HTTP_SESSIONS_META_KEY = 'kxicli.http'
+
+# only methods that can safely be sent again are retried
+RETRY_METHODS = ['HEAD', 'GET', 'PUT', 'DELETE', 'OPTIONS']
+RETRY_STATUSES = [429, 502, 503, 504]
+
+
+class HttpSessions():
+    """HTTP sessions and API clients shared during a single CLI invocation
+
+    There is one session per host so its connections are kept alive and reused across requests.
+    """
+    def __init__(self):
+        self.sessions = {}
+        self.external = []
+        self.clients = {}
+
+    def get(self, url):
+        host = _host(url)
+        if host not in self.sessions:
+            self.sessions[host] = configure(requests.Session())
+        return self.sessions[host]
+
+    def log_summary(self):
+        for host, session in [*self.sessions.items(), *self.external]:
+            num_requests, num_connections = pool_stats(session)
+            log.debug(f'HTTP {host}: {num_requests} requests over {num_connections} connections')
+
+
+# Set by kxi daemon so sessions and clients outlive a single CLI invocation
+_process_sessions = None
+
+# worker threads of an invocation can look up its sessions at the same time
+_sessions_lock = threading.Lock()
+
+
+@contextmanager
+def keep_alive():
+    """Share sessions and API clients between the CLI invocations run by this process within the block"""
+    global _process_sessions
+    previous = _process_sessions
+    _process_sessions = previous or HttpSessions()
+    try:
+        yield _process_sessions
+    finally:
+        _process_sessions = previous
+
+
+def _host(url):
+    parsed = urlparse(url if '://' in url else f'https://{url}')
+    return f'{parsed.scheme}://{parsed.netloc}'
+
+
+def _current_sessions():
+    """HttpSessions of the running CLI invocation, None outside of a click context"""
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        return None
+    root = ctx.find_root()
+    with _sessions_lock:
+        if HTTP_SESSIONS_META_KEY not in root.meta:
+            root.meta[HTTP_SESSIONS_META_KEY] = _process_sessions or HttpSessions()
+            root.call_on_close(root.meta[HTTP_SESSIONS_META_KEY].log_summary)
+    return root.meta[HTTP_SESSIONS_META_KEY]
+
+
+def adapter() -> HTTPAdapter:
+    """Transport adapter with the configured pool size and retry policy"""
+    pool_size = int(common.get_default_val(common.key_http_pool_size))
+    retry = Retry(
+        total=int(common.get_default_val(common.key_http_retries)),
+        backoff_factor=float(common.get_default_val(common.key_http_backoff_factor)),
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        raise_on_status=False
+    )
+    return HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+
+def configure(session: requests.Session) -> requests.Session:
+    """Mount the pooled, retrying adapter on a session"""
+    http_adapter = adapter()
+    session.mount('https://', http_adapter)
+    session.mount('http://', http_adapter)
+    return session
+
+
+def register(url, session: requests.Session) -> requests.Session:
+    """Mount the pooled, retrying adapter on a session created by another library and include it in the summary"""
+    configure(session)
+    sessions = _current_sessions()
+    if sessions is not None:
+        sessions.external.append((_host(url), session))
+    return session
+
+
+def session(url) -> requests.Session:
+    """Session for the host of url, shared for the rest of the CLI invocation"""
+    sessions = _current_sessions()
+    if sessions is None:
+        return configure(requests.Session())
+    return sessions.get(url)
+
+
+def shared_client(key, create):
+    """API client for key, created once per CLI invocation so its session and token are reused"""
+    sessions = _current_sessions()
+    if sessions is None:
+        return create()
+    if sessions is _process_sessions:
+        # clients are configured from the profile of the invocation that created them
+        ctx = click.get_current_context()
+        key = (ctx.find_root().params.get('profile'), key)
+    if key not in sessions.clients:
+        sessions.clients[key] = create()
+    return sessions.clients[key]
+
+
+def pool_stats(session: requests.Session):
+    """Number of requests sent and connections opened by the pools of a session"""
+    num_requests = num_connections = 0
+    for http_adapter in {id(a): a for a in session.adapters.values()}.values():
+        pools = getattr(getattr(http_adapter, 'poolmanager', None), 'pools', None)
+        for key in pools.keys() if pools is not None else []:
+            pool = pools.get(key)
+            num_requests += getattr(pool, 'num_requests', 0)
+            num_connections += getattr(pool, 'num_connections', 0)
+    return num_requests, num_connections
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import click
+
+from kxicli import log
+
+TRACE_META_KEY = 'kxicli.trace'
+
+CATEGORY_PHASE = 'phase'
+CATEGORY_SUBPROCESS = 'subprocess'
+CATEGORY_K8S = 'k8s'
+
+
+class Tracer():
+    """Timed spans recorded during a single CLI invocation
+
+    Spans nest by time, a span started while another one is open on the same thread is its child.
+    """
+    def __init__(self, trace_file=None):
+        self.trace_file = trace_file
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def enter(self):
+        depth = getattr(self._local, 'depth', 0)
+        self._local.depth = depth + 1
+        return depth
+
+    def record(self, name, category, start, duration, depth, args):
+        self._local.depth = depth
+        with self._lock:
+            self.spans.append({
+                'name': name,
+                'cat': category,
+                'start': start - self.origin,
+                'duration': duration,
+                'depth': depth,
+                'tid': threading.get_ident(),
+                'args': args
+            })
+
+    def chrome_trace(self):
+        """Spans in the Chrome trace event format, viewable in chrome://tracing or Perfetto"""
+        pid = os.getpid()
+        events = [{
+            'name': span['name'],
+            'cat': span['cat'],
+            'ph': 'X',
+            'ts': round(span['start'] * 1e6),
+            'dur': round(span['duration'] * 1e6),
+            'pid': pid,
+            'tid': span['tid'],
+            'args': {k: str(v) for k, v in span['args'].items()}
+        } for span in sorted(self.spans, key=lambda s: s['start'])]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self):
+        with open(self.trace_file, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        log.debug(f'Wrote {len(self.spans)} spans to {self.trace_file}')
+
+    def log_summary(self):
+        phases = [s for s in sorted(self.spans, key=lambda s: s['start']) if s['cat'] == CATEGORY_PHASE]
+        if not phases:
+            return
+        log.debug('Phase timings')
+        for span in phases:
+            log.debug(f'  {span["duration"]:8.2f}s {"  " * span["depth"]}{span["name"]}')
+        for category in (CATEGORY_SUBPROCESS, CATEGORY_K8S):
+            calls = [s['duration'] for s in self.spans if s['cat'] == category]
+            if calls:
+                log.debug(f'  {sum(calls):8.2f}s in {len(calls)} {category} calls')
+
+    def close(self):
+        if self.trace_file:
+            self.write()
+        self.log_summary()
+
+
+def start(trace_file=None):
+    """Record spans for the rest of the CLI invocation, writing them to trace_file when it closes"""
+    root = click.get_current_context().find_root()
+    root.meta[TRACE_META_KEY] = Tracer(trace_file)
+    root.call_on_close(root.meta[TRACE_META_KEY].close)
+
+
+def _current_tracer():
+    """Tracer of the running CLI invocation, None when tracing isn't enabled"""
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        return None
+    return ctx.find_root().meta.get(TRACE_META_KEY)
+
+
+@contextmanager
+def span(name, category=CATEGORY_PHASE, **args):
+    """Time the enclosed block as a span, does nothing unless tracing is enabled"""
+    tracer = _current_tracer()
+    if tracer is None:
+        yield
+        return
+
+    depth = tracer.enter()
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        tracer.record(name, category, begin, time.perf_counter() - begin, depth, args)
+
+
+def traced(name, category=CATEGORY_PHASE):
+    """Decorator timing every call of a function as a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
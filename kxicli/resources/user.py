@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import time
+
 from kxi.auth import Authorizer
 
+from kxicli.resources import http
+
 class UserNotFoundException(Exception):
     pass
 
@@ -12,18 +16,63 @@ class MultipleUsersWithNameException(Exception):
     pass
 
 class UserManager():
+    """Keycloak users and realm roles of a realm
+
+    Users looked up by name and the realm roles are kept in an index for index_ttl seconds,
+    so operations on many users don't fetch the same user or the role list again.
+    """
     def __init__(
         self,
         host: str,
         username: str,
         password: str,
         user_realm: str = "insights",
-        timeout: int = 2
+        timeout: int = 2,
+        index_ttl: float = 300
 
     ):
         self.host = host
         self.auth = Authorizer.for_admin(host, username=username, password=password, timeout=timeout)
+        http.register(host, self.auth.session)
         self.url = f"{self.host}/auth/admin/realms/{user_realm}"
+        self.index_ttl = index_ttl
+        # username -> (user, time indexed)
+        self._users = {}
+        # role name -> role, and the time the roles were indexed
+        self._roles = {}
+        self._roles_indexed_at = None
+
+    def _fresh(self, indexed_at):
+        return indexed_at is not None and time.monotonic() - indexed_at < self.index_ttl
+
+    def invalidate_index(self):
+        self._users.clear()
+        self._roles = {}
+        self._roles_indexed_at = None
+
+    def index_users(self, page_size: int = 100):
+        """Fetch every user of the realm into the index ahead of operations on many users
+
+        Returns the users fetched
+        """
+        users = [*self.iter_users(page_size=page_size, briefRepresentation="true")]
+        now = time.monotonic()
+        for user in users:
+            self._users[user["username"].lower()] = (user, now)
+        return users
+
+    def iter_users(self, page_size: int = 100, **filters):
+        """Iterate over users a page at a time, fetching the next page only when it's reached
+
+        Filters are Keycloak user query parameters, e.g. search, username, email, enabled or exact
+        """
+        first = 0
+        while True:
+            page = self.list_users(params={**filters, "first": first, "max": page_size})
+            yield from page
+            if len(page) < page_size:
+                return
+            first += page_size
 
     def create_user(
         self,
@@ -46,7 +95,15 @@ def create_user(
             ]
         }
 
-        self.auth.session.post(f"{self.url}/users", json=data).raise_for_status()
+        res = self.auth.session.post(f"{self.url}/users", json=data)
+        res.raise_for_status()
+        # Keycloak returns the new user's URL, index it so following role operations don't look it up
+        location = res.headers.get("Location")
+        if location:
+            self._users[username.lower()] = ({"id": location.rstrip("/").rsplit("/", 1)[-1], "username": username},
+                                             time.monotonic())
+        else:
+            self._users.pop(username.lower(), None)
 
     def list_users(self, **kwargs):
         res = self.auth.session.get(f"{self.url}/users", **kwargs)
@@ -55,6 +112,11 @@ def list_users(self, **kwargs):
         return users
 
     def get_user_by_name(self, username: str):
+        # usernames are case-insensitive in Keycloak
+        key = username.lower()
+        if key in self._users and self._fresh(self._users[key][1]):
+            return self._users[key][0]
+
         query = {
             "username": username,
             "exact": "true"
@@ -64,22 +126,24 @@ def get_user_by_name(self, username: str):
             raise UserNotFoundException(username)
         elif len(user) > 1:
             raise MultipleUsersWithNameException(username)
+        self._users[key] = (user[0], time.monotonic())
         return user[0]
 
     def delete_user(self, username):
         user_id = self.get_user_by_name(username)["id"]
-        return self.auth.session.delete(f"{self.url}/users/{user_id}").raise_for_status()
+        res = self.auth.session.delete(f"{self.url}/users/{user_id}").raise_for_status()
+        self._users.pop(username.lower(), None)
+        return res
 
     def get_role_data(self, roles):
-        available = self.get_roles()
+        if not self._fresh(self._roles_indexed_at):
+            self.get_roles()
 
-        data = [role for role in available if role['name'] in roles]
-
-        if len(data) != len(roles):
-            missing_roles = [role for role in roles if role not in [x['name'] for x in data]]
+        missing_roles = [role for role in roles if role not in self._roles]
+        if missing_roles:
             raise RoleNotFoundException(missing_roles)
 
-        return data
+        return [self._roles[role] for role in dict.fromkeys(roles)]
 
     def assign_roles(self, username: str, roles: list[str]):
         user_id = self.get_user_by_name(username)["id"]
@@ -92,7 +156,10 @@ def remove_roles(self, username: str, roles: list[str]):
     def get_roles(self):
         res = self.auth.session.get(f"{self.url}/roles")
         res.raise_for_status()
-        return res.json()
+        roles = res.json()
+        self._roles = {role['name']: role for role in roles}
+        self._roles_indexed_at = time.monotonic()
+        return roles
 
     def get_roles_for_user(self, username: str, role_type: str):
         user_id = self.get_user_by_name(username)["id"]
@@ -3,6 +3,8 @@
 import pytest
 from pytest_mock import MockerFixture
 
+from kxicli import common
+
 
 @pytest.fixture
 def k8s(mocker: MockerFixture):
@@ -36,3 +38,10 @@ def _get_api(name = None, api_version = None, kind = None, **filter_dict):
     client.config.context = "test-context"
     yield client
     delattr(pyk8s, "cl")
+
+
+@pytest.fixture(autouse=True)
+def cache_path(monkeypatch, tmp_path):
+    """Keep the local caches of each test separate and out of the home directory"""
+    monkeypatch.setattr(common, 'cache_path', tmp_path / 'cache')
+    return tmp_path / 'cache'
@@ -268,6 +268,11 @@ def mock_return_conflict_kube(*args, status_code, error_message, detail_message,
     exception.body = json.dumps(error_response)
     raise exception
 
+# page of assemblies from the Kubernetes list function, with the continue token of the next page
+def assembly_page(items, token=None):
+    return pyk8s.resource_item.ItemList(items, metadata={'continue': token} if token else {})
+
+
 # mock the response from the Kubernetes list function
 def mock_list_assemblies(k8s, response=ASSEMBLY_LIST):
     k8s.assemblies.get.return_value = response
@@ -613,6 +618,20 @@ def test_create_assemblies_from_file_creates_when_one_already_exists_k8s_api(moc
         ])
 
 
+def test_create_assemblies_from_file_only_waits_for_created_assemblies(mocker, k8s):
+    mock_list_assemblies(k8s)
+    # creating ASM_NAME fails, ASM_NAME2 is created
+    k8s.assemblies.create.side_effect = mock_return_conflict_for_assembly_k8s
+    wait = mocker.patch('kxicli.commands.assembly.wait_for_assemblies_ready', return_value=[])
+
+    with temp_asm_file() as test_asm_list_file:
+        assembly.backup_assemblies(namespace='test_ns', filepath=test_asm_list_file, force=False)
+        assembly.create_assemblies_from_file(namespace='test_ns', filepath=test_asm_list_file, use_kubeconfig=True,
+                                             wait=True)
+
+    assert wait.call_args[0][0] == [ASM_NAME2]
+
+
 def test_create_assemblies_from_file_does_nothing_when_filepath_is_none():
     assert assembly.create_assemblies_from_file(namespace='test_ns', filepath=None, use_kubeconfig=False) == []
 
@@ -965,7 +984,7 @@ def test_cli_assembly_list_if_assembly_deployed_k8s_api(k8s):
     output = f"""ASSEMBLY NAME  NAMESPACE
 {ASM_NAME}       {TEST_NS}
 """
-    k8s.assemblies.get.return_value = [build_assembly_object(ASM_NAME, True)]
+    k8s.assemblies.get.return_value = assembly_page([build_assembly_object(ASM_NAME, True)])
 
     result = TEST_CLI.invoke(main.cli, ['assembly', 'list', '--use-kubeconfig'])
 
@@ -973,6 +992,108 @@ def test_cli_assembly_list_if_assembly_deployed_k8s_api(k8s):
     assert result.output.__contains__(output)
 
 
+def test_iter_assemblies_follows_continue_tokens(k8s):
+    pages = {None: assembly_page(ASSEMBLY_LIST[:2], 'page2'), 'page2': assembly_page(ASSEMBLY_LIST[2:])}
+    k8s.assemblies.get.side_effect = lambda **kwargs: pages[kwargs['_continue']]
+
+    assert [*assembly.iter_assemblies(TEST_NS, page_size=2)] == ASSEMBLY_LIST
+    assert [c[1]['_continue'] for c in k8s.assemblies.get.call_args_list] == [None, 'page2']
+    assert all(c[1]['limit'] == 2 for c in k8s.assemblies.get.call_args_list)
+
+
+def test_iter_assemblies_stops_at_page_without_continue_token(k8s):
+    k8s.assemblies.get.return_value = assembly_page(ASSEMBLY_LIST[:2])
+
+    assert [*assembly.iter_assemblies(TEST_NS, page_size=2)] == ASSEMBLY_LIST[:2]
+    assert k8s.assemblies.get.call_count == 1
+
+
+def test_iter_assemblies_fails_when_continue_token_is_missing(k8s):
+    k8s.assemblies.get.return_value = pyk8s.resource_item.ItemList(ASSEMBLY_LIST[:2], metadata={'remainingItemCount': 1})
+
+    with pytest.raises(click.ClickException, match='continue token to list the remaining 1 assemblies'):
+        [*assembly.iter_assemblies(TEST_NS, page_size=2)]
+
+
+def test_cli_assembly_list_filters_k8s_api(k8s):
+    k8s.assemblies.get.return_value = assembly_page(ASSEMBLY_LIST)
+
+    result = TEST_CLI.invoke(main.cli, ['assembly', 'list', '--use-kubeconfig', '--selector', 'team=a',
+                                        '--field-selector', 'metadata.namespace=test_ns',
+                                        '--name-prefix', 'test_asm', '--not-ready'])
+
+    assert result.exit_code == 0
+    assert result.output.splitlines()[-2:] == ['ASSEMBLY NAME  NAMESPACE', f'{ASM_NAME3}      {TEST_NS}']
+    kwargs = k8s.assemblies.get.call_args_list[0][1]
+    assert kwargs['label_selector'] == f'{assembly.ASM_LABEL_SELECTOR},team=a'
+    assert kwargs['field_selector'] == 'metadata.namespace=test_ns'
+    assert kwargs['limit'] == 500
+
+
+def test_cli_assembly_list_filters_kxic(mocker, mock_auth_functions):
+    mock_get_serviceaccount_token(mocker)
+
+    result = TEST_CLI.invoke(main.cli, ['assembly', 'list', '--ready'])
+    assert result.exit_code == 0
+    assert result.output.splitlines()[-1].split() == [ASM_NAME, 'True', 'True']
+
+    result = TEST_CLI.invoke(main.cli, ['assembly', 'list', '--name-prefix', ASM_NAME2])
+    assert result.exit_code == 0
+    assert result.output.splitlines()[-1].split() == [ASM_NAME2, 'False', 'False']
+
+
+def test_cli_assembly_list_all_namespaces_status(k8s):
+    other = build_assembly_object('other_asm')
+    other['metadata']['namespace'] = 'other_ns'
+    other['status'] = {'conditions': [{'type': 'AssemblyReady', 'status': 'False', 'message': 'Pods not ready'}]}
+    k8s.assemblies.get.return_value = assembly_page([build_assembly_object(ASM_NAME, True), other])
+
+    result = TEST_CLI.invoke(main.cli, ['assembly', 'list', '--all-namespaces', '--status'])
+
+    assert result.exit_code == 0
+    assert [line.split(maxsplit=3) for line in result.output.splitlines()[-3:]] == [
+        ['ASSEMBLY', 'NAME', 'NAMESPACE', 'READY  MESSAGE'],
+        [ASM_NAME, TEST_NS, 'True'],
+        ['other_asm', 'other_ns', 'False', 'Pods not ready']
+    ]
+    assert k8s.assemblies.get.call_count == 1
+    assert k8s.assemblies.get.call_args_list[0][1]['namespace'] is None
+
+
+def test_cli_assembly_list_json(k8s):
+    k8s.assemblies.get.return_value = assembly_page([build_assembly_object(ASM_NAME, True),
+                                                     build_assembly_object(ASM_NAME3)])
+
+    result = TEST_CLI.invoke(main.cli, ['assembly', 'list', '-A', '--status', '--output-format', 'json'])
+
+    assert result.exit_code == 0
+    # option notices are written to stderr before the listing
+    assert json.loads(result.output[result.output.index('['):]) == [
+        {'name': ASM_NAME, 'namespace': TEST_NS, 'ready': True, 'status': TRUE_STATUS},
+        {'name': ASM_NAME3, 'namespace': TEST_NS, 'ready': False, 'status': {}}
+    ]
+
+
+def test_cli_assembly_list_json_kxic(mocker, mock_auth_functions):
+    mock_get_serviceaccount_token(mocker)
+
+    result = TEST_CLI.invoke(main.cli, ['assembly', 'list', '--output-format', 'json'])
+
+    assert result.exit_code == 0
+    # option notices are written to stderr before the listing
+    assert json.loads(result.output[result.output.index('['):]) == [
+        {'name': ASM_NAME, 'running': True, 'ready': True},
+        {'name': ASM_NAME2, 'running': False, 'ready': False}
+    ]
+
+
+def test_cli_assembly_list_selector_requires_kubeconfig():
+    result = TEST_CLI.invoke(main.cli, ['assembly', 'list', '--selector', 'team=a'])
+
+    assert result.exit_code == 1
+    assert '--selector and --field-selector require --use-kubeconfig' in result.output
+
+
 def test_cli_assembly_list_error_response(mocker, k8s):
     mocker.patch('kxicli.commands.assembly._list_assemblies', utils.return_false)
     result = TEST_CLI.invoke(main.cli, ['assembly', 'list'])
@@ -1075,8 +1196,9 @@ def test_cli_assembly_deploy_and_wait(mocker, k8s, mock_auth_functions):
     assert result.exit_code == 0
     assert result.output == f"""Using assembly.filepath from command line option: {test_asm_file}
 Submitting assembly from {test_asm_file}
-Waiting for assembly to enter "Ready" state
 Custom assembly resource basic-assembly created!
+Waiting for assembly to enter "Ready" state
+Assembly basic-assembly is ready
 """
 
 
@@ -1089,14 +1211,101 @@ def test_cli_assembly_deploy_and_wait_k8s_api(mocker, k8s):
     assert result.exit_code == 0
     assert result.output == f"""Using assembly.filepath from command line option: {test_asm_file}
 Submitting assembly from {test_asm_file}
-Waiting for assembly to enter "Ready" state
 Custom assembly resource basic-assembly created!
+Waiting for assembly to enter "Ready" state
+Assembly basic-assembly is ready
 """
     k8s.assemblies.create.assert_has_calls([
             call(body=pyk8s.ResourceItem.parse_obj(assembly._add_last_applied_configuration_annotation(test_asm)), 
                  namespace="test-namespace"),
     ])
 
+def build_assembly_event(name, ready, event_type='MODIFIED'):
+    asm = build_assembly_object(name, True)
+    asm['status']['conditions'][0]['status'] = str(ready)
+    return MagicMock(type=event_type, raw_object=asm)
+
+
+def test_create_assemblies_from_file_watches_all_assemblies_together(k8s):
+    mock_list_assemblies(k8s)
+    mock_create_assemblies(k8s)
+    k8s.assemblies.read.side_effect = lambda name, namespace: build_assembly_event(name, False).raw_object
+    k8s.assemblies.watch.return_value = [
+        build_assembly_event(ASM_NAME2, False),
+        build_assembly_event(ASM_NAME, True),
+        build_assembly_event(ASM_NAME2, True),
+    ]
+
+    with temp_asm_file() as test_asm_list_file:
+        assembly.backup_assemblies(namespace='test_ns', filepath=test_asm_list_file, force=False)
+        assert assembly.create_assemblies_from_file(namespace='test_ns', filepath=test_asm_list_file,
+                                                    use_kubeconfig=True, wait=True) == [True, True]
+
+    # one read per assembly before a single watch of the namespace
+    assert k8s.assemblies.read.call_count == 2
+    k8s.assemblies.watch.assert_called_once_with(namespace='test_ns', timeout=assembly.ASM_WATCH_TIMEOUT)
+
+
+def test_create_assemblies_from_file_wait_times_out(k8s):
+    mock_list_assemblies(k8s)
+    mock_create_assemblies(k8s)
+    k8s.assemblies.read.side_effect = lambda name, namespace: build_assembly_event(name, name == ASM_NAME).raw_object
+
+    with temp_asm_file() as test_asm_list_file, pytest.raises(click.ClickException) as e:
+        assembly.backup_assemblies(namespace='test_ns', filepath=test_asm_list_file, force=False)
+        assembly.create_assemblies_from_file(namespace='test_ns', filepath=test_asm_list_file,
+                                             use_kubeconfig=True, wait=True, wait_timeout=0)
+
+    assert e.value.message == f'Assemblies not ready after 0s: {ASM_NAME2}'
+    k8s.assemblies.watch.assert_not_called()
+
+
+def test_wait_for_assemblies_polls_kxic_api_at_fixed_interval(mocker):
+    mocker.patch('kxicli.commands.assembly.ASM_POLL_INTERVAL', 0)
+    # Each assembly becomes ready on its second poll
+    polls = {}
+    def mock_status(name=None, **kwargs):
+        polls[name] = polls.get(name, 0) + 1
+        return polls[name] > 1
+    mocker.patch('kxicli.commands.assembly._assembly_status', mock_status)
+
+    assert assembly._wait_for_assemblies([ASM_NAME, ASM_NAME2], hostname='https://test.kx.com', timeout=10) == []
+    assert polls == {ASM_NAME: 2, ASM_NAME2: 2}
+
+
+def test_wait_for_assembly_teardown_watches_for_delete(k8s):
+    k8s.assemblies.read.return_value = build_assembly_object(ASM_NAME, True)
+    k8s.assemblies.watch.return_value = [build_assembly_event(ASM_NAME, True, event_type='DELETED')]
+
+    assert assembly.wait_for_assembly_teardown(TEST_NS, ASM_NAME, None, None, True)
+    k8s.assemblies.read.assert_called_once_with(ASM_NAME, namespace=TEST_NS)
+
+
+def test_cli_assembly_status_with_wait_for_ready_streams_conditions_k8s_api(k8s):
+    k8s.assemblies.read.return_value = build_assembly_event(ASM_NAME, False).raw_object
+    k8s.assemblies.watch.return_value = [build_assembly_event(ASM_NAME, True)]
+
+    result = TEST_CLI.invoke(main.cli, ['assembly', 'status', '--name', ASM_NAME, '--wait-for-ready', '--use-kubeconfig'])
+
+    assert result.exit_code == 0
+    assert f"""Waiting for assembly to enter "Ready" state
+{json.dumps(FALSE_STATUS, indent=2)}
+{json.dumps(TRUE_STATUS, indent=2)}
+Assembly {ASM_NAME} is ready
+""" in result.output
+
+
+def test_cli_assembly_deploy_and_wait_fails_when_not_ready(mocker, k8s):
+    mock_create_assemblies(k8s)
+    k8s.assemblies.read.return_value = build_assembly_object(ASM_NAME, False)
+
+    result = TEST_CLI.invoke(main.cli, ['assembly', 'deploy', '-f', test_asm_file, '--wait', '--wait-timeout', '0',
+                                        '--use-kubeconfig'])
+
+    assert result.exit_code == 1
+    assert 'Error: Assemblies not ready after 0s: basic-assembly' in result.output
+
+
 def test_cli_assembly_deploy_without_filepath(mocker, k8s):
     mocker.patch('kxicli.common.is_interactive_session', utils.return_false)
     result = TEST_CLI.invoke(main.cli, ['assembly', 'deploy'])
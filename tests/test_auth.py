@@ -1,5 +1,6 @@
 import json
 import os
+import threading
 import time
 from unittest.mock import MagicMock
 
@@ -12,6 +13,7 @@
 from kxicli import main
 from click.testing import CliRunner
 from kxicli.resources import auth
+from kxicli.commands import assembly
 from kxi.auth import Authorizer
 import mocks
 from utils import return_none
@@ -82,7 +84,7 @@ def mock_fetch_token():
     return TEST_USER_TOKEN
 
 def mock_valid_token_request(mocker):
-    mocker.patch('requests.post', partial(
+    mocker.patch('requests.Session.post', partial(
         mocks.http_response,
         status_code=200,
         content=json.dumps({'access_token': TEST_SERVICE_ACCOUNT_TOKEN}).encode('utf-8')
@@ -191,7 +193,7 @@ def test_get_token_returns_access_token(mocker, mock_auth_functions):
 
 
 def test_get_admin_token_raises_exception(mocker):
-    mocker.patch('requests.post', partial(
+    mocker.patch('requests.Session.post', partial(
         mocks.http_response,
         status_code=404,
         content=json.dumps({'message': "Unknown", 'detail': {'message': "HTTP Error"}}).encode('utf-8')
@@ -275,6 +277,105 @@ def test_check_cached_token_active():
 
 
 
+def test_credential_store_is_loaded_once_per_process(mocker, tmp_path):
+    cache_file = str(tmp_path / 'credentials')
+    with get_test_context():
+        auth.write_to_cache(TEST_USER_TOKEN, auth.TokenType.USER, cache_file)
+        reload = mocker.spy(auth.SharedCredentialStore, 'reload')
+
+        assert auth.credential_store(cache_file) is auth.credential_store(cache_file)
+        assert reload.call_count == 0
+        assert auth.credential_store(cache_file).get_token() == TEST_USER_TOKEN
+
+
+def test_credential_store_reloads_when_file_changes(tmp_path):
+    cache_file = str(tmp_path / 'credentials')
+    with get_test_context():
+        store = auth.credential_store(cache_file)
+        other = auth.SharedCredentialStore(name='default', file_path=cache_file)
+        other.set_token(TEST_USER_TOKEN)
+
+        assert auth.credential_store(cache_file) is store
+        assert store.get_token() == TEST_USER_TOKEN
+
+
+def test_credential_store_rereads_file_changed_on_read(tmp_path):
+    cache_file = str(tmp_path / 'credentials')
+    with get_test_context():
+        store = auth.credential_store(cache_file)
+        auth.SharedCredentialStore(name='default', file_path=cache_file).set_token(TEST_USER_TOKEN)
+
+        assert store.get_token() == TEST_USER_TOKEN
+
+
+def test_get_token_requests_token_without_credentials_lock(mocker, tmp_path):
+    cache_file = str(tmp_path / 'credentials')
+    mocker.patch.object(auth.options.cache_file, 'retrieve_value', return_value=cache_file)
+    mocker.patch('kxicli.resources.auth.get_serviceaccount_id', return_value='client')
+    mocker.patch('kxicli.resources.auth.get_serviceaccount_secret', return_value='secret')
+
+    def retrieve_token(*args):
+        # other threads and processes can use the credentials file while the token is requested
+        def write():
+            with auth.credentials_lock(cache_file):
+                pass
+        writer = threading.Thread(target=write)
+        writer.start()
+        writer.join(5)
+        assert not writer.is_alive()
+        return 'new-token'
+
+    mocker.patch('kxicli.resources.auth.retrieve_token', side_effect=retrieve_token)
+    with get_test_context():
+        assert auth.get_token(hostname='test.kx.com', realm='test') == 'new-token'
+
+
+def test_client_factory_reads_grant_type_from_shared_store(mocker, tmp_path):
+    cache_file = str(tmp_path / 'credentials')
+    mocker.patch.object(common, 'token_cache_file', cache_file)
+    client = mocker.patch('kxicli.commands.assembly.Assembly')
+    with get_test_context():
+        assembly._create_assembly_object('https://test.kx.com', 'insights')
+        assert client.call_args[1]['grant_type'] == auth.TokenType.SERVICEACCOUNT
+
+        store = auth.credential_store(cache_file)
+        store.set(grant_type=auth.TokenType.USER, client_id='user-client')
+        assembly._create_assembly_object('https://test.kx.com', 'insights')
+
+    grant_type = client.call_args[1]['grant_type']
+    assert getattr(grant_type, 'value', grant_type) == auth.TokenType.USER.value
+    assert client.call_args[1]['client_id'] == 'user-client'
+    assert client.call_args[1]['cache'] is store
+
+
+def test_write_to_cache_skips_unchanged_token(tmp_path):
+    cache_file = str(tmp_path / 'credentials')
+    with get_test_context():
+        auth.write_to_cache(TEST_USER_TOKEN, auth.TokenType.USER, cache_file)
+        stamp = os.stat(cache_file).st_ino, os.stat(cache_file).st_mtime_ns
+
+        auth.write_to_cache(dict(TEST_USER_TOKEN), auth.TokenType.USER, cache_file)
+
+        assert (os.stat(cache_file).st_ino, os.stat(cache_file).st_mtime_ns) == stamp
+        assert not [f for f in os.listdir(tmp_path) if f.startswith('.credentials')]
+
+
+def test_credentials_lock_is_reentrant(tmp_path):
+    cache_file = str(tmp_path / 'credentials')
+    with auth.credentials_lock(cache_file):
+        with auth.credentials_lock(cache_file):
+            assert os.path.exists(f'{cache_file}.lock')
+    assert auth._file_locks == {}
+
+
+def test_check_cached_token_active_renews_ahead_of_expiry(tmp_path):
+    cache_file = str(tmp_path / 'credentials')
+    token = {'access_token': 'abc', 'expires_in': 300, 'expires_at': int(time.time()) + auth.TOKEN_REFRESH_MARGIN - 5}
+    with get_test_context():
+        auth.write_to_cache(token, auth.TokenType.SERVICEACCOUNT, cache_file)
+        assert auth.check_cached_token_active(cache_file) == (token, auth.TokenType.SERVICEACCOUNT, False)
+
+
 def get_token_returns_existing_valid_token():
     with utils.temp_file('test_token_cache') as temp_cache_file:
         auth.write_to_cache(TEST_VALID_TOKEN, temp_cache_file)
@@ -85,6 +85,15 @@ def test_init(mocker: MockerFixture, k8s: MagicMock):
     assert result.exit_code == 0
 
 
+def test_install_operator_runs_helm_through_helm_module(mocker: MockerFixture):
+    run = mocker.patch('kxicli.resources.helm.run')
+
+    backup._install_operator('namespace')
+
+    assert [c[0][0][:3] for c in run.call_args_list] == [['helm', 'repo', 'add'], ['helm', 'upgrade', '--install']]
+    assert all(c[1]['invalidate'] for c in run.call_args_list)
+
+
 def test_set_backup(mocker: MockerFixture, k8s: MagicMock):
     # Given an RWO and an RWM pvc
     rwo = pyk8s.models.V1PersistentVolumeClaim.parse_obj({
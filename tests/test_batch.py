@@ -0,0 +1,152 @@
+import threading
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from kxicli import cli_group, common, config, log, main
+
+config.config_file = str(Path(__file__).parent / 'files' / 'test-cli-config')
+
+
+def commands_file(tmp_path, *lines):
+    path = tmp_path / 'commands.txt'
+    path.write_text('\n'.join(lines) + '\n')
+    return str(path)
+
+
+def fake_invoke(mocker, codes=None):
+    """Replace running a command with printing its arguments, returning the exit code given for its command"""
+    calls = []
+    lock = threading.Lock()
+
+    def invoke(args):
+        with lock:
+            calls.append(args)
+        print(' '.join(args))
+        return (codes or {}).get(args[2], 0)
+
+    mocker.patch.object(cli_group, 'invoke', side_effect=invoke)
+    return calls
+
+
+def test_batch_runs_commands_with_batch_profile(mocker, tmp_path):
+    calls = fake_invoke(mocker)
+    path = commands_file(tmp_path, '# deploy', 'kxi assembly list', '', 'entitlement get --id "a b"  # comment')
+
+    result = CliRunner().invoke(main.cli, ['--profile', 'default', 'batch', '--file', path])
+
+    assert result.exit_code == 0
+    assert calls == [['--profile', 'default', 'assembly', 'list'],
+                     ['--profile', 'default', 'entitlement', 'get', '--id', 'a b']]
+
+
+def test_batch_reads_stdin(mocker):
+    calls = fake_invoke(mocker)
+
+    result = CliRunner().invoke(main.cli, ['batch'], input='assembly list\n')
+
+    assert result.exit_code == 0
+    assert calls == [['--profile', 'default', 'assembly', 'list']]
+
+
+def test_batch_stops_after_failure(mocker, tmp_path):
+    calls = fake_invoke(mocker, {'assembly': 2})
+    path = commands_file(tmp_path, 'user list', 'assembly list', 'entitlement list')
+
+    result = CliRunner().invoke(main.cli, ['batch', '--file', path])
+
+    assert result.exit_code == 1
+    assert len(calls) == 2
+    assert 'Line 2 (kxi assembly) exited with 2' in result.output
+    assert 'Skipped 1 commands after a failure' in result.output
+    assert '1 of 3 commands failed' in result.output
+
+
+def test_batch_keep_going(mocker, tmp_path):
+    calls = fake_invoke(mocker, {'assembly': 2})
+    path = commands_file(tmp_path, 'user list', 'assembly list', 'entitlement list')
+
+    result = CliRunner().invoke(main.cli, ['batch', '--file', path, '--keep-going'])
+
+    assert result.exit_code == 1
+    assert len(calls) == 3
+    assert 'Skipped' not in result.output
+
+
+def test_batch_parallel_prints_output_in_order(mocker, tmp_path):
+    fake_invoke(mocker)
+    lines = [f'assembly status --name a{i}' for i in range(10)]
+
+    result = CliRunner().invoke(main.cli, ['batch', '--file', commands_file(tmp_path, *lines), '--parallel', '4'])
+
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [f'--profile default {line}' for line in lines]
+
+
+def test_batch_parallel_rejects_other_profiles(mocker, tmp_path):
+    calls = fake_invoke(mocker)
+    path = commands_file(tmp_path, 'assembly list', '--profile dev assembly list')
+
+    result = CliRunner().invoke(main.cli, ['batch', '--file', path, '--parallel', '2'])
+
+    assert result.exit_code == 1
+    assert 'Line 2 selects profile dev' in result.output
+    assert calls == []
+
+
+def test_batch_rejects_nested_batch(tmp_path):
+    result = CliRunner().invoke(main.cli, ['batch', '--file', commands_file(tmp_path, 'batch --file x')])
+
+    assert result.exit_code == 1
+    assert 'Line 1 runs kxi batch' in result.output
+
+
+def test_batch_runs_real_commands(tmp_path):
+    path = commands_file(tmp_path, '--version', 'assembly --help')
+
+    result = CliRunner().invoke(main.cli, ['batch', '--file', path, '--parallel', '2'])
+
+    assert result.exit_code == 0
+    assert 'version' in result.output
+    assert 'Assembly interaction commands' in result.output
+
+
+def test_batch_parallel_rejects_debug(mocker, tmp_path):
+    calls = fake_invoke(mocker)
+    path = commands_file(tmp_path, 'assembly list', '--debug assembly list')
+
+    result = CliRunner().invoke(main.cli, ['batch', '--file', path, '--parallel', '2'])
+
+    assert result.exit_code == 1
+    assert 'Line 2 enables debug logging' in result.output
+    assert calls == []
+
+
+def test_batch_parallel_rejects_config_commands(mocker, tmp_path):
+    calls = fake_invoke(mocker)
+    path = commands_file(tmp_path, 'assembly list', 'install setup')
+
+    result = CliRunner().invoke(main.cli, ['batch', '--file', path, '--parallel', '2'])
+
+    assert result.exit_code == 1
+    assert 'Line 2 runs kxi install, which writes the configuration' in result.output
+    assert calls == []
+
+
+def test_invoke_restores_debug_logging(mocker):
+    def enable_debug(**kwargs):
+        log.GLOBAL_DEBUG_LOG = True
+
+    mocker.patch.object(cli_group.cli, 'main', side_effect=enable_debug)
+
+    assert cli_group.invoke(['--debug', 'assembly', 'list']) == 0
+    assert log.GLOBAL_DEBUG_LOG is False
+
+
+def test_invoke_records_args_of_the_invocation(mocker):
+    seen = []
+    mocker.patch.object(cli_group, 'load_profile', side_effect=lambda ctx, profile: seen.append(common.invocation_args()))
+
+    cli_group.invoke(['--profile', 'default', 'assembly', '--help'])
+
+    assert seen[0] == ['--profile', 'default', 'assembly', '--help']
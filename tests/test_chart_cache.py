@@ -0,0 +1,68 @@
+import json
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from kxicli import main
+from kxicli.resources import chart_cache
+
+OPERATOR_TGZ = Path(__file__).parent / 'files' / 'helm' / 'kxi-operator-1.2.3.tgz'
+
+
+def test_lookup_returns_stored_chart():
+    entry = chart_cache.store('kx-insights', 'kxi-operator', '1.2.3', OPERATOR_TGZ)
+
+    assert chart_cache.lookup('kx-insights', 'kxi-operator', '1.2.3') == entry
+    assert (entry / OPERATOR_TGZ.name).read_bytes() == OPERATOR_TGZ.read_bytes()
+    assert chart_cache.lookup('kx-insights', 'kxi-operator', '1.2.4') is None
+    assert chart_cache.lookup('other-repo', 'kxi-operator', '1.2.3') is None
+
+
+def test_lookup_discards_chart_failing_verification():
+    entry = chart_cache.store('kx-insights', 'kxi-operator', '1.2.3', OPERATOR_TGZ)
+    with open(entry / OPERATOR_TGZ.name, 'ab') as f:
+        f.write(b'corrupt')
+
+    assert chart_cache.lookup('kx-insights', 'kxi-operator', '1.2.3') is None
+    assert not entry.exists()
+
+
+def test_parsed_data_round_trip():
+    entry = chart_cache.store('kx-insights', 'kxi-operator', '1.2.3', OPERATOR_TGZ)
+
+    assert chart_cache.load_parsed(entry, 'crds') is chart_cache.MISSING
+    chart_cache.save_parsed(entry, 'crds', [{'kind': 'CustomResourceDefinition'}])
+    assert chart_cache.load_parsed(entry, 'crds') == [{'kind': 'CustomResourceDefinition'}]
+
+
+def test_save_parsed_skips_data_that_is_not_json():
+    entry = chart_cache.store('kx-insights', 'kxi-operator', '1.2.3', OPERATOR_TGZ)
+
+    chart_cache.save_parsed(entry, 'crds', [{'created': object()}])
+
+    assert chart_cache.load_parsed(entry, 'crds') is chart_cache.MISSING
+    assert sorted(f.name for f in entry.iterdir()) == sorted([OPERATOR_TGZ.name, chart_cache.META_FILE])
+
+
+def test_prune_removes_least_recently_used():
+    entries = [chart_cache.store('kx-insights', 'kxi-operator', v, OPERATOR_TGZ) for v in ('1.2.1', '1.2.2', '1.2.3')]
+    for i, entry in enumerate(entries):
+        meta = json.loads((entry / chart_cache.META_FILE).read_text())
+        meta['last_used'] = [3, 1, 2][i]
+        (entry / chart_cache.META_FILE).write_text(json.dumps(meta))
+    size = sum(size for _, _, size in chart_cache.entries())
+
+    removed = chart_cache.prune(size - 1)
+
+    assert [m['version'] for m in removed] == ['1.2.2']
+    assert [m['version'] for _, m, _ in chart_cache.entries()] == ['1.2.3', '1.2.1']
+
+
+def test_prune_cache_command():
+    chart_cache.store('kx-insights', 'kxi-operator', '1.2.3', OPERATOR_TGZ)
+
+    result = CliRunner().invoke(main.cli, ['install', 'prune-cache', '--max-size', '0'])
+
+    assert result.exit_code == 0
+    assert 'Removed kx-insights/kxi-operator 1.2.3' in result.output
+    assert chart_cache.entries() == []
@@ -67,7 +67,7 @@ def test_client_remove(mocker, mock_auth_functions):
 
 def test_client_info(mocker):
     mocker.patch('kxicli.resources.auth.get_serviceaccount_token', return_none)
-    mocker.patch('requests.get', partial(
+    mocker.patch('requests.Session.get', partial(
         mocks.http_response, 
         status_code=200,
         content=json.dumps({'message': "abc", 'detail': {'message': "another"}}).encode('utf-8')
@@ -78,7 +78,7 @@ def test_client_info(mocker):
 
 def test_client_list(mocker):
     mocker.patch('kxicli.resources.auth.get_admin_token', return_none)
-    mocker.patch('requests.get', partial(
+    mocker.patch('requests.Session.get', partial(
         mocks.http_response, 
         status_code=200,
         content=json.dumps({'message': "abc", 'detail': {'message': "another"}}).encode('utf-8')
@@ -113,7 +113,7 @@ def test_client_remove_exception(mocker, mock_auth_functions):
     
 def test_client_info_exception(mocker):
     mocker.patch('kxicli.resources.auth.get_serviceaccount_token', return_none)
-    mocker.patch('requests.get', partial(
+    mocker.patch('requests.Session.get', partial(
         mocks.http_response, 
         status_code=404,
         content=json.dumps({'message': "Unknown", 'detail': {'message': "HTTP Error"}}).encode('utf-8')
@@ -124,7 +124,7 @@ def test_client_info_exception(mocker):
 
 def test_client_list_exception(mocker):
     mocker.patch('kxicli.resources.auth.get_admin_token', return_none)
-    mocker.patch('requests.get', partial(
+    mocker.patch('requests.Session.get', partial(
         mocks.http_response, 
         status_code=404,
         content=json.dumps({'message': "Unknown", 'detail': {'message': "HTTP Error"}}).encode('utf-8')
@@ -1,5 +1,7 @@
 import io
+from concurrent.futures import ThreadPoolExecutor
 import os
+import tarfile
 from unittest.mock import MagicMock
 import pyk8s
 import pytest
@@ -13,6 +15,7 @@
 
 from kxicli import common
 from kxicli import config
+from kxicli import options
 from kxicli import phrases
 from utils import mock_kube_crd_api, get_crd_body, raise_not_found, raise_conflict, return_none, IPATH_CLICK_PROMPT
 
@@ -137,6 +140,49 @@ def test_extract_files_from_tar_throws_file_not_found():
     assert isinstance(e.value, click.ClickException)
     assert e.value.message == f'File not_there not found in {path}'
 
+def test_extract_files_from_tar_returns_files_in_requested_order():
+    path = Path(__file__).parent / 'files' / 'helm' / 'kxi-operator-1.2.3.tgz'
+    files = ['kxi-operator/crds/insights.kx.com_assemblyresources.yaml',
+             'kxi-operator/crds/insights.kx.com_assemblies.yaml']
+
+    data = common.extract_files_from_tar(path, files)
+
+    assert [yaml.safe_load(d)['metadata']['name'] for d in data] == ['assemblyresources.insights.kx.com',
+                                                                     'assemblies.insights.kx.com']
+
+def write_tar(path, members):
+    """Write a gzipped tar with (name, content) files and (name, type, link target) links"""
+    with tarfile.open(path, 'w:gz') as tf:
+        for member in members:
+            info = tarfile.TarInfo(member[0])
+            if len(member) == 3:
+                info.type, info.linkname = member[1], member[2]
+                tf.addfile(info)
+            else:
+                info.size = len(member[1])
+                tf.addfile(info, io.BytesIO(member[1]))
+    return path
+
+def test_extract_files_from_tar_reads_last_member_of_a_name(tmp_path):
+    path = write_tar(tmp_path / 'chart.tgz', [('chart/values.yaml', b'a: 1'), ('chart/values.yaml', b'a: 2')])
+
+    assert common.extract_files_from_tar(path, ['chart/values.yaml']) == [b'a: 2']
+
+def test_extract_files_from_tar_reads_link_targets(tmp_path):
+    path = write_tar(tmp_path / 'chart.tgz', [
+        ('chart/values.yaml', b'a: 1'),
+        ('chart/hard.yaml', tarfile.LNKTYPE, 'chart/values.yaml'),
+        ('chart/sym.yaml', tarfile.SYMTYPE, 'values.yaml'),
+    ])
+
+    assert common.extract_files_from_tar(path, ['chart/sym.yaml', 'chart/hard.yaml']) == [b'a: 1', b'a: 1']
+
+def test_extract_files_from_tar_throws_for_dangling_link(tmp_path):
+    path = write_tar(tmp_path / 'chart.tgz', [('chart/sym.yaml', tarfile.SYMTYPE, 'missing.yaml')])
+
+    with pytest.raises(click.ClickException, match='File chart/sym.yaml not found'):
+        common.extract_files_from_tar(path, ['chart/sym.yaml'])
+
 def test_extract_files_from_tar_throws_tar_does_not_exist():
     path = Path(__file__).parent / 'files' / 'helm' / 'abc.tgz'
     with pytest.raises(Exception) as e:
@@ -213,3 +259,13 @@ def test_handle_http_exception_no_response(mocker):
     delattr(e, "response")
     with pytest.raises(click.ClickException, match="No Response Error"):
         common.handle_http_exception(e, "prefix")
+
+
+def test_in_current_context_runs_worker_in_context():
+    ctx = click.Context(click.Command('test'), obj={'kxi_cli_profile': 'dev'})
+    with ctx:
+        get_profile = common.in_current_context(options.get_profile)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assert executor.submit(get_profile).result() == 'dev'
+            assert executor.submit(click.get_current_context, silent=True).result() is None
+    assert click.get_current_context(silent=True) is None
@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+from click.testing import CliRunner
+
+from kxicli import main
+from kxicli.resources import daemon
+
+# forwards its arguments to the daemon listening on the socket given first, like the kxi script does
+CLIENT = 'import sys; from kxicli.resources import daemon; ' \
+         'code = daemon.forward(sys.argv[2:], sys.argv[1]); sys.exit("fallback" if code is None else code)'
+
+
+@pytest.fixture
+def socket_file(tmp_path):
+    path = str(tmp_path / 'kxi.sock')
+    yield path
+    daemon.control('stop', path)
+
+
+def serve(path, run):
+    server = daemon.Daemon(path, run)
+    listener = server.listen()
+    threading.Thread(target=server.serve, args=(listener,), daemon=True).start()
+    return server
+
+
+def forward(path, *argv, env=None):
+    return subprocess.run([sys.executable, '-c', CLIENT, path, *argv], capture_output=True, text=True,
+                          env=env, stdin=subprocess.DEVNULL)
+
+
+def test_command_name():
+    assert daemon.command_name(['--profile', 'dev', '--debug', 'assembly', 'status']) == 'assembly'
+    assert daemon.command_name(['--trace-file', 'trace.json', 'daemon', 'stop']) == 'daemon'
+    assert daemon.command_name(['--version']) is None
+
+
+def test_forward_without_daemon(socket_file):
+    assert daemon.forward(['assembly', 'list'], socket_file) is None
+
+
+def test_forward_streams_output_and_exit_code(socket_file):
+    def run(request):
+        print(f'args {request["argv"]}')
+        print('to stderr', file=sys.stderr)
+        subprocess.run(['echo', 'from subprocess'], check=True)
+        return 3
+
+    server = serve(socket_file, run)
+    res = forward(socket_file, 'assembly', 'status', '--name', 'a')
+
+    assert res.returncode == 3
+    assert res.stdout == "args ['assembly', 'status', '--name', 'a']\nfrom subprocess\n"
+    assert res.stderr == 'to stderr\n'
+    assert server.served == 1
+
+
+def test_forward_falls_back_when_environment_differs(socket_file):
+    serve(socket_file, lambda request: 0)
+    env = {**os.environ, 'KUBECONFIG': '/other/kube/config'}
+
+    res = forward(socket_file, 'assembly', 'list', env=env)
+
+    assert res.returncode == 1
+    assert res.stderr.strip() == 'fallback'
+
+
+def test_daemon_commands_are_not_forwarded(socket_file):
+    serve(socket_file, lambda request: 0)
+    assert daemon.forward(['daemon', 'status'], socket_file) is None
+
+
+def test_stop_and_status(socket_file):
+    server = serve(socket_file, lambda request: 0)
+
+    result = CliRunner().invoke(main.cli, ['daemon', 'status', '--socket', socket_file])
+    assert result.exit_code == 0
+    assert f'kxi daemon {os.getpid()} listening on {socket_file}' in result.output
+
+    result = CliRunner().invoke(main.cli, ['daemon', 'stop', '--socket', socket_file])
+    assert result.exit_code == 0
+    assert server.stopping
+
+
+def test_status_without_daemon(socket_file):
+    result = CliRunner().invoke(main.cli, ['daemon', 'status', '--socket', socket_file])
+    assert result.exit_code == 1
+    assert f'No kxi daemon is listening on {socket_file}' in result.output
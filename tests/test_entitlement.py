@@ -4,6 +4,7 @@
 import time
 from unittest.mock import MagicMock
 import pytest
+import requests
 import uuid
 
 from click import ClickException
@@ -13,7 +14,7 @@
 from kxicli import main, common
 from kxicli.resources import auth
 from kxi.entitlement import Entitlement, Actor
-from kxicli.commands.entitlement import _parse_groups
+from kxicli.commands.entitlement import _fetch, _parse_groups
 
 import mocks
 
@@ -111,6 +112,108 @@ def test_entitlement_list_with_users(rest_api_mock, sample_entity_with_users, mo
     assert rest_api_mock.get.call_args[0] == ("https://test.kx.com/entitlements/v1/entities",)
 
 
+def test_entitlement_list_fetches_again_after_ttl(rest_api_mock, sample_entity, mock_auth_functions, cache_path):
+    r = f"[{sample_entity.json()}]".encode("utf-8")
+    rest_api_mock.get.return_value = mocks.http_response("", status_code=200, content=r)
+
+    first = TEST_CLI.invoke(main.cli, ["entitlement", "list", "--cache-ttl", "60"])
+    for path in (cache_path / 'entitlements').iterdir():
+        path.write_text(json.dumps({**json.loads(path.read_text()), 'fetched_at': 0}))
+    second = TEST_CLI.invoke(main.cli, ["entitlement", "list", "--cache-ttl", "60"])
+
+    assert second.exit_code == 0
+    assert second.output == first.output == f"[{sample_entity.json()}]\n"
+    assert rest_api_mock.get.call_count == 2
+
+
+def test_entitlement_list_cache_is_kept_per_client(rest_api_mock, sample_entity, mock_auth_functions, monkeypatch):
+    r = f"[{sample_entity.json()}]".encode("utf-8")
+    rest_api_mock.get.return_value = mocks.http_response("", status_code=200, content=r)
+
+    TEST_CLI.invoke(main.cli, ["entitlement", "list", "--cache-ttl", "60"])
+    monkeypatch.setenv("INSIGHTS_CLIENT_ID", "other-client")
+    result = TEST_CLI.invoke(main.cli, ["entitlement", "list", "--cache-ttl", "60"])
+
+    assert result.exit_code == 0
+    assert rest_api_mock.get.call_count == 2
+
+
+def test_fetch_returns_json_data_of_client_models(sample_entity, sample_actor):
+    e = MagicMock()
+    e.list.return_value = [sample_entity]
+    e.actors.return_value = [sample_actor]
+
+    assert _fetch(e, 'entities') == [json.loads(sample_entity.json())]
+    assert _fetch(e, 'actors') == [json.loads(sample_actor.json())]
+
+
+def test_entitlement_list_uses_cache_within_ttl(rest_api_mock, sample_entity, mock_auth_functions, cache_path):
+    r = f"[{sample_entity.json()}]".encode("utf-8")
+    rest_api_mock.get.return_value = mocks.http_response("", status_code=200, content=r)
+
+    TEST_CLI.invoke(main.cli, ["entitlement", "list", "--cache-ttl", "60"])
+    result = TEST_CLI.invoke(main.cli, ["entitlement", "list", "--cache-ttl", "60"])
+
+    assert result.exit_code == 0
+    assert result.output == f"[{sample_entity.json()}]\n"
+    rest_api_mock.get.assert_called_once()
+    cache_files = [*(cache_path / 'entitlements').iterdir()]
+    assert len(cache_files) == 1
+    assert cache_files[0].stat().st_mode & 0o777 == 0o600
+
+
+def test_entitlement_list_no_cache(rest_api_mock, sample_entity, mock_auth_functions, cache_path):
+    r = f"[{sample_entity.json()}]".encode("utf-8")
+    rest_api_mock.get.return_value = mocks.http_response("", status_code=200, content=r)
+
+    result = TEST_CLI.invoke(main.cli, ["entitlement", "list", "--no-cache"])
+
+    assert result.exit_code == 0
+    assert not cache_path.exists()
+
+
+def test_entitlement_list_default_ttl_does_not_cache(rest_api_mock, sample_entity, mock_auth_functions, cache_path):
+    r = f"[{sample_entity.json()}]".encode("utf-8")
+    rest_api_mock.get.return_value = mocks.http_response("", status_code=200, content=r)
+
+    TEST_CLI.invoke(main.cli, ["entitlement", "list"])
+    result = TEST_CLI.invoke(main.cli, ["entitlement", "list"])
+
+    assert result.exit_code == 0
+    assert rest_api_mock.get.call_count == 2
+    assert not cache_path.exists()
+
+
+@pytest.mark.parametrize('args,matches', [
+    (["--name", "sam*"], True),
+    (["--name", "other*"], False),
+    (["--type", "assembly"], True),
+    (["--owner", "00000000-0000-0000-0000-000000000000"], True),
+    (["--owner", str(uuid.UUID(int=1))], False),
+    (["--group", "00dc3afa-abae-4a6b-be52-8fd090897c97"], True),
+    (["--group", str(uuid.UUID(int=1))], False),
+])
+def test_entitlement_list_filters(rest_api_mock, sample_entity, mock_auth_functions, args, matches):
+    r = f"[{sample_entity.json()}]".encode("utf-8")
+    rest_api_mock.get.return_value = mocks.http_response("", status_code=200, content=r)
+
+    result = TEST_CLI.invoke(main.cli, ["entitlement", "list", *args])
+
+    assert result.exit_code == 0
+    assert result.output == (f"[{sample_entity.json()}]\n" if matches else "[]\n")
+
+
+def test_entitlement_actors_filter_by_path(rest_api_mock, sample_actor, mock_auth_functions):
+    r = f"[{sample_actor.json()}]".encode("utf-8")
+    rest_api_mock.get.return_value = mocks.http_response("", status_code=200, content=r)
+
+    matched = TEST_CLI.invoke(main.cli, ["entitlement", "actors", "--name", "/quants*"])
+    unmatched = TEST_CLI.invoke(main.cli, ["entitlement", "actors", "--name", "traders"])
+
+    assert matched.output == f"[{sample_actor.json()}]\n"
+    assert unmatched.output == "[]\n"
+
+
 def test_entitlement_get(rest_api_mock, sample_entity, mock_auth_functions):
     r = sample_entity.json().encode("utf-8")
     rest_api_mock.get.return_value = mocks.http_response("", status_code=200, content=r)
@@ -382,3 +485,96 @@ def test_entitlement_rm_groups_with_extra(rest_api_mock, sample_entity, mock_aut
         exclude_defaults=True, exclude={"id"})
     assert rest_api_mock.patch.call_args[0][0] == f"https://test.kx.com/entitlements/v1/entities/{sample_entity.id}"
     assert rest_api_mock.patch.call_args[0][1] == expected
+
+
+def write_batch_file(tmp_path, rows):
+    path = tmp_path / 'updates.csv'
+    path.write_text('id,add,remove\n' + ''.join(f'{",".join(row)}\n' for row in rows))
+    return str(path)
+
+
+def test_entitlement_batch_updates_groups(rest_api_mock, sample_entity, mock_auth_functions, tmp_path):
+    g1 = uuid.UUID(int=123)
+    g2, g3 = sample_entity.groups
+    r = sample_entity.json().encode("utf-8")
+    rest_api_mock.get.return_value = mocks.http_response("", status_code=200, content=r)
+    rest_api_mock.patch.return_value = mocks.http_response("", status_code=200)
+    filepath = write_batch_file(tmp_path, [(str(sample_entity.id), f'{g1};{g2}', str(g3))])
+
+    result = TEST_CLI.invoke(main.cli, ["entitlement", "batch", "--file", filepath])
+
+    assert result.exit_code == 0, result.output
+    assert f'{sample_entity.id}: updated' in result.output
+    assert '1 updated, 0 unchanged, 0 conflicts, 0 failed' in result.output
+    rest_api_mock.patch.assert_called_once()
+    expected = Entitlement(id=sample_entity.id, groups=[g2, g1]).json(exclude_defaults=True, exclude={"id"})
+    assert rest_api_mock.patch.call_args[0][1] == expected
+
+
+def test_entitlement_batch_skips_unchanged(rest_api_mock, sample_entity, mock_auth_functions, tmp_path):
+    r = sample_entity.json().encode("utf-8")
+    rest_api_mock.get.return_value = mocks.http_response("", status_code=200, content=r)
+    filepath = write_batch_file(tmp_path, [(str(sample_entity.id), str(sample_entity.groups[0]), '')])
+
+    result = TEST_CLI.invoke(main.cli, ["entitlement", "batch", "--file", filepath])
+
+    assert result.exit_code == 0, result.output
+    assert f'{sample_entity.id}: unchanged' in result.output
+    rest_api_mock.patch.assert_not_called()
+
+
+def test_entitlement_batch_reports_failed_update(rest_api_mock, sample_entity, mock_auth_functions, tmp_path):
+    r = sample_entity.json().encode("utf-8")
+    rest_api_mock.get.return_value = mocks.http_response("", status_code=200, content=r)
+    rest_api_mock.patch.side_effect = requests.exceptions.HTTPError('409 Conflict')
+    filepath = write_batch_file(tmp_path, [(str(sample_entity.id), str(uuid.UUID(int=123)), '')])
+
+    result = TEST_CLI.invoke(main.cli, ["entitlement", "batch", "--file", filepath])
+
+    assert result.exit_code == 1
+    assert f'{sample_entity.id}: failed' in result.output
+    assert '0 updated, 0 unchanged, 0 conflicts, 1 failed' in result.output
+    rest_api_mock.patch.assert_called_once()
+
+
+def test_entitlement_batch_reports_conflict(rest_api_mock, sample_entity, mock_auth_functions, tmp_path):
+    responses = []
+    for i in range(4):
+        sample_entity.groups = [uuid.UUID(int=i)]
+        responses.append(mocks.http_response("", status_code=200, content=sample_entity.json().encode("utf-8")))
+    rest_api_mock.get.side_effect = responses
+    filepath = write_batch_file(tmp_path, [(str(sample_entity.id), str(uuid.UUID(int=123)), '')])
+
+    result = TEST_CLI.invoke(main.cli, ["entitlement", "batch", "--file", filepath, "--conflict-retries", "1"])
+
+    assert result.exit_code == 1
+    assert f'{sample_entity.id}: conflict' in result.output
+    assert '0 updated, 0 unchanged, 1 conflicts, 0 failed' in result.output
+    assert 'Failed to update 1 entitlements' in result.output
+    assert rest_api_mock.get.call_count == 3
+    rest_api_mock.patch.assert_not_called()
+
+
+def test_entitlement_batch_retries_after_concurrent_change(rest_api_mock, sample_entity, mock_auth_functions, tmp_path):
+    g1 = uuid.UUID(int=123)
+    first = sample_entity.json().encode("utf-8")
+    sample_entity.groups = [uuid.UUID(int=1)]
+    changed = sample_entity.json().encode("utf-8")
+    rest_api_mock.get.side_effect = [mocks.http_response("", status_code=200, content=c) for c in (first, changed, changed)]
+    rest_api_mock.patch.return_value = mocks.http_response("", status_code=200)
+    filepath = write_batch_file(tmp_path, [(str(sample_entity.id), str(g1), '')])
+
+    result = TEST_CLI.invoke(main.cli, ["entitlement", "batch", "--file", filepath])
+
+    assert result.exit_code == 0, result.output
+    expected = Entitlement(id=sample_entity.id, groups=[uuid.UUID(int=1), g1]).json(exclude_defaults=True, exclude={"id"})
+    assert rest_api_mock.patch.call_args[0][1] == expected
+
+
+def test_entitlement_batch_invalid_id(mock_auth_functions, tmp_path):
+    filepath = write_batch_file(tmp_path, [('not-a-uuid', '', '')])
+
+    result = TEST_CLI.invoke(main.cli, ["entitlement", "batch", "--file", filepath])
+
+    assert result.exit_code == 1
+    assert 'Row 1: not-a-uuid is not a valid UUID' in result.output
@@ -315,3 +315,64 @@ def test_helm_repo_list_returns_empty_list_when_repo_search_errors(mocker):
     mocker.patch('subprocess.run').side_effect = subprocess.CalledProcessError(1, ['helm', 'repo', 'list'])
     assert helm.repo_list() == []
 
+
+
+def test_read_only_calls_are_reused_within_an_invocation(mocker):
+    mock = mocker.patch('subprocess.check_output', return_value=SAMPLE_OUTPUT)
+    with click.Context(click.Command('test')):
+        assert helm.get_repository_cache() == HELM_RESPOSITORY_CACHE_VAL
+        assert helm.get_repository_cache() == HELM_RESPOSITORY_CACHE_VAL
+    assert mock.call_count == 1
+
+
+def test_read_only_calls_are_not_reused_across_invocations(mocker):
+    mock = mocker.patch('subprocess.check_output', return_value=SAMPLE_OUTPUT)
+    for _ in range(2):
+        with click.Context(click.Command('test')):
+            helm.env()
+    helm.env()
+    assert mock.call_count == 3
+
+
+def test_cached_calls_with_env_are_keyed_by_its_values(mocker):
+    mock = mocker.patch('subprocess.check_output', return_value=SAMPLE_OUTPUT)
+    with click.Context(click.Command('test')):
+        helm.check_output(['helm', 'env'], cache=True, env={'HELM_CACHE_HOME': '/a'})
+        helm.check_output(['helm', 'env'], cache=True, env={'HELM_CACHE_HOME': '/a'})
+        helm.check_output(['helm', 'env'], cache=True, env={'HELM_CACHE_HOME': '/b'})
+    assert mock.call_count == 2
+
+
+def test_cached_calls_with_unhashable_arguments_are_not_cached(mocker):
+    mock = mocker.patch('subprocess.check_output', return_value=SAMPLE_OUTPUT)
+    with click.Context(click.Command('test')):
+        helm.check_output(['helm', 'env'], cache=True, pass_fds={3})
+        helm.check_output(['helm', 'env'], cache=True, pass_fds={3})
+    assert mock.call_count == 2
+
+
+def test_mutating_calls_invalidate_cached_results(mocker):
+    mock = mocker.patch('subprocess.run')
+    mock.return_value = subprocess.CompletedProcess(args=[], returncode=0, stdout='[]')
+    with click.Context(click.Command('test')):
+        helm.repo_list()
+        helm.repo_list()
+        helm.uninstall(RELEASE, NAMESPACE)
+        helm.repo_list()
+    assert [c.args[0][:3] for c in mock.call_args_list] == [
+        ['helm', 'repo', 'list'],
+        ['helm', 'uninstall', RELEASE],
+        ['helm', 'repo', 'list'],
+    ]
+
+
+def test_helm_calls_summary_logged_with_debug(mocker, capsys):
+    mocker.patch('subprocess.check_output', return_value=SAMPLE_OUTPUT)
+    mocker.patch('kxicli.log.GLOBAL_DEBUG_LOG', True)
+    with click.Context(click.Command('test')):
+        helm.env()
+        helm.env()
+    out = capsys.readouterr().out
+    assert 'Spawned 1 helm processes' in out
+    assert 'reused 1 cached results' in out
+    assert 'helm env' in out
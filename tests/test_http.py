@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import click
+import requests
+
+from kxicli import common, log
+from kxicli.resources import http
+
+
+def get_test_context():
+    return click.Context(click.Command('test'))
+
+
+def test_session_reused_per_host_within_invocation():
+    with get_test_context():
+        session = http.session('https://test.kx.com/informationservice/details/abc')
+        assert http.session('https://test.kx.com/auth/admin/realms/insights/clients') is session
+        assert http.session('https://other.kx.com/') is not session
+
+
+def test_session_not_reused_across_invocations():
+    with get_test_context():
+        session = http.session('https://test.kx.com')
+    with get_test_context():
+        assert http.session('https://test.kx.com') is not session
+
+
+def test_session_outside_invocation_is_configured():
+    session = http.session('https://test.kx.com')
+    adapter = session.get_adapter('https://test.kx.com')
+    assert adapter._pool_maxsize == 10
+    assert adapter.max_retries.total == 3
+    assert adapter.max_retries.backoff_factor == 0.5
+    assert 'POST' not in adapter.max_retries.allowed_methods
+
+
+def test_shared_client_created_once_per_invocation():
+    create = MagicMock(side_effect=lambda: object())
+    with get_test_context():
+        client = http.shared_client(('assembly', 'test.kx.com', 'insights'), create)
+        assert http.shared_client(('assembly', 'test.kx.com', 'insights'), create) is client
+        http.shared_client(('assembly', 'test.kx.com', 'other'), create)
+    assert create.call_count == 2
+
+
+def test_register_mounts_adapter_on_external_session():
+    session = requests.Session()
+    http.register('https://test.kx.com', session)
+    assert session.get_adapter('https://test.kx.com').max_retries.total == 3
+
+
+def test_debug_summary(mocker, capsys):
+    mocker.patch.object(log, 'GLOBAL_DEBUG_LOG', True)
+    mocker.patch('kxicli.resources.http.pool_stats', return_value=(5, 1))
+    with get_test_context():
+        http.session('https://test.kx.com/a')
+        http.session('https://test.kx.com/b')
+
+    out = capsys.readouterr().out
+    assert out.count('HTTP https://test.kx.com: 5 requests over 1 connections') == 1
+
+
+def test_worker_in_context_uses_sessions_of_invocation():
+    with get_test_context():
+        session = http.session('https://test.kx.com')
+        get_session = common.in_current_context(lambda: http.session('https://test.kx.com'))
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(get_session).result() is session
+            assert executor.submit(http.session, 'https://test.kx.com').result() is not session
+
+
+def test_worker_in_context_shares_process_clients_of_its_profile():
+    create = MagicMock(side_effect=lambda: object())
+    ctx = click.Context(click.Command('test'))
+    ctx.params['profile'] = 'dev'
+    with http.keep_alive(), ctx:
+        client = http.shared_client('assembly', create)
+        get_client = common.in_current_context(lambda: http.shared_client('assembly', create))
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(get_client).result() is client
+    create.assert_called_once()
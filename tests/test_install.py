@@ -6,9 +6,14 @@
 import pyk8s
 import pytest
 import click
+import threading
+import yaml
 from pathlib import Path
+from unittest.mock import MagicMock
 
-from kxicli import common, phrases
+from click.testing import CliRunner
+
+from kxicli import common, main, phrases
 from kxicli.commands import install
 from kxicli.resources import helm_chart
 import mocks
@@ -297,6 +302,20 @@ def test_get_operator_version_returns_none_when_not_found(mocker):
     assert install.get_operator_version(chart, '5.6.7', None) == None
 
 
+
+def test_get_management_version_returns_version_if_passed(mocker):
+    utils.mock_helm_repo_list(mocker)
+    chart = helm_chart.Chart('kx-insights/insights')
+    assert install.get_management_version(chart, '0.1.3') == '0.1.3'
+
+
+def test_get_management_version_returns_first_found_version(mocker):
+    mocker.patch('kxicli.resources.helm.get_chart_versions', return_value=['0.2.0', '0.1.3'])
+    utils.mock_helm_repo_list(mocker)
+    chart = helm_chart.Chart('kx-insights/insights')
+    assert install.get_management_version(chart, None) == '0.2.0'
+
+
 def test_get_installed_charts_returns_chart_json(mocker):
     mocker.patch(fun_subprocess_check_output, mocked_helm_list_returns_valid_json)
     assert install.get_installed_charts('insights', test_ns) == json.loads(mocked_helm_list_returns_valid_json(''))
@@ -350,6 +369,25 @@ def test_get_image_and_license_secret_returns_error_when_invalid_dict_passed():
     assert f'Invalid values' in e.value.message
 
 
+def test_validate_secrets_runs_concurrently_and_keeps_order():
+    barrier = threading.Barrier(2, timeout=5)
+    secrets = []
+    for valid in (True, False):
+        secret = MagicMock()
+        secret.validate_keys.side_effect = lambda valid=valid: (barrier.wait() is not None, valid, [])
+        secrets.append(secret)
+
+    assert install.validate_secrets([secrets[0], None, secrets[1]]) == [(True, True, []), None, (True, False, [])]
+
+
+def test_ensure_secret_uses_existing_validation(mocker, k8s):
+    validate_keys = mocker.patch.object(pyk8s.models.V1Secret, 'validate_keys')
+    s = fake_secret(test_ns, test_secret, test_secret_type)
+    res = install.ensure_secret(s, populate, validation=(True, True, []))
+    assert res == s
+    validate_keys.assert_not_called()
+
+
 def test_ensure_secret_when_does_not_exist(k8s):
     mock_kube_secret_api(k8s)
 
@@ -773,6 +811,47 @@ def test_local_chart_versions_returns_none_correctly():
     assert install.local_chart_versions(chart, prefix = 'unknown-chart-') == []
 
 
+def test_read_remote_chart_data_fetches_once(mocker):
+    mock_helm_env(mocker)
+    utils.mock_helm_repo_list(mocker)
+    fetch = mocker.patch('kxicli.resources.helm.fetch')
+    read = MagicMock(return_value=[{'kind': 'CustomResourceDefinition'}])
+
+    first = install.read_remote_chart_data('kx-insights', 'kxi-operator', '1.2.3', '', 'crds', read)
+    second = install.read_remote_chart_data('kx-insights', 'kxi-operator', '1.2.3', '', 'crds', read)
+
+    assert first == second == [{'kind': 'CustomResourceDefinition'}]
+    fetch.assert_called_once()
+    read.assert_called_once_with('1.2.3', Path(utils.test_helm_repo_cache))
+
+
+def test_read_remote_chart_data_shares_cache_between_repo_aliases(mocker):
+    mock_helm_env(mocker)
+    mocker.patch('kxicli.resources.helm.repo_list', return_value=[
+        {'name': 'kx-insights', 'url': test_chart_repo_url},
+        {'name': 'kx-mirror', 'url': test_chart_repo_url}
+    ])
+    fetch = mocker.patch('kxicli.resources.helm.fetch')
+    read = MagicMock(return_value=[{'kind': 'CustomResourceDefinition'}])
+
+    install.read_remote_chart_data('kx-insights', 'kxi-operator', '1.2.3', '', 'crds', read)
+    install.read_remote_chart_data('kx-mirror', 'kxi-operator', '1.2.3', '', 'crds', read)
+
+    fetch.assert_called_once()
+    read.assert_called_once()
+
+
+def test_read_remote_chart_data_does_not_cache_failed_read(mocker):
+    mock_helm_env(mocker)
+    utils.mock_helm_repo_list(mocker)
+    mocker.patch('kxicli.resources.helm.fetch')
+    read = MagicMock(side_effect=[None, {'changes': []}])
+
+    assert install.read_remote_chart_data('kx-insights', 'insights', '1.5.0', '', 'actions', read) is None
+    assert install.read_remote_chart_data('kx-insights', 'insights', '1.5.0', '', 'actions', read) == {'changes': []}
+    assert read.call_count == 2
+
+
 def test_get_chart_actions_with_no_upgrade_actions(mocker):
     chart = helm_chart.Chart(str(insights_tgz))
     mock_helm_env(mocker)
@@ -885,6 +964,178 @@ def mocked_subprocess(args, **kwargs):
     assert install.run_chart_actions(chart, release, namespace, '1.2.3') is None
 
 
+def test_running_upgrade_with_planned_changes(mocker):
+    mocked_actions = mocker.patch("kxicli.commands.install.get_chart_actions")
+    mocked_run = mocker.patch("subprocess.run")
+    changes = [{"name": "Planned", "actions": [{"delete": ["-n", "$NAMESPACE", "sts/$RELEASE-qe"]}]}]
+
+    chart = helm_chart.Chart(str(insights_tgz))
+    install.run_chart_actions(chart, "insights", "kxi", "1.2.3", changes=changes)
+
+    mocked_actions.assert_not_called()
+    mocked_run.assert_called_once_with(["kubectl", "delete", "-n", "kxi", "sts/insights-qe"], check=True)
+
+
+def sample_upgrade_plan(installed_version='1.2.1'):
+    return {
+        'kxiUpgradePlan': install.UPGRADE_PLAN_VERSION,
+        'created': '2023-01-01T00:00:00+00:00',
+        'options': {'namespace': 'kxi', 'release': 'insights', 'chart': 'kx-insights/insights', 'version': '1.2.3',
+                    'image_pull_secret': 'kxi-nexus-pull-secret', 'license_secret': 'kxi-license', 'filepath': None},
+        'discovery': {
+            'installed_version': installed_version,
+            'install_operator': True,
+            'is_operator_upgrade': True,
+            'operator_version': '1.2.3',
+            'operator_release': 'insights',
+            'crd_data': [{'metadata': {'name': name}} for name in install.CRD_NAMES],
+            'chart_actions': [{'name': 'Headless service', 'actions': [{'delete': ['-n', '$NAMESPACE', 'svc/$RELEASE-rc']}]}],
+            'assemblies': ['basic-assembly'],
+            'management_version': '0.1.3',
+            'management_installed': True
+        }
+    }
+
+
+def test_upgrade_plan_steps():
+    assert install.upgrade_plan_steps(sample_upgrade_plan()) == [
+        'Back up and tear down assemblies basic-assembly',
+        'Upgrade kxi-operator to version 1.2.3',
+        'Replace CRDs assemblies.insights.kx.com, assemblyresources.insights.kx.com',
+        'Run upgrade action for Headless service: kubectl delete -n kxi svc/insights-rc',
+        'Upgrade insights from version 1.2.1 to 1.2.3',
+        'Reapply assemblies',
+        'Upgrade kxi-management-service to version 0.1.3'
+    ]
+
+
+def test_read_upgrade_plan_rejects_other_files(tmp_path):
+    path = tmp_path / 'plan.yaml'
+    path.write_text('a: 1')
+    with pytest.raises(click.ClickException, match='is not an upgrade plan'):
+        install.read_upgrade_plan(str(path))
+
+
+def test_apply_upgrade_plan_reuses_discovery(mocker, tmp_path):
+    path = tmp_path / 'plan.yaml'
+    path.write_text(yaml.safe_dump(sample_upgrade_plan()))
+    mocker.patch('kxicli.commands.install.get_installed_charts', return_value=[{'app_version': '1.2.1'}])
+    mocker.patch('kxicli.commands.install.helm_chart.Chart')
+    mocker.patch('kxicli.commands.install.get_docker_config_secret', return_value='{}')
+    mocker.patch('kxicli.commands.install.helm.get_values', return_value={})
+    validate_values = mocker.patch('kxicli.commands.install.validate_values')
+    check_operator = mocker.patch('kxicli.commands.install.check_for_operator_install')
+    perform_upgrade = mocker.patch('kxicli.commands.install.perform_upgrade')
+
+    install.apply_upgrade_plan(str(path), None, None, True)
+
+    validate_values.assert_called_once_with('kxi', {})
+    check_operator.assert_not_called()
+    assert perform_upgrade.call_args[1]['discovery'] == sample_upgrade_plan()['discovery']
+
+
+def test_apply_upgrade_plan_validates_values(mocker, tmp_path):
+    path = tmp_path / 'plan.yaml'
+    path.write_text(yaml.safe_dump(sample_upgrade_plan()))
+    mocker.patch('kxicli.commands.install.get_installed_charts', return_value=[{'app_version': '1.2.1'}])
+    mocker.patch('kxicli.commands.install.helm.get_values', return_value={})
+    mocker.patch('kxicli.commands.install.validate_values',
+                 side_effect=click.ClickException(phrases.values_validation_fail))
+    perform_upgrade = mocker.patch('kxicli.commands.install.perform_upgrade')
+
+    with pytest.raises(click.ClickException, match=phrases.values_validation_fail):
+        install.apply_upgrade_plan(str(path), None, None, True)
+    perform_upgrade.assert_not_called()
+
+
+def test_apply_upgrade_plan_checks_upgrade_version(mocker, tmp_path):
+    path = tmp_path / 'plan.yaml'
+    upgrade_plan = sample_upgrade_plan(installed_version='1.2.4')
+    path.write_text(yaml.safe_dump(upgrade_plan))
+    mocker.patch('kxicli.commands.install.get_installed_charts', return_value=[{'app_version': '1.2.4'}])
+    mocker.patch('kxicli.commands.install.helm.get_values', return_value={})
+    mocker.patch('kxicli.commands.install.validate_values')
+    perform_upgrade = mocker.patch('kxicli.commands.install.perform_upgrade')
+
+    with pytest.raises(click.ClickException, match='Target version must be higher'):
+        install.apply_upgrade_plan(str(path), None, None, True)
+    perform_upgrade.assert_not_called()
+
+
+def test_plan_upgrade_stores_absolute_values_path(mocker, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    mocker.patch('kxicli.commands.install.check_for_operator_install', return_value=(False, False, None, None, []))
+    mocker.patch('kxicli.commands.install.get_installed_version', return_value=None)
+    mocker.patch('kxicli.commands.install.get_management_version', return_value='0.1.3')
+
+    upgrade_plan = install.plan_upgrade('kxi', 'insights', MagicMock(), '1.2.3', None, None, None,
+                                        'values.yaml', '{}', True, None)
+
+    assert upgrade_plan['options']['filepath'] == str(tmp_path / 'values.yaml')
+
+
+def test_apply_upgrade_plan_fails_when_installed_version_changed(mocker, tmp_path):
+    path = tmp_path / 'plan.yaml'
+    path.write_text(yaml.safe_dump(sample_upgrade_plan()))
+    mocker.patch('kxicli.commands.install.get_installed_charts', return_value=[{'app_version': '1.2.2'}])
+
+    with pytest.raises(click.ClickException, match='create a new plan'):
+        install.apply_upgrade_plan(str(path), None, None, True)
+
+
+
+def test_print_upgrade_plan_shows_discovery_time(capsys):
+    upgrade_plan = sample_upgrade_plan()
+    upgrade_plan['discovery_seconds'] = {'operator and CRDs': 2.5, 'chart actions': 1.25}
+
+    install.print_upgrade_plan(upgrade_plan)
+
+    assert 'Discovery took 3.8s and is skipped by --apply-plan (operator and CRDs 2.5s, chart actions 1.2s)' \
+        in capsys.readouterr().out
+
+
+def test_upgrade_rejects_plan_with_apply_plan(tmp_path):
+    path = tmp_path / 'plan.yaml'
+    path.write_text(yaml.safe_dump(sample_upgrade_plan()))
+
+    result = CliRunner().invoke(main.cli, ['install', 'upgrade', '--plan', str(tmp_path / 'new.yaml'),
+                                           '--apply-plan', str(path)])
+
+    assert result.exit_code == 2
+    assert "--plan and --apply-plan can't be used together" in result.output
+
+
+def test_upgrade_rejects_options_set_by_plan(mocker, tmp_path):
+    path = tmp_path / 'plan.yaml'
+    path.write_text(yaml.safe_dump(sample_upgrade_plan()))
+    apply_plan = mocker.patch('kxicli.commands.install.apply_upgrade_plan')
+
+    result = CliRunner().invoke(main.cli, ['install', 'upgrade', '--apply-plan', str(path), '--version', '1.2.4',
+                                           'kx-insights/insights'])
+
+    assert result.exit_code == 2
+    assert "can't be used with --apply-plan, the plan sets them" in result.output
+    assert "'--version'" in result.output and 'CHART' in result.output
+    apply_plan.assert_not_called()
+
+
+def test_upgrade_apply_plan_does_not_need_version(mocker, tmp_path):
+    path = tmp_path / 'plan.yaml'
+    path.write_text(yaml.safe_dump(sample_upgrade_plan()))
+    apply_plan = mocker.patch('kxicli.commands.install.apply_upgrade_plan')
+
+    result = CliRunner().invoke(main.cli, ['install', 'upgrade', '--apply-plan', str(path)])
+
+    assert result.exit_code == 0
+    assert apply_plan.call_args[0][0] == str(path)
+
+
+def test_upgrade_requires_version_without_plan():
+    result = CliRunner().invoke(main.cli, ['install', 'upgrade'])
+
+    assert result.exit_code == 2
+    assert "Missing option '--version'" in result.output
+
 def test_apply_envs():
     args = ['-n', '$NAMESPACE', 'sts/$RELEASE-resource-coordinator']
     env = {'NAMESPACE': 'kxi', 'RELEASE': 'insights'}
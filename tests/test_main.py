@@ -0,0 +1,89 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from kxicli import config
+from kxicli import main
+
+TEST_CLI = CliRunner()
+TEST_CONFIG = Path(__file__).parent / 'files' / 'test-cli-config'
+
+config.config_file = str(TEST_CONFIG)
+
+# Modules that should never be imported unless the command needing them runs
+HEAVY_MODULES = ['pakxcli', 'azure.identity', 'msgraph', 'keycloak', 'cryptography', 'kxi.query']
+
+
+@pytest.fixture
+def home(tmp_path):
+    """Isolated HOME with the test config so the root command doesn't prompt"""
+    config_dir = tmp_path / '.insights'
+    config_dir.mkdir()
+    shutil.copy(TEST_CONFIG, config_dir / 'cli-config')
+    return tmp_path
+
+
+def imported_modules(home, *args):
+    """Run kxi with -X importtime and return the modules and cumulative import time in microseconds"""
+    env = os.environ.copy()
+    env['HOME'] = str(home)
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'kxicli.main', *args],
+                         env=env, capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    modules = {}
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def loaded_commands(modules):
+    return sorted(m for m in modules
+                  if m.startswith('kxicli.commands.') and not m.startswith('kxicli.commands.common'))
+
+
+def test_version_does_not_import_commands(home):
+    modules = imported_modules(home, '--version')
+    assert loaded_commands(modules) == []
+    for heavy in HEAVY_MODULES:
+        assert heavy not in modules
+
+
+@pytest.mark.parametrize('command', ['assembly', 'auth', 'client', 'entitlement', 'query', 'user'])
+def test_subcommand_only_imports_own_module(home, command):
+    modules = imported_modules(home, command, '--help')
+    assert f'kxicli.commands.{command}' in modules
+    assert loaded_commands(modules) == [f'kxicli.commands.{command}']
+    assert 'pakxcli' not in modules
+
+
+def test_install_loads_idp_subcommands():
+    result = TEST_CLI.invoke(main.cli, ['install', 'idp', '--help'])
+    assert result.exit_code == 0
+    assert 'mapper' in result.output
+
+
+def test_alias_resolves_lazy_command():
+    result = TEST_CLI.invoke(main.cli, ['azure', '--help'])
+    assert result.exit_code == 0
+    assert 'Insights installation commands' in result.output
+
+
+def test_help_lists_every_command():
+    result = TEST_CLI.invoke(main.cli, ['--help'])
+    assert result.exit_code == 0
+    for command in ['assembly', 'auth', 'backup', 'client', 'configure', 'entitlement', 'install', 'package',
+                    'query', 'user']:
+        assert command in result.output
+
+
+def test_main_exposes_command_modules():
+    assert main.install.install.name == 'install'
+    with pytest.raises(AttributeError):
+        main.unknown
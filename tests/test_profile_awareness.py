@@ -1,3 +1,4 @@
+import configparser
 import pytest
 import importlib
 import json
@@ -110,3 +111,37 @@ def test_non_default_profile_microservices_no_default():
     assert cfg.get(cfg.default_section, "tp_port") == "5010"
 
     kxicli.main.cli_group.config.config_file = str(Path(__file__).parent / 'files' / 'test-cli-config')
+
+
+def count_config_reads(mocker, args):
+    read = mocker.spy(configparser.ConfigParser, 'read')
+    TEST_CLI.invoke(kxicli.main.cli, args)
+    return len([c for c in read.call_args_list if c.args[1] == kxicli.main.cli_group.config.config_file])
+
+
+@pytest.mark.parametrize('args', [
+    ['assembly', '--help'],
+    ['assembly', 'list', '--help'],
+    ['install', 'idp', 'mapper', '--help'],
+    ['--profile', 'enterprise_profile', 'user', 'list', '--help'],
+    ['--profile', 'microservices_profile', 'publish', '--help'],
+])
+def test_config_file_read_once_per_invocation(mocker, args):
+    kxicli.main.cli_group.config.config_file = str(Path(__file__).parent / 'files' / 'test-cli-config-multi')
+
+    assert count_config_reads(mocker, args) == 1
+
+    kxicli.main.cli_group.config.config_file = str(Path(__file__).parent / 'files' / 'test-cli-config')
+
+
+def test_usage_resolved_once_per_invocation(mocker):
+    kxicli.main.cli_group.config.config_file = str(Path(__file__).parent / 'files' / 'test-cli-config-multi')
+    resolve = mocker.spy(kxicli.main.cli_group.ProfileAwareGroup, '_resolve_cli_usage')
+
+    result = TEST_CLI.invoke(kxicli.main.cli, ['--profile', 'microservices_profile', 'publish', '--help'])
+    assert result.exit_code == 0
+    TEST_CLI.invoke(kxicli.main.cli, ['install', 'idp', 'mapper', '--help'])
+
+    assert resolve.call_count == 2
+
+    kxicli.main.cli_group.config.config_file = str(Path(__file__).parent / 'files' / 'test-cli-config')
@@ -1,3 +1,4 @@
+import click
 import pytest
 import importlib
 import json
@@ -7,6 +8,7 @@
 from pytest_mock import MockerFixture
 from click.testing import CliRunner
 import kxicli.main
+from kxicli.commands import publish as publish_cmd
 
 
 
@@ -52,3 +54,169 @@ def test_publish_calls_dbpublisher(dbpublisher_mock):
     ])    
    
     kxicli.main.cli_group.config.config_file = str(Path(__file__).parent / 'files' / 'test-cli-config')
+
+
+def invoke_publish(data, *args):
+    kxicli.main.cli_group.config.config_file = str(Path(__file__).parent / 'files' / 'test-cli-config-microservices')
+    result = TEST_CLI.invoke(kxicli.main.cli, [
+                            'publish',
+                            '--hostname', HOSTNAME_FULL,
+                            '--port', PORT,
+                            '--data', str(data),
+                            '--table', TARGET_TABLE,
+                            *args])
+    kxicli.main.cli_group.config.config_file = str(Path(__file__).parent / 'files' / 'test-cli-config')
+    return result
+
+
+@pytest.fixture()
+def data_dir(tmp_path):
+    for n in range(4):
+        (tmp_path / f'{n}.csv').write_text('a,b\n1,2\n')
+    (tmp_path / '.hidden').write_text('')
+    return tmp_path
+
+
+def test_publish_parallel_publishes_each_file(dbpublisher_mock, data_dir):
+    result = invoke_publish(data_dir, '--parallel', '2')
+
+    assert result.exit_code == 0
+    publish = dbpublisher_mock.return_value.__enter__.return_value.publish
+    assert sorted(c.args[0] for c in publish.call_args_list) == [str(data_dir / f'{n}.csv') for n in range(4)]
+    assert dbpublisher_mock.call_count == 2
+    assert 'Published 4 files' in result.output
+    assert '4 rows' in result.output
+    assert 'rows/s' in result.output
+
+
+def test_publish_parallel_retries_failed_file(dbpublisher_mock, data_dir):
+    attempts = []
+    def publish(path, *args):
+        attempts.append(path)
+        if path.endswith('1.csv') and attempts.count(path) == 1:
+            raise ConnectionError('connection reset')
+    dbpublisher_mock.return_value.__enter__.return_value.publish.side_effect = publish
+
+    result = invoke_publish(data_dir, '--parallel', '2')
+
+    assert result.exit_code == 0
+    assert attempts.count(str(data_dir / '1.csv')) == 2
+    # the failed connection is replaced with a new one
+    assert dbpublisher_mock.call_count == 3
+
+
+def test_publish_parallel_reports_files_failing_after_retries(dbpublisher_mock, data_dir):
+    def publish(path, *args):
+        if path.endswith('1.csv'):
+            raise ConnectionError('connection reset')
+    dbpublisher_mock.return_value.__enter__.return_value.publish.side_effect = publish
+
+    result = invoke_publish(data_dir, '--parallel', '2', '--retries', '1')
+
+    assert result.exit_code == 1
+    assert f"Error: Failed to publish 1 files: {data_dir / '1.csv'}" in result.output
+
+
+def test_publish_parallel_does_not_retry_other_errors(dbpublisher_mock, data_dir):
+    attempts = []
+    def publish(path, *args):
+        attempts.append(path)
+        if path.endswith('1.csv'):
+            raise ValueError('could not convert column b')
+    dbpublisher_mock.return_value.__enter__.return_value.publish.side_effect = publish
+
+    result = invoke_publish(data_dir, '--parallel', '2', '--retries', '2')
+
+    assert result.exit_code == 1
+    assert f"Error: Failed to publish {data_dir / '1.csv'}: could not convert column b" in result.output
+    assert attempts.count(str(data_dir / '1.csv')) == 1
+
+
+def test_publish_parallel_fails_fast_on_unsupported_chunk_format(dbpublisher_mock, tmp_path):
+    for n in range(4):
+        (tmp_path / f'{n}.txt').write_text('a\n1\n')
+
+    result = invoke_publish(tmp_path, '--parallel', '2', '--chunk-rows', '1')
+
+    assert result.exit_code == 1
+    assert '--chunk-rows only supports' in result.output
+    assert 'Attempt' not in result.output
+    dbpublisher_mock.return_value.__enter__.return_value.publish.assert_not_called()
+
+
+def test_count_rows(tmp_path):
+    (tmp_path / 'data.csv').write_text('a,b\n1,2\n"3\n4",5\n')
+    (tmp_path / 'data.json').write_text('{"a":1}\n{"a":2}\n\n')
+    (tmp_path / 'array.json').write_text('[{"a":1},{"a":2},{"a":3}]')
+
+    assert publish_cmd._count_rows(str(tmp_path / 'data.csv'), None) == 2
+    assert publish_cmd._count_rows(str(tmp_path / 'data.json'), 'json_records') == 2
+    assert publish_cmd._count_rows(str(tmp_path / 'array.json'), None) == 3
+    assert publish_cmd._count_rows(str(tmp_path / 'missing.csv'), None) == 0
+
+
+def test_publish_ordered_uses_single_connection(dbpublisher_mock, data_dir):
+    result = invoke_publish(data_dir, '--parallel', '2', '--ordered')
+
+    assert result.exit_code == 0
+    dbpublisher_mock.return_value.__enter__.return_value.publish.assert_called_once_with(
+        str(data_dir), TARGET_TABLE, None, None)
+
+
+def capture_chunks(pub):
+    """Record the content of each chunk as it's published, chunk files are removed once sent"""
+    sent = []
+    pub.publish.side_effect = lambda path, *args: sent.append(Path(path).read_text())
+    return sent
+
+
+def test_publish_chunks_splits_csv_with_header(tmp_path):
+    data = tmp_path / 'data.csv'
+    data.write_text('a,b\n1,2\n3,4\n5,6\n')
+    pub = MagicMock()
+    sent = capture_chunks(pub)
+
+    publish_cmd.publish_chunks(pub, str(data), TARGET_TABLE, None, json.loads(TYPE_MAP), 2)
+
+    assert sent == ['a,b\r\n1,2\r\n3,4\r\n', 'a,b\r\n5,6\r\n']
+    assert all(c.args[1:] == (TARGET_TABLE, 'csv', json.loads(TYPE_MAP)) for c in pub.publish.call_args_list)
+
+
+def test_publish_chunks_splits_json_records(tmp_path):
+    data = tmp_path / 'data.json'
+    data.write_text('{"a":1}\n{"a":2}\n\n{"a":3}\n')
+    pub = MagicMock()
+    sent = capture_chunks(pub)
+
+    publish_cmd.publish_chunks(pub, str(data), TARGET_TABLE, 'json_records', None, 2)
+
+    assert sent == ['{"a":1}\n{"a":2}\n', '{"a":3}\n']
+
+
+def test_publish_chunks_resumes_from_first_unsent_chunk(tmp_path):
+    data = tmp_path / 'data.csv'
+    data.write_text('a\n1\n2\n3\n')
+    pub = MagicMock()
+    sent = capture_chunks(pub)
+
+    publish_cmd.publish_chunks(pub, str(data), TARGET_TABLE, None, None, 1, progress={'chunks': 2})
+
+    assert sent == ['a\r\n3\r\n']
+
+
+def test_publish_chunks_rejects_unsupported_format(tmp_path):
+    data = tmp_path / 'data.json'
+    data.write_text('{}')
+    with pytest.raises(click.ClickException):
+        publish_cmd.publish_chunks(MagicMock(), str(data), TARGET_TABLE, None, None, 1)
+
+
+def test_publish_chunk_rows(dbpublisher_mock, tmp_path):
+    data = tmp_path / 'data.csv'
+    data.write_text('a\n1\n2\n3\n')
+
+    result = invoke_publish(data, '--chunk-rows', '2')
+
+    assert result.exit_code == 0
+    assert dbpublisher_mock.return_value.__enter__.return_value.publish.call_count == 2
+    assert f'Publishing {data} in chunks of 2 rows' in result.output
@@ -11,7 +11,7 @@
 from kxi import DeploymentType
 from kxi.auth import Authorizer
 from utils import return_none
-from kxicli.commands.query import query
+from kxicli.commands.query import query, limit_query
 from click.testing import CliRunner
 from kxicli import common
 from kxi.auth import CredentialStore
@@ -234,4 +234,101 @@ def test_query_results_json_records(query_mock, table_pd_mock, mock_auth_functio
         call().sql(SQL)
     ])
     
-    assert test_data.to_json(orient="records", lines=True) == result.output
\ No newline at end of file
+    assert test_data.to_json(orient="records", lines=True) == result.output
+
+@pytest.mark.parametrize('output_format', ['csv', 'json_records'])
+def test_query_results_written_in_batches(mocker, query_mock, table_pd_mock, mock_auth_functions, output_format):
+    mocker.patch('kxicli.commands.query.DEFAULT_BATCH_SIZE', 2)
+    test_data = generate_test_data(5, TEST_FILE_SCHEME)
+    query_mock.return_value.sql.return_value.pd.return_value = test_data
+    with get_test_context():
+        result = TEST_CLI.invoke(main.cli, ['query',
+                                '--hostname', HOSTNAME,
+                                '--usage', USAGE_MICROSERVICES,
+                                '--sql', SQL,
+                                '--output-format', output_format,
+                                '--client-id', CLIENT_ID,
+                                '--client-secret', CLIENT_SECRET
+        ])
+
+    assert result.exit_code == 0
+    if output_format == 'csv':
+        assert test_data.to_csv(index=False) == result.output
+    else:
+        assert test_data.to_json(orient="records", lines=True).rstrip('\n') == result.output.rstrip('\n')
+
+
+def test_query_results_limit(query_mock, table_pd_mock, mock_auth_functions, tmp_path):
+    test_data = generate_test_data(3, TEST_FILE_SCHEME)
+    query_mock.return_value.sql.return_value.pd.return_value = test_data
+    output_file = tmp_path / 'out.csv'
+    with get_test_context():
+        result = TEST_CLI.invoke(main.cli, ['query',
+                                '--hostname', HOSTNAME,
+                                '--usage', USAGE_MICROSERVICES,
+                                '--sql', SQL,
+                                '--output-format', 'csv',
+                                '--output-file', str(output_file),
+                                '--limit', '3',
+                                '--client-id', CLIENT_ID,
+                                '--client-secret', CLIENT_SECRET
+        ])
+
+    assert result.exit_code == 0
+    query_mock.return_value.sql.assert_called_once_with(f'SELECT * FROM ({SQL}) LIMIT 3')
+    assert output_file.read_text() == test_data.to_csv(index=False)
+
+
+def test_limit_query_strips_trailing_semicolon():
+    assert limit_query(' select * from trade; ', 10) == 'SELECT * FROM (select * from trade) LIMIT 10'
+
+
+def invoke_query_to_file(output_format, output_file, *args):
+    with get_test_context():
+        return TEST_CLI.invoke(main.cli, ['query',
+                                '--hostname', HOSTNAME,
+                                '--usage', USAGE_MICROSERVICES,
+                                '--sql', SQL,
+                                '--output-format', output_format,
+                                '--output-file', str(output_file),
+                                '--client-id', CLIENT_ID,
+                                '--client-secret', CLIENT_SECRET,
+                                *args
+        ])
+
+
+@pytest.mark.parametrize('output_format', ['parquet', 'arrow'])
+def test_query_results_columnar(query_mock, table_pd_mock, mock_auth_functions, tmp_path, output_format):
+    pytest.importorskip('pyarrow')
+    test_data = generate_test_data(5, TEST_FILE_SCHEME)
+    query_mock.return_value.sql.return_value.pd.return_value = test_data
+    output_file = tmp_path / f'out.{output_format}'
+
+    result = invoke_query_to_file(output_format, output_file)
+
+    assert result.exit_code == 0
+    read = pd.read_parquet if output_format == 'parquet' else pd.read_feather
+    pd.testing.assert_frame_equal(read(output_file), test_data)
+
+
+def test_query_results_parquet_partitioned(query_mock, table_pd_mock, mock_auth_functions, tmp_path):
+    pytest.importorskip('pyarrow')
+    test_data = generate_test_data(5, TEST_FILE_SCHEME)
+    query_mock.return_value.sql.return_value.pd.return_value = test_data
+
+    result = invoke_query_to_file('parquet', tmp_path / 'out.parquet', '--rows-per-file', '2')
+
+    assert result.exit_code == 0
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['out-00000.parquet', 'out-00001.parquet', 'out-00002.parquet']
+    parts = [pd.read_parquet(tmp_path / f'out-0000{n}.parquet') for n in range(3)]
+    pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), test_data)
+
+
+def test_query_parquet_requires_output_file(query_mock, mock_auth_functions):
+    with get_test_context():
+        result = TEST_CLI.invoke(main.cli, ['query', '--hostname', HOSTNAME, '--usage', USAGE_MICROSERVICES,
+                                            '--sql', SQL, '--output-format', 'parquet'])
+
+    assert result.exit_code == 1
+    assert 'Error: --output-file is required for parquet output' in result.output
+    query_mock.assert_not_called()
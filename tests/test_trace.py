@@ -0,0 +1,81 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from click.testing import CliRunner
+
+from kxicli import common, log
+from kxicli.resources import trace
+
+
+@trace.traced('outer')
+def outer():
+    with trace.span('helm list', trace.CATEGORY_SUBPROCESS, release='insights'):
+        pass
+    inner()
+
+
+@trace.traced('inner')
+def inner():
+    pass
+
+
+def test_span_without_tracer_is_noop():
+    with click.Context(click.Command('test')):
+        outer()
+        assert trace._current_tracer() is None
+
+
+def test_worker_in_context_records_spans_in_invocation_tracer():
+    with click.Context(click.Command('test')):
+        trace.start()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            [*executor.map(common.in_current_context(lambda _: outer()), range(2))]
+            executor.submit(inner).result()
+        spans = trace._current_tracer().spans
+
+    assert sorted(s['name'] for s in spans) == ['helm list', 'helm list', 'inner', 'inner', 'outer', 'outer']
+    assert all(s['tid'] != threading.get_ident() for s in spans)
+
+
+def test_spans_are_nested_by_depth():
+    with click.Context(click.Command('test')):
+        trace.start()
+        outer()
+        spans = {s['name']: s for s in trace._current_tracer().spans}
+
+    assert spans['outer']['depth'] == 0
+    assert spans['helm list']['depth'] == 1
+    assert spans['helm list']['cat'] == trace.CATEGORY_SUBPROCESS
+    assert spans['inner']['depth'] == 1
+    assert spans['outer']['start'] <= spans['inner']['start']
+    assert spans['outer']['duration'] >= spans['inner']['duration']
+
+
+def test_trace_file_is_chrome_trace_format(tmp_path):
+    trace_file = tmp_path / 'trace.json'
+    with click.Context(click.Command('test')):
+        trace.start(str(trace_file))
+        outer()
+
+    events = json.loads(trace_file.read_text())['traceEvents']
+    assert [e['name'] for e in events] == ['outer', 'helm list', 'inner']
+    assert all(e['ph'] == 'X' and e['dur'] >= 0 for e in events)
+    assert events[1]['args'] == {'release': 'insights'}
+
+
+def test_summary_logged_on_close(monkeypatch):
+    monkeypatch.setattr(log, 'GLOBAL_DEBUG_LOG', True)
+
+    @click.command()
+    def cmd():
+        trace.start()
+        outer()
+
+    result = CliRunner().invoke(cmd)
+
+    assert result.exit_code == 0
+    assert 'Phase timings' in result.output
+    assert 's   inner' in result.output
+    assert 'in 1 subprocess calls' in result.output
@@ -11,7 +11,11 @@
 from mocks import http_response
 from functools import partialmethod
 import requests
+import requests_mock
 import json
+from unittest.mock import MagicMock
+
+from kxicli.resources.user import UserManager, RoleNotFoundException
 
 TEST_CLI = CliRunner()
 
@@ -35,6 +39,10 @@ def create_user(self, *args, **kwargs):
         def list_users(self, *args, **kwargs):
             self._raise_HTTP_Exception()
 
+        def iter_users(self, *args, **kwargs):
+            self._raise_HTTP_Exception()
+            yield
+
         def get_roles(self, *args, **kwargs):
             self._raise_HTTP_Exception()
 
@@ -101,4 +109,185 @@ def test_user_delete_exception(mocker):
     mocker.patch('kxicli.commands.user.get_user_manager', mocked_user_manager)
     result = TEST_CLI.invoke(main.cli, ['user', 'delete', 'testUser', '--hostname', 'test-host', '--admin-password', 'test', '--force'])
     assert result.exit_code == 1
-    assert result.output == 'Error: Deleting user failed with 404 None (<Response [404]>)\n'
\ No newline at end of file
+    assert result.output == 'Error: Deleting user failed with 404 None (<Response [404]>)\n'
+
+USERS_URL = 'https://test.kx.com/auth/admin/realms/insights/users'
+ROLES_URL = 'https://test.kx.com/auth/admin/realms/insights/roles'
+ROLES = [{'id': '1', 'name': 'viewer'}, {'id': '2', 'name': 'insights.query.data'}]
+
+
+@pytest.fixture
+def user_manager(mocker):
+    mocker.patch('kxicli.resources.user.Authorizer.for_admin', return_value=MagicMock(session=requests.Session()))
+    return UserManager('https://test.kx.com', 'admin', 'pass')
+
+
+def mock_keycloak(m, users=('user1', 'user2')):
+    for n, name in enumerate(users):
+        m.get(f'{USERS_URL}?username={name}&exact=true', json=[{'id': f'id{n}', 'username': name}])
+        m.post(f'{USERS_URL}/id{n}/role-mappings/realm')
+        m.delete(f'{USERS_URL}/id{n}/role-mappings/realm')
+    m.get(ROLES_URL, json=ROLES)
+
+
+def count_requests(m, url):
+    return len([r for r in m.request_history if r.url.split('?')[0] == url])
+
+
+def test_user_manager_fetches_users_and_roles_once(user_manager):
+    with requests_mock.Mocker() as m:
+        mock_keycloak(m)
+        for _ in range(3):
+            user_manager.assign_roles('user1', ['viewer'])
+            user_manager.assign_roles('USER2', ['viewer', 'insights.query.data'])
+        user_manager.remove_roles('user1', ['viewer'])
+
+        assert count_requests(m, ROLES_URL) == 1
+        assert count_requests(m, USERS_URL) == 2
+        assert m.last_request.json() == [ROLES[0]]
+
+
+def test_user_manager_index_expires(user_manager):
+    user_manager.index_ttl = 0
+    with requests_mock.Mocker() as m:
+        mock_keycloak(m)
+        user_manager.assign_roles('user1', ['viewer'])
+        user_manager.assign_roles('user1', ['viewer'])
+
+        assert count_requests(m, ROLES_URL) == 2
+        assert count_requests(m, USERS_URL) == 2
+
+
+def test_user_manager_index_users_pages_through_realm(user_manager):
+    with requests_mock.Mocker() as m:
+        m.get(USERS_URL, [{'json': [{'id': 'id0', 'username': 'user1'}, {'id': 'id1', 'username': 'user2'}]},
+                          {'json': [{'id': 'id2', 'username': 'user3'}]}])
+        user_manager.index_users(page_size=2)
+
+        assert [r.qs['first'] for r in m.request_history] == [['0'], ['2']]
+        assert user_manager.get_user_by_name('user3')['id'] == 'id2'
+        assert len(m.request_history) == 2
+
+
+def test_user_manager_missing_role(user_manager):
+    with requests_mock.Mocker() as m:
+        mock_keycloak(m)
+        with pytest.raises(RoleNotFoundException) as e:
+            user_manager.assign_roles('user1', ['viewer', 'admin'])
+        assert e.value.args[0] == ['admin']
+
+
+def mock_user_manager_for_import(mocker, create_user=None):
+    um = MagicMock()
+    if create_user:
+        um.create_user.side_effect = create_user
+    mocker.patch('kxicli.commands.user.get_user_manager', return_value=um)
+    return um
+
+
+def test_user_import_csv(mocker, tmp_path):
+    um = mock_user_manager_for_import(mocker)
+    users_file = tmp_path / 'users.csv'
+    users_file.write_text('username,password,email,roles\n'
+                          'user1,pass1,user1@kx.com,viewer;insights.query.data\n'
+                          'user2,pass2,,\n')
+
+    result = TEST_CLI.invoke(main.cli, ['user', 'import', '--file', str(users_file), '--hostname', 'test-host',
+                                        '--admin-password', 'test', '--not-temporary'])
+
+    assert result.exit_code == 0
+    assert 'Imported 2 of 2 users' in result.output
+    assert sorted(c.args for c in um.create_user.call_args_list) == [('user1', 'pass1', 'user1@kx.com'),
+                                                                     ('user2', 'pass2', None)]
+    assert all(c.kwargs == {'enabled': True, 'temporary': False} for c in um.create_user.call_args_list)
+    um.assign_roles.assert_called_once_with(username='user1', roles=['viewer', 'insights.query.data'])
+    um.get_roles.assert_called_once()
+
+
+def test_user_import_reports_failed_rows(mocker, tmp_path):
+    def create_user(username, *args, **kwargs):
+        if username == 'user2':
+            http_response('', status_code=409, content=json.dumps({'errorMessage': 'User exists'}).encode('utf-8'))
+    mock_user_manager_for_import(mocker, create_user)
+    users_file = tmp_path / 'users.yaml'
+    users_file.write_text('- {username: user1, password: pass1}\n'
+                          '- {username: user2, password: pass2}\n'
+                          '- {username: user3}\n')
+
+    result = TEST_CLI.invoke(main.cli, ['user', 'import', '--file', str(users_file), '--hostname', 'test-host',
+                                        '--admin-password', 'test', '--workers', '2'])
+
+    assert result.exit_code == 1
+    assert 'Row 2 (user2): Creating user failed with 409 None (User exists)' in result.output
+    assert 'Row 3 (user3): missing password' in result.output
+    assert 'Imported 1 of 3 users' in result.output
+    assert 'Error: Failed to import 2 users' in result.output
+
+
+def test_user_import_reports_rows_failing_with_other_errors(mocker, tmp_path):
+    def create_user(username, *args, **kwargs):
+        if username == 'user2':
+            raise requests.exceptions.ConnectionError('Connection refused')
+
+    def assign_roles(username, roles):
+        raise ValueError(f'no realm for {username}')
+    um = mock_user_manager_for_import(mocker, create_user)
+    um.assign_roles.side_effect = assign_roles
+    users_file = tmp_path / 'users.yaml'
+    users_file.write_text('- {username: user1, password: pass1}\n'
+                          '- {username: user2, password: pass2}\n'
+                          '- {username: user3, password: pass3, roles: viewer}\n')
+
+    result = TEST_CLI.invoke(main.cli, ['user', 'import', '--file', str(users_file), '--hostname', 'test-host',
+                                        '--admin-password', 'test'])
+
+    assert result.exit_code == 1
+    assert 'Row 2 (user2): Creating user failed: Connection refused' in result.output
+    assert "Row 3 (user3): User created, assigning roles failed: no realm for user3" in result.output
+    assert 'Imported 1 of 3 users' in result.output
+
+
+def test_user_export_csv(mocker, tmp_path):
+    um = mock_user_manager_for_import(mocker)
+    um.index_users.return_value = [{'username': 'user1', 'email': 'user1@kx.com', 'enabled': True},
+                                   {'username': 'user2', 'enabled': False}]
+    um.get_assigned_roles.side_effect = lambda username: [{'name': 'viewer'}] if username == 'user1' else []
+    export_file = tmp_path / 'users.csv'
+
+    result = TEST_CLI.invoke(main.cli, ['user', 'export', '--file', str(export_file), '--hostname', 'test-host',
+                                        '--admin-password', 'test'])
+
+    assert result.exit_code == 0
+    assert export_file.read_text() == 'username,email,enabled,roles\r\nuser1,user1@kx.com,True,viewer\r\nuser2,,False,\r\n'
+
+
+def test_user_manager_iter_users_fetches_pages_lazily(user_manager):
+    with requests_mock.Mocker() as m:
+        m.get(USERS_URL, [{'json': [{'username': 'user1'}, {'username': 'user2'}]},
+                          {'json': [{'username': 'user3'}]}])
+        users = user_manager.iter_users(page_size=2, search='user')
+
+        assert next(users)['username'] == 'user1'
+        assert len(m.request_history) == 1
+        assert [u['username'] for u in users] == ['user2', 'user3']
+        assert [r.qs for r in m.request_history] == [{'search': ['user'], 'first': ['0'], 'max': ['2']},
+                                                     {'search': ['user'], 'first': ['2'], 'max': ['2']}]
+
+
+@pytest.mark.parametrize('output_format, expected', [
+    ('csv', 'username,email,enabled\nuser1,user1@kx.com,True\nuser2,,False\n'),
+    ('json-lines', '{"username": "user1", "email": "user1@kx.com", "enabled": true}\n'
+                   '{"username": "user2", "email": null, "enabled": false}\n'),
+])
+def test_user_list_streaming_formats(mocker, output_format, expected):
+    um = mock_user_manager_for_import(mocker)
+    um.iter_users.return_value = iter([{'username': 'user1', 'email': 'user1@kx.com', 'enabled': True},
+                                       {'username': 'user2', 'enabled': False}])
+
+    result = TEST_CLI.invoke(main.cli, ['user', 'list', '--hostname', 'test-host', '--admin-password', 'test',
+                                        '--output-format', output_format, '--search', 'user', '--enabled',
+                                        '--page-size', '50'])
+
+    assert result.exit_code == 0
+    assert result.output == expected
+    um.iter_users.assert_called_once_with(page_size=50, search='user', enabled='true')